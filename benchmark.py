@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the exchange string codec and of the command line paths, on synthetic blueprints and books
+
+  Each benchmark is timed with timeit (best of several runs), then run once more under tracemalloc to measure its
+  peak memory. The results are saved as JSON, and can be compared with the results of a previous run.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import NamedTuple
+import blueprints as blueprints_cli
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, json_backend, maps
+
+
+SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
+DEFAULT_OUTPUT_FILE = 'benchmark_results.json'
+MAPS_FOLDER = os.path.join(SCRIPT_PATH, 'tests', 'examples', 'maps')
+
+# Entity counts of the synthetic blueprints
+QUICK_ENTITY_COUNTS = [1, 100, 10000, 100000]
+FULL_ENTITY_COUNTS = QUICK_ENTITY_COUNTS + [500000]
+# Synthetic books: (depth, pages per book, entities per page)
+BOOK_SHAPES = [(1, 50, 200), (3, 5, 200), (5, 3, 100)]
+MAP_REPEAT = 200
+# Options of blueprints.py of which the start-up time is measured (the time of a new process)
+STARTUP_OPTIONS = ['--name', '--version', '--info', '--json']
+
+
+class Case(NamedTuple):
+    name: str                   # e.g. 'blueprint-10000'
+    blueprint_obj: dict
+    json_str: str               # Canonical JSON
+    exchange_str: str
+    entity_count: int
+
+
+class Result(NamedTuple):
+    benchmark: str
+    case: str
+    entity_count: int
+    input_size: int             # Bytes (or characters) of input of the benchmark
+    seconds: float              # Best time of one run
+    throughput: float           # Input megabytes per second
+    entities_per_second: float
+    peak_memory: int            # Bytes allocated at the peak, as measured by tracemalloc
+
+
+def count_entities(blueprint_obj: dict) -> int:
+    if 'blueprint_book' in blueprint_obj:
+        return sum(count_entities(page) for page in blueprint_obj['blueprint_book'].get('blueprints', []))
+    return len(blueprint_obj.get('blueprint', {}).get('entities', []))
+
+
+def make_case(name: str, blueprint_obj: dict) -> Case:
+    json_str = blueprints.canonical_json_string(blueprint_obj)
+    return Case(name, blueprint_obj, json_str, blueprints.generate_exchange_string(json_str), count_entities(blueprint_obj))
+
+
+def make_cases(entity_counts: list[int]) -> list[Case]:
+    cases = [make_case(f'blueprint-{entity_count}', synthetic.synthetic_blueprint(entity_count)) for entity_count in entity_counts]
+    for depth, pages_per_book, entities_per_page in BOOK_SHAPES:
+        book_obj = synthetic.synthetic_book(depth, pages_per_book, entities_per_page)
+        cases.append(make_case(f'book-{depth}x{pages_per_book}x{entities_per_page}', book_obj))
+    return cases
+
+
+def time_function(func: Callable, repeat: int) -> float:
+    """Best time of one call"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def measure_peak_memory(func: Callable) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(benchmark: str, case_name: str, func: Callable, input_size: int, entity_count: int, repeat: int) -> Result:
+    seconds = time_function(func, repeat)
+    peak_memory = measure_peak_memory(func)
+    return Result(benchmark, case_name, entity_count, input_size, seconds, input_size / seconds / 1e6, entity_count / seconds, peak_memory)
+
+
+def print_info(blueprint_obj: dict) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        blueprints_cli.info_from_blueprint_object(blueprint_obj, max_recursion_level=10)
+
+
+def blueprint_benchmarks(case: Case) -> list[tuple[str, Callable, int]]:
+    """(benchmark, function, input size)"""
+    return [
+        ('parse_exchange_string', lambda: blueprints.parse_exchange_string(case.exchange_str), len(case.exchange_str)),
+        ('json.loads', lambda: json.loads(case.json_str), len(case.json_str)),
+        ('parse_json_string', lambda: blueprints.parse_json_string(case.json_str), len(case.json_str)),
+        ('canonical_json_string', lambda: blueprints.canonical_json_string(case.blueprint_obj), len(case.json_str)),
+        ('generate_exchange_string_from_json_object', lambda: blueprints.generate_exchange_string_from_json_object(case.blueprint_obj), len(case.json_str)),
+        ('info_from_blueprint_object', lambda: print_info(case.blueprint_obj), len(case.json_str)),
+    ]
+
+
+def read_map_exchange_strings() -> list[str]:
+    map_ex_strs = []
+    for map_file in sorted(os.listdir(MAPS_FOLDER)):
+        with open(os.path.join(MAPS_FOLDER, map_file), 'r', encoding='ascii') as fp:
+            map_ex_strs.extend(line.strip() for line in fp if line.strip())
+    return map_ex_strs
+
+
+def parse_map_exchange_strings(map_ex_strs: list[str]) -> None:
+    for map_ex_str in map_ex_strs:
+        maps.parse_map_exchange_string(map_ex_str)
+
+
+def run_script(script: str, args: list[str]) -> None:
+    subprocess.run([sys.executable, os.path.join(SCRIPT_PATH, script), *args], stdout=subprocess.DEVNULL, check=True)
+
+
+def run_benchmarks(entity_counts: list[int], repeat: int, selected: str = None, log = sys.stderr) -> list[Result]:
+    results = []
+
+    def run(benchmark: str, case_name: str, func: Callable, input_size: int, entity_count: int) -> None:
+        if selected and selected not in benchmark:
+            return
+        result = run_benchmark(benchmark, case_name, func, input_size, entity_count, repeat)
+        print(f'{benchmark:45} {case_name:20} {result.seconds * 1e3:10.3f} ms {result.throughput:8.1f} MB/s {result.peak_memory / 1e6:8.1f} MB', file=log)
+        results.append(result)
+
+    for case in make_cases(entity_counts):
+        for benchmark, func, input_size in blueprint_benchmarks(case):
+            run(benchmark, case.name, func, input_size, case.entity_count)
+    startup_exchange_str = make_case('blueprint-1', synthetic.synthetic_blueprint(1)).exchange_str
+    for option in STARTUP_OPTIONS:
+        run('startup', f'blueprints.py {option}', lambda: run_script('blueprints.py', ['-s', startup_exchange_str, option]), len(startup_exchange_str), 1)
+    map_ex_strs = read_map_exchange_strings() * MAP_REPEAT
+    run('parse_map_exchange_string', f'maps-{len(map_ex_strs)}', lambda: parse_map_exchange_strings(map_ex_strs), sum(len(map_ex_str) for map_ex_str in map_ex_strs), 0)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_PATH, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results: list[Result], out_file: str) -> None:
+    report = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'json_backend': json_backend.backend,
+        'results': [result._asdict() for result in results],
+    }
+    with open(out_file, 'w', encoding='utf-8') as fp:
+        json.dump(report, fp, indent=2)
+
+
+def compare_results(results: list[Result], reference_file: str) -> None:
+    """Print out the ratio of the times to the ones of a reference run (> 1: slower)"""
+    with open(reference_file, 'r', encoding='utf-8') as fp:
+        reference = json.load(fp)
+    reference_seconds = { (result['benchmark'], result['case']): result['seconds'] for result in reference['results'] }
+    print(f'Compared to commit {reference.get("commit")}:')
+    for result in results:
+        previous_seconds = reference_seconds.get((result.benchmark, result.case))
+        if previous_seconds:
+            print(f'{result.benchmark:45} {result.case:20} x{result.seconds / previous_seconds:6.2f}')
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks of the exchange string codec, on synthetic blueprints and books')
+    parser.add_argument('--full', dest='full', action='store_true', help='Include the largest blueprints (' + str(FULL_ENTITY_COUNTS[-1]) + ' entities)')
+    parser.add_argument('--repeat', metavar='N', type=int, dest='repeat', default=3, help='Number of timed runs of each benchmark (the best one is kept). Default: 3')
+    parser.add_argument('-b', '--benchmark', metavar='NAME', dest='selected', help='Only run the benchmarks of which the name contains NAME')
+    parser.add_argument('-o', '--output', metavar='FILE', dest='out_file', default=DEFAULT_OUTPUT_FILE, help='Output file of the results (JSON). Default: ' + DEFAULT_OUTPUT_FILE)
+    parser.add_argument('--compare', metavar='FILE', dest='reference_file', help='Compare the results with the ones of a previous run')
+    parser.add_argument('--json-backend', metavar='NAME', dest='json_backend', choices=json_backend.available_backends(), help='JSON backend of the codec: ' + ', '.join(json_backend.available_backends()) + '. Default: ' + json_backend.backend)
+    args = parser.parse_args(argv)
+
+    if args.json_backend:
+        json_backend.set_backend(args.json_backend)
+    results = run_benchmarks(FULL_ENTITY_COUNTS if args.full else QUICK_ENTITY_COUNTS, args.repeat, args.selected)
+    save_results(results, args.out_file)
+    print('Results written to file: ' + args.out_file)
+    if args.reference_file:
+        compare_results(results, args.reference_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 """
 Command line tool to manage blueprint exchange strings from the game Factorio (https://www.factorio.com/)
 """
+from __future__ import annotations      # The annotations do not load the lazy modules
 __author__ = "Pierre DEJOUE"
 __copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
 __license__ = "MIT License"
@@ -9,42 +10,61 @@ __version__ = "0.1"
 
 
 import argparse
-import configparser
 import json
+import functools
+import itertools
 import os
 import sys
-from collections.abc import Callable
-from factorio_game.exchange_string import blueprints
+import zlib
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+from factorio_game.cli import lazy_import
+from factorio_game.exchange_string import blueprints, book_index, profiling
+
+# Only needed by some of the options (e.g. the DB and the cache depend on sqlite3)
+configparser = lazy_import('configparser')
+blueprints_cache = lazy_import('factorio_game.blueprints_cache')
+blueprints_db = lazy_import('factorio_game.blueprints_db')
+migration = lazy_import('factorio_game.migration')
+bom = lazy_import('factorio_game.exchange_string.bom')
+book_builder = lazy_import('factorio_game.exchange_string.book_builder')
+circuits = lazy_import('factorio_game.exchange_string.circuits')
+diff = lazy_import('factorio_game.exchange_string.diff')
+query = lazy_import('factorio_game.exchange_string.query')
+spatial = lazy_import('factorio_game.exchange_string.spatial')
+stamping = lazy_import('factorio_game.exchange_string.stamping')
+transforms = lazy_import('factorio_game.exchange_string.transforms')
+validation = lazy_import('factorio_game.exchange_string.validation')
 
 
 CONFIG_FILE = 'config.ini'
 SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
+# The keys of migration.MIGRATIONS, so that the parser of the arguments does not load the module
+MIGRATION_VERSIONS = ('0.17', '2.0')
 
 
-try:
-    config = configparser.ConfigParser()
-    config.read(os.path.join(SCRIPT_PATH, CONFIG_FILE))
-    EXCHANGE_STRINGS_VERSION = config.getint('blueprints', 'version', fallback = blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION)
-    DB_PATH = config.get('blueprints-db', 'location')
-except configparser.Error as err:
-    print('Error parsing ' + CONFIG_FILE + ': ' + str(err))
-    sys.exit(-1)
+class Config(NamedTuple):
+    exchange_strings_version: int
+    db_path: str                # Relative to the directory of the script
 
 
-ENTITY_RENAMING_0_16_TO_0_17 = {
-    'science-pack-1': 'automation-science-pack',
-    'science-pack-2': 'logistic-science-pack',
-    'science-pack-3': 'chemical-science-pack',
-    'high-tech-science-pack': 'utility-science-pack',
-    'raw-wood': 'wood',
-}
+@functools.cache
+def read_config() -> Config:
+    """The settings of config.ini, read on first use"""
+    try:
+        config = configparser.ConfigParser()
+        config.read(os.path.join(SCRIPT_PATH, CONFIG_FILE))
+        return Config(config.getint('blueprints', 'version', fallback = blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION), config.get('blueprints-db', 'location'))
+    except configparser.Error as err:
+        print('Error parsing ' + CONFIG_FILE + ': ' + str(err))
+        sys.exit(-1)
 
 
-def full_db_path(db_path: str = DB_PATH) -> str:
-    return os.path.join(SCRIPT_PATH, db_path)
+def full_db_path(db_path: str = None) -> str:
+    return os.path.join(SCRIPT_PATH, db_path if db_path is not None else read_config().db_path)
 
 
-def create_db_directories(db_path: str = DB_PATH) -> None:
+def create_db_directories(db_path: str = None) -> None:
     """create DB if not existing"""
     db_directory = full_db_path(db_path)
     if not os.path.exists(db_directory):
@@ -52,30 +72,61 @@ def create_db_directories(db_path: str = DB_PATH) -> None:
         os.makedirs(db_directory)
 
 
-def pretty_print_json(blueprint_obj: dict, fp = sys.stdout) -> None:
-    json.dump(blueprint_obj, fp, sort_keys=True, indent=2, separators=(',', ': '))
+def open_db(db_path: str = None) -> blueprints_db.BlueprintsDB:
+    create_db_directories(db_path)
+    return blueprints_db.BlueprintsDB(full_db_path(db_path))
 
 
-def pretty_print_bp_type(bp_type: blueprints.Type, blueprint_obj: dict) -> str:
+def open_cache(db_path: str = None) -> blueprints_cache.BlueprintsCache:
+    create_db_directories(db_path)
+    return blueprints_cache.BlueprintsCache(full_db_path(db_path))
+
+
+def print_cache_stats(cache: blueprints_cache.BlueprintsCache) -> None:
+    stats = cache.stats()
+    print(f'Cache: {stats.hits} hits, {stats.misses} misses, {stats.entries} entries, {stats.size} bytes', file=sys.stderr)
+
+
+def print_db_records(records: list[blueprints_db.Record]) -> None:
+    for record in records:
+        bp_type_str = pretty_print_bp_type(blueprints.Type(record.type) if record.type else None)
+        version_str = blueprints.decode_game_version(record.version) if record.version is not None else 'unknonwn'
+        label = record.label if record.label is not None else 'no-name'
+        print(f'{record.hash[:12]} {bp_type_str}: {label} (Version: {version_str}, Entities: {record.entity_count})')
+
+
+def import_blueprint_object(db: blueprints_db.BlueprintsDB, blueprint_obj: dict, args: argparse.Namespace) -> None:
+    try:
+        bp_hash, is_new = db.import_blueprint(blueprint_obj, validate=not args.skip_validation)
+    except ValueError as err:
+        # The other blueprints of the files are imported
+        print(f'Not imported: {blueprints.read_blueprint_name(blueprint_obj)}: {err}', file=sys.stderr)
+        return
+    status = 'Imported' if is_new else 'Already in DB'
+    print(f'{bp_hash[:12]} {status}: {blueprints.read_blueprint_name(blueprint_obj)}')
+
+
+@profiling.profiled('serialize')
+def pretty_print_json(blueprint_obj: dict, fp = None) -> None:
+    json.dump(blueprint_obj, fp if fp is not None else sys.stdout, sort_keys=True, indent=2, separators=(',', ': '))
+
+
+def pretty_print_bp_type(bp_type: blueprints.Type, blueprint_obj: dict = None) -> str:
     if bp_type:
         return ' '.join([ substr.capitalize() for substr in bp_type.value.replace('_', ' ').split()])
-    return str(blueprint_obj.keys())
+    return str(blueprint_obj.keys()) if blueprint_obj is not None else 'Unknown'
 
 
-def print_blueprint_book_contents(book_obj: dict, max_recursion_level: int = 0, recursion_level: int = 0) -> None:
+def print_blueprint_book_contents(book_obj: dict, max_recursion_level: int = 0) -> None:
     assert 'blueprint_book' in book_obj, 'Only accept blueprint book as input'
-    book_contents = book_obj['blueprint_book']['blueprints']
-    for blueprint_elt in book_contents:
-        blueprint_elt_index = blueprint_elt['index'] if 'index' in blueprint_elt else -1
+    # Skip the book itself
+    for blueprint_elt in itertools.islice(blueprints.walk_blueprint_object(book_obj, max_recursion_level), 1, None):
+        blueprint_elt_index = blueprint_elt.path[-1]
         blueprint_elt_index_str = f'#{blueprint_elt_index:03d}' if blueprint_elt_index >= 0 else '#'
-        blueprint_elt_type = blueprints.read_blueprint_type(blueprint_elt)
-        blueprint_elt_type_str = pretty_print_bp_type(blueprint_elt_type, blueprint_elt)
-        blueprint_elt_descr = blueprints.read_blueprint_name(blueprint_elt)
-        indentation = str(2 * (recursion_level + 1) * ' ')
+        blueprint_elt_type_str = pretty_print_bp_type(blueprint_elt.type, blueprint_elt.node)
+        blueprint_elt_descr = blueprints.read_blueprint_name(blueprint_elt.node)
+        indentation = str(2 * len(blueprint_elt.path) * ' ')
         print(f'{indentation}{blueprint_elt_index_str} {blueprint_elt_type_str}: {blueprint_elt_descr}')
-        # Recursive call on blueprint books
-        if 'blueprint_book' in blueprint_elt and recursion_level < max_recursion_level:
-            print_blueprint_book_contents(blueprint_elt, max_recursion_level, recursion_level + 1)
 
 
 def info_from_blueprint_book(book_obj: dict, max_recursion_level: int = 0) -> None:
@@ -99,6 +150,7 @@ def info_from_single_blueprint(blueprint_obj: dict) -> None:
     print('Version: ' + blueprint_version)
 
 
+@profiling.profiled('walk')
 def info_from_blueprint_object(blueprint_obj: dict, max_recursion_level: int = 0) -> None:
     bp_type = blueprints.read_blueprint_type(blueprint_obj)
     if bp_type == blueprints.Type.BOOK:
@@ -108,151 +160,624 @@ def info_from_blueprint_object(blueprint_obj: dict, max_recursion_level: int = 0
         info_from_single_blueprint(blueprint_obj)
 
 
-def find_index_in_blueprint_book(blueprint_obj: dict, index: int) -> dict:
-    if 'blueprint_book' not in blueprint_obj:
-        return None
-    book_contents = blueprint_obj['blueprint_book']['blueprints']
-    for blueprint_elt in book_contents:
-        blueprint_elt_index = blueprint_elt['index'] if 'index' in blueprint_elt else -1
-        if blueprint_elt_index == index:
-            return blueprint_elt
-    return None
+def print_book_entry_contents(book_entry: book_index.BookEntry, recursion_level: int = 0) -> None:
+    for entry in book_entry.contents:
+        entry_index_str = f'#{entry.index:03d}' if entry.index >= 0 else '#'
+        indentation = str(2 * (recursion_level + 1) * ' ')
+        print(f'{indentation}{entry_index_str} {pretty_print_bp_type(entry.type)}: {book_index.read_entry_name(entry)}')
+        # Recursive call on the blueprint books of which the contents were read
+        if entry.contents is not None:
+            print_book_entry_contents(entry, recursion_level + 1)
+
+
+def info_from_book_entry(blueprint_json_str: str, entry: book_index.BookEntry, max_recursion_level: int = 0) -> None:
+    """Same as info_from_blueprint_object, without decoding the entities"""
+    if entry.type == blueprints.Type.BOOK:
+        if entry.contents is None:
+            entry = book_index.read_header(blueprint_json_str, entry.start, max(max_recursion_level, 0))
+        print('Blueprint Book: ' + book_index.read_entry_name(entry))
+        print('Version: ' + book_index.read_entry_game_version(entry))
+        print('Contents:')
+        print_book_entry_contents(entry)
+    else:
+        print('Blueprint: ' + book_index.read_entry_name(entry))
+        if entry.type != blueprints.Type.BP:
+            print('Type: ' + pretty_print_bp_type(entry.type))
+        print('Version: ' + book_index.read_entry_game_version(entry))
 
 
-def get_book_in_json(book_name: str, contents: str, version: int, active_index: int = 0) -> str:
-    assert contents, 'Empty book [' + book_name + ']'
-    blueprint_list = [{'blueprint': bp_parsed_file['blueprint'], 'index': bp_parsed_file['index']} for bp_parsed_file in contents]
-    blueprint_book = {
+def get_book_header(book_name: str, version: int, active_index: int = 0) -> dict:
+    return {
         'blueprint_book': {
           'active_index': active_index,
-          'blueprints': blueprint_list,
+          'blueprints': [],
           'item': 'blueprint-book',
           'label': book_name,
           'version': version
         }
     }
-    return blueprints.generate_exchange_string_from_json_object(blueprint_book, EXCHANGE_STRINGS_VERSION)
-
 
-def update_entity_names(blueprint_obj: dict, entity_mapping: dict) -> bool:
-    assert blueprint_obj
 
-    def func_str(entity: dict, k: str):
-        assert k in entity
-        assert isinstance(entity[k], str)
-        if entity[k] in entity_mapping:
-            entity[k] = entity_mapping[entity[k]]
-            return True
-        return False
-
-    def do_nothing(_entity: dict, _k: str):
+def get_book_in_json(book_name: str, contents: str, version: int, active_index: int = 0) -> str:
+    assert contents, 'Empty book [' + book_name + ']'
+    pages = [book_builder.Page(None, bp_parsed_file['index'], functools.partial(blueprints.canonical_json_string, {'blueprint': bp_parsed_file['blueprint']}))
+             for bp_parsed_file in contents]
+    return book_builder.generate_book_exchange_string(get_book_header(book_name, version, active_index), pages, exchange_str_version=read_config().exchange_strings_version)
+
+
+def build_book_from_db(db: blueprints_db.BlueprintsDB, book_name: str, bp_hashes: list[str], active_index: int = 0, validate: bool = True) -> str:
+    """
+    Exchange string of a book made of blueprints of the DB. The compressed pages are cached in the DB. Raise ValueError
+    if validate and the book is not valid (see module validation): the pages validated when they were imported are not
+    decoded again, only the header of the book and the other pages are checked.
+    """
+    assert bp_hashes, 'Empty book [' + book_name + ']'
+    records = [db.lookup(bp_hash) for bp_hash in bp_hashes]
+    versions = [record.version for record in records if record.version is not None]
+    if validate:
+        # The indices of the pages are their positions: unique by construction
+        book_obj = get_book_header(book_name, max(versions, default=0), active_index)
+        book_obj['blueprint_book']['blueprints'] = [{ **db.get(record.hash), 'index': index } for index, record in enumerate(records) if not db.is_validated(record.hash)]
+        validation.check(book_obj)
+    pages = [book_builder.Page(record.hash, index, functools.partial(db.get_json, record.hash)) for index, record in enumerate(records)]
+    book_header = get_book_header(book_name, max(versions, default=0), active_index)
+    return book_builder.generate_book_exchange_string(book_header, pages, db.segment_cache, read_config().exchange_strings_version)
+
+
+def index_path(path_str: str) -> tuple:
+    try:
+        return blueprints.parse_index_path(path_str)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+
+def compression_profile(profile_str: str):
+    try:
+        return blueprints.parse_compression_profile(profile_str)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+
+def print_encoding_stats(stats: blueprints.EncodingStats) -> None:
+    # On the standard error, so that the standard output is still a valid exchange string
+    print(f'JSON: {stats.json_size} bytes, Compressed: {stats.compressed_size} bytes, Exchange string: {stats.exchange_string_size} characters ({stats.ratio:.1%})', file=sys.stderr)
+
+
+def check_before_encoding(blueprint_obj: dict, args: argparse.Namespace) -> bool:
+    """Validate a blueprint before printing out its exchange string, unless --no-validate. False if not valid."""
+    if args.skip_validation:
+        return True
+    try:
+        validation.check(blueprint_obj)
+    except ValueError as err:
+        print(f'Not encoded: {blueprints.read_blueprint_name(blueprint_obj)}: {err}', file=sys.stderr)
         return False
-
-    return walk_json_obj_and_map(blueprint_obj, func_str, do_nothing, do_nothing)
+    return True
 
 
-ProcessBlueprint = Callable[[dict, dict], bool]
-
-
-def walk_json_obj_and_map(json_obj, process_str: ProcessBlueprint, process_int: ProcessBlueprint, process_float: ProcessBlueprint) -> bool:
-    modified = False
-    if isinstance(json_obj, dict):
-        for (key, value) in json_obj.items():
-            if isinstance(value, str):
-                modified = modified | process_str(json_obj, key)
-            elif isinstance(value, int):
-                modified = modified | process_int(json_obj, key)
-            elif isinstance(value, float):
-                modified = modified | process_float(json_obj, key)
-            else:
-                modified = modified | walk_json_obj_and_map(value, process_str, process_int, process_float)
-    elif isinstance(json_obj, list):
-        for elt in json_obj:
-            modified = modified | walk_json_obj_and_map(elt, process_str, process_int, process_float)
-    else:
-        pass
-    return modified
+def print_exchange_string(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    if not check_before_encoding(blueprint_obj, args):
+        return
+    blueprint_json_str = blueprints.canonical_json_string(blueprint_obj)
+    exchange_str = blueprints.generate_exchange_string(blueprint_json_str, read_config().exchange_strings_version, args.compression)
+    print(exchange_str)
+    if args.compression_stats:
+        print_encoding_stats(blueprints.encoding_stats(blueprint_json_str, exchange_str))
 
 
-def map_blueprint_object(blueprint_obj: dict, process: ProcessBlueprint, json_pretty_print: bool) -> None:
+def map_blueprint_object(blueprint_obj: dict, process: Callable[[dict], bool], args: argparse.Namespace) -> None:
     if process(blueprint_obj):
         print('Updated Blueprint:')
-        if json_pretty_print:
+        if args.json:
             pretty_print_json(blueprint_obj)
         else:
-            print(blueprints.generate_exchange_string_from_json_object(blueprint_obj, EXCHANGE_STRINGS_VERSION))
+            print_exchange_string(blueprint_obj, args)
     else:
         print('Not modified')
 
 
+def number(value_str: str):
+    """Parse an int, or a float"""
+    try:
+        return int(value_str)
+    except ValueError:
+        return float(value_str)
+
+
+def has_transforms(args: argparse.Namespace) -> bool:
+    return args.rotate is not None or args.flip_horizontal or args.flip_vertical or args.translate is not None
+
+
+def transform_blueprint_object(blueprint_obj: dict, args: argparse.Namespace) -> dict:
+    # The transformations are applied in this order: rotation, mirroring, translation
+    if args.rotate is not None:
+        blueprint_obj = transforms.transform_blueprint_object(blueprint_obj, transforms.rotate, args.rotate)
+    if args.flip_horizontal:
+        blueprint_obj = transforms.transform_blueprint_object(blueprint_obj, transforms.flip_horizontal)
+    if args.flip_vertical:
+        blueprint_obj = transforms.transform_blueprint_object(blueprint_obj, transforms.flip_vertical)
+    if args.translate is not None:
+        blueprint_obj = transforms.transform_blueprint_object(blueprint_obj, transforms.translate, *args.translate)
+    return blueprint_obj
+
+
+def print_validation(blueprint_obj: dict) -> None:
+    issues = validation.validate(blueprint_obj)
+    for issue in issues:
+        print(validation.format_issue(issue))
+    print(f'{len(issues)} issue{"s" if len(issues) != 1 else ""}' if issues else 'Valid')
+
+
+def print_bounding_box(blueprint_obj: dict) -> None:
+    if blueprints.read_blueprint_type(blueprint_obj) != blueprints.Type.BP:
+        print('Not a blueprint')
+        return
+    bounding_box = transforms.bounding_box(transforms.CompactBlueprint(blueprint_obj))
+    if bounding_box is None:
+        print('Empty blueprint')
+        return
+    min_x, min_y, max_x, max_y = bounding_box
+    print(f'({min_x}, {min_y}) - ({max_x}, {max_y}), Size: {max_x - min_x} x {max_y - min_y}')
+
+
+def format_entity(index: spatial.SpatialIndex, idx: int, dx = 0, dy = 0) -> str:
+    table = index.table
+    return f'{table.name(idx)} #{table.entity_number[idx]} at ({table.x[idx] + dx}, {table.y[idx] + dy})'
+
+
+def print_overlaps(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    """The overlapping entities of the blueprint, or the ones of the blueprint and the other blueprint moved by the offset"""
+    other_obj = args.check_overlap if isinstance(args.check_overlap, dict) else None
+    if blueprints.read_blueprint_type(blueprint_obj) != blueprints.Type.BP or (other_obj is not None and blueprints.read_blueprint_type(other_obj) != blueprints.Type.BP):
+        print('Not a blueprint')
+        return
+    index = spatial.SpatialIndex.from_blueprint_object(blueprint_obj)
+    if other_obj is None:
+        other_index, (dx, dy) = index, (0, 0)
+        pairs = index.self_overlaps()
+    else:
+        other_index, (dx, dy) = spatial.SpatialIndex.from_blueprint_object(other_obj), args.offset
+        pairs = index.overlaps(other_index, dx, dy)
+    for idx, other_idx in pairs:
+        print(f'{format_entity(index, idx)} overlaps {format_entity(other_index, other_idx, dx, dy)}')
+    print(f'{len(pairs)} overlap{"s" if len(pairs) > 1 else ""}' if pairs else 'No overlap')
+
+
+def print_circuit_networks(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    if blueprints.read_blueprint_type(blueprint_obj) != blueprints.Type.BP:
+        print('Not a blueprint')
+        return
+    graph = circuits.CircuitGraph(blueprint_obj)
+    if args.json:
+        pretty_print_json(circuits.to_json_object(graph))
+        print()
+        return
+    if args.dot:
+        print(circuits.to_dot(graph))
+        return
+    for color, wire_graph in graph.graphs.items():
+        for network in range(wire_graph.network_count):
+            members = wire_graph.members(network)
+            print(f'{color.capitalize()} network {network} ({len(members)}): {", ".join(graph.format_node(node) for node in members)}')
+    print('Networks: ' + ', '.join(f'{wire_graph.network_count} {color}' for color, wire_graph in graph.graphs.items()))
+
+
+def print_bill_of_materials(bill: bom.BillOfMaterials, args: argparse.Namespace) -> None:
+    if args.json:
+        pretty_print_json(bom.to_json_object(bill))
+        print()
+        return
+    print(f'Blueprints: {bill.blueprint_count}, Entities: {bill.entity_count}, Tiles: {bill.tile_count}, Size: {bill.width} x {bill.height}')
+    for title, counts in (('Entities', bill.entities), ('Modules', bill.modules), ('Items', bill.items), ('Tiles', bill.tiles)):
+        if counts:
+            print(title + ':')
+            for name, count in counts.items():
+                print(f'  {count:8} {name}')
+
+
+def print_diff(old_obj: dict, new_obj: dict, args: argparse.Namespace) -> None:
+    if args.json:
+        # The patch (see --apply-patch)
+        pretty_print_json(diff.make_patch(old_obj, new_obj))
+        print()
+        return
+    changes = diff.diff(old_obj, new_obj)
+    for change in changes:
+        print(diff.format_change(change))
+    if not changes:
+        print('No differences')
+
+
+def print_patched_blueprint(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    try:
+        blueprint_obj = diff.apply_patch(blueprint_obj, args.patch)
+    except ValueError as err:
+        print(err)
+        return
+    if args.json:
+        pretty_print_json(blueprint_obj)
+    else:
+        print_exchange_string(blueprint_obj, args)
+
+
+def print_stamped_blueprint(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    if blueprints.read_blueprint_type(blueprint_obj) != blueprints.Type.BP:
+        print('Not a blueprint')
+        return
+    columns, rows, spacing_x, spacing_y = args.stamp
+    if type(columns) is not int or type(rows) is not int or columns < 1 or rows < 1:
+        print('Invalid grid: COLUMNS and ROWS must be positive integers')
+        return
+    # The copies are valid if the blueprint is
+    if not check_before_encoding(blueprint_obj, args):
+        return
+    # The stamped blueprint is streamed, so the smallest output cannot be searched for: use the best compression instead
+    compression = blueprints.COMPRESSION_PROFILES['max'] if args.compression == blueprints.SMALLEST else args.compression
+    try:
+        stamping.write_stamped_blueprint(blueprint_obj, columns, rows, spacing_x, spacing_y, sys.stdout, read_config().exchange_strings_version, compression)
+    except ValueError as err:
+        print(f'Invalid spacing: {err}')
+        return
+    print()
+
+
+def process_blueprint_object(blueprint_obj: dict, args: argparse.Namespace) -> None:
+    # --index (execute prior to the other options as it will affect the source blueprint)
+    if args.index is not None:
+        blueprint_obj = blueprints.find_path(blueprint_obj, args.index)
+    if not blueprint_obj:
+        print(f'Index {blueprints.format_index_path(args.index)} not found')
+        return
+    # --name
+    if args.bp_name:
+        print(blueprints.read_blueprint_name(blueprint_obj))
+    # --version
+    elif args.bp_version:
+        print(blueprints.parse_game_version(blueprint_obj))
+    # --rotate, --flip-horizontal, --flip-vertical, --translate
+    elif has_transforms(args):
+        try:
+            blueprint_obj = transform_blueprint_object(blueprint_obj, args)
+        except ValueError as err:
+            print(f'Not transformed: {blueprints.read_blueprint_name(blueprint_obj)}: {err}', file=sys.stderr)
+            return
+        if args.json:
+            pretty_print_json(blueprint_obj)
+        else:
+            print_exchange_string(blueprint_obj, args)
+    # --stamp
+    elif args.stamp is not None:
+        print_stamped_blueprint(blueprint_obj, args)
+    # --validate
+    elif args.validate:
+        print_validation(blueprint_obj)
+    # --check-overlap
+    elif args.check_overlap is not None:
+        print_overlaps(blueprint_obj, args)
+    # --circuits
+    elif args.circuits:
+        print_circuit_networks(blueprint_obj, args)
+    # --bounding-box
+    elif args.bounding_box:
+        print_bounding_box(blueprint_obj)
+    # --bom
+    elif args.bom:
+        print_bill_of_materials(bom.bill_of_materials(blueprint_obj), args)
+    # --diff
+    elif args.diff is not None:
+        print_diff(blueprint_obj, args.diff, args)
+    # --apply-patch
+    elif args.patch is not None:
+        print_patched_blueprint(blueprint_obj, args)
+    # --migrate, --update-to-0.17
+    elif args.migrate_to:
+        def func_migrate(obj: dict) -> bool:
+            return migration.migrate_blueprint(obj, args.migrate_to) > 0
+        map_blueprint_object(blueprint_obj, func_migrate, args)
+    # --import
+    elif args.import_db:
+        import_blueprint_object(args.db, blueprint_obj, args)
+    # --json
+    elif args.json:
+        pretty_print_json(blueprint_obj)
+    # --exchange
+    elif args.exchange:
+        print_exchange_string(blueprint_obj, args)
+    # --info, or no option
+    else:
+        info_from_blueprint_object(blueprint_obj, args.max_recursion_level)
+
+
+@profiling.profiled('walk')
+def process_blueprint_header(blueprint_json_str: str, args: argparse.Namespace) -> None:
+    """Lazy alternative to process_blueprint_object for the options that only need the table of contents"""
+    # A negative level reads the first level of a book, as walk_blueprint_object does
+    max_recursion_level = max(args.max_recursion_level, 0)
+    entry = book_index.read_header(blueprint_json_str, contents_depth=-1 if args.index is not None else max_recursion_level)
+    # --index
+    if args.index is not None:
+        entry = book_index.find_path(blueprint_json_str, entry, args.index)
+    if not entry:
+        print(f'Index {blueprints.format_index_path(args.index)} not found')
+        return
+    # --name
+    if args.bp_name:
+        print(book_index.read_entry_name(entry))
+    # --version
+    elif args.bp_version:
+        print(book_index.read_entry_game_version(entry))
+    # --info, or no option
+    else:
+        info_from_book_entry(blueprint_json_str, entry, max_recursion_level)
+
+
+def needs_blueprint_object(args: argparse.Namespace) -> bool:
+    """True if the options require the blueprint to be fully decoded (otherwise the table of contents is enough)"""
+    return args.json or args.exchange or args.import_db or args.migrate_to or args.validate or args.check_overlap is not None or args.circuits or args.bounding_box or args.bom or args.diff is not None or args.patch is not None or args.stamp is not None or has_transforms(args)
+
+
 def process_blueprint_json_string(blueprint_json_str: str, args: argparse.Namespace) -> None:
     if args.raw:
-        assert not args.index, 'Incompatible options --raw and --index'
+        assert args.index is None, 'Incompatible options --raw and --index'
         print(blueprint_json_str)
+    elif not needs_blueprint_object(args):
+        process_blueprint_header(blueprint_json_str, args)
+    elif args.index is not None:
+        # Only decode the selected element of the book
+        entry = book_index.find_path(blueprint_json_str, book_index.read_header(blueprint_json_str), args.index)
+        if not entry:
+            print(f'Index {blueprints.format_index_path(args.index)} not found')
+            return
+        args_without_index = argparse.Namespace(**{ **vars(args), 'index': None })
+        process_blueprint_object(book_index.load_entry(blueprint_json_str, entry), args_without_index)
+    else:
+        process_blueprint_object(blueprints.parse_json_string(blueprint_json_str), args)
+
+
+def blueprint_file(file_path: str) -> dict:
+    """The blueprint object of the first exchange string in a file"""
+    try:
+        with open(file_path, 'rt', encoding='ascii') as f:
+            for result in blueprints.read_exchange_strings(f):
+                if result.error:
+                    raise ValueError(result.error)
+                return result.blueprint
+        raise ValueError('No exchange string in the file')
+    except (OSError, AssertionError, ValueError, zlib.error) as err:
+        raise argparse.ArgumentTypeError(f'{file_path}: {err}')
+
+
+def patch_file(file_path: str) -> dict:
+    try:
+        with open(file_path, 'rt', encoding='utf-8') as f:
+            return blueprints.parse_json_string(f.read())
+    except (OSError, ValueError) as err:
+        raise argparse.ArgumentTypeError(f'{file_path}: {err}')
+
+
+def query_filter(filter_str: str) -> query.Filter:
+    try:
+        return query.parse_filter(filter_str)
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err))
+
+
+def query_blueprint(blueprint, args: argparse.Namespace, source: str = None) -> None:
+    """Print out the elements of a blueprint (decoded JSON text, or object) that match the query, prefixed with the source"""
+    assert args.index is None, 'Incompatible options --query and --index'
+    if isinstance(blueprint, str):
+        matches = args.query.match_json_string(blueprint, args.max_recursion_level)
     else:
-        blueprint_obj = json.loads(blueprint_json_str)
-        # --index (execute prior to the other options as it will affect the source blueprint)
-        if args.index is not None:
-            blueprint_obj = find_index_in_blueprint_book(blueprint_obj, args.index)
-        if not blueprint_obj:
-            print(f'Index {args.index} not found')
+        matches = args.query.match_object(blueprint, args.max_recursion_level)
+    for match in matches:
+        location = ' '.join(part for part in (source, query.format_path(match.path)) if part)
+        version_str = blueprints.decode_game_version(match.version) if match.version is not None else 'unknonwn'
+        label = match.label if match.label is not None else 'no-name'
+        print(f'{location + " " if location else ""}{pretty_print_bp_type(match.type)}: {label} (Version: {version_str})')
+
+
+def print_query_stats(blueprint_query: query.Query) -> None:
+    print(f'Query: {blueprint_query.matched} matches, {blueprint_query.scanned} elements scanned, {blueprint_query.decoded} blueprints decoded', file=sys.stderr)
+
+
+def uses_cache(args: argparse.Namespace) -> bool:
+    # The raw output is the decoded exchange string itself, which is not cached
+    return args.use_cache and not args.raw
+
+
+def process_blueprint_file_with_cache(blueprint_file: str, args: argparse.Namespace) -> None:
+    with open(blueprint_file, 'rt', encoding='ascii') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                blueprint_obj = args.cache.parse_exchange_string_as_json_object(line)
+            except (AssertionError, ValueError, zlib.error) as err:
+                print(f'{blueprint_file}:{line_number}: {type(err).__name__}: {err}', file=sys.stderr)
+                continue
+            if args.query:
+                query_blueprint(blueprint_obj, args, f'{blueprint_file}:{line_number}')
+            else:
+                process_blueprint_object(blueprint_obj, args)
+
+
+def is_migration_only(args: argparse.Namespace) -> bool:
+    """True if --migrate is the option applied by process_blueprint_object (none of the options before it is set)"""
+    return (args.migrate_to and args.index is None and not args.query and not (args.bp_name or args.bp_version or has_transforms(args)
+            or args.stamp is not None or args.validate or args.check_overlap is not None or args.circuits or args.bounding_box
+            or args.bom or args.diff is not None or args.patch is not None))
+
+
+def migrate_blueprint_batch(blueprint_file: str, batch: Iterable[blueprints.BatchResult], args: argparse.Namespace) -> None:
+    """Same as process_blueprint_object for --migrate, on a batch: the migration from each version is compiled once"""
+    def blueprint_objs():
+        for result in batch:
+            if result.error:
+                print(f'{blueprint_file}:{result.line_number}: {result.error}', file=sys.stderr)
+            else:
+                yield result.blueprint
+    blueprint_objs, blueprint_objs_to_migrate = itertools.tee(blueprint_objs())
+    for blueprint_obj, replacements in zip(blueprint_objs, migration.migrate_blueprints(blueprint_objs_to_migrate, args.migrate_to)):
+        map_blueprint_object(blueprint_obj, lambda obj: replacements > 0, args)
+
+
+def process_blueprint_file(blueprint_file: str, args: argparse.Namespace) -> None:
+    if uses_cache(args):
+        process_blueprint_file_with_cache(blueprint_file, args)
+        return
+    with open(blueprint_file, 'rt', encoding='ascii') as f:
+        # Decode the JSON in the worker processes only if the blueprints will be fully decoded anyway
+        as_json_object = needs_blueprint_object(args) and args.index is None and not args.raw
+        if args.jobs > 1:
+            batch = blueprints.parse_exchange_strings(f, jobs=args.jobs, as_json_object=as_json_object)
+        else:
+            # Stream the file: the lines (possibly huge blueprint books) are decoded by chunks
+            batch = blueprints.read_exchange_strings(f, as_json_object=as_json_object)
+        if as_json_object and is_migration_only(args):
+            migrate_blueprint_batch(blueprint_file, batch, args)
             return
-        # --name
-        if args.bp_name:
-            print(blueprints.read_blueprint_name(blueprint_obj))
-        # --version
-        elif args.bp_version:
-            print(blueprints.parse_game_version(blueprint_obj))
-
-        # --update-to-0.17
-        #elif args.update_to_0_17:
-        #    def func_update_to_0_17(obj: dict) -> bool:
-        #        return update_entity_names(obj, ENTITY_RENAMING_0_16_TO_0_17)
-        #    map_blueprint_object(blueprint_obj, func_update_to_0_17, args.json)
-        # --json
-        elif args.json:
-            pretty_print_json(blueprint_obj)
-        # --exchange
-        elif args.exchange:
-            print(blueprints.generate_exchange_string_from_json_object(blueprint_obj, EXCHANGE_STRINGS_VERSION))
-        # --info, or no option
+        for result in batch:
+            if result.error:
+                print(f'{blueprint_file}:{result.line_number}: {result.error}', file=sys.stderr)
+            elif args.query:
+                query_blueprint(result.blueprint, args, f'{blueprint_file}:{result.line_number}')
+            elif as_json_object:
+                process_blueprint_object(result.blueprint, args)
+            else:
+                process_blueprint_json_string(result.blueprint, args)
+
+
+def resolve_db_hash(db: blueprints_db.BlueprintsDB, hash_prefix: str) -> str:
+    try:
+        bp_hash = db.resolve(hash_prefix)
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return None
+    if not bp_hash:
+        print(f'Blueprint {hash_prefix} not found in DB', file=sys.stderr)
+    return bp_hash
+
+
+def process_sources(args: argparse.Namespace) -> None:
+    # Parse blueprints and blueprint books
+    if args.db_list:
+        print_db_records(args.db.list_top_level())
+    elif args.book_name:
+        assert args.db_hashes, 'Option --build-book requires the pages of the book (option -d)'
+        bp_hashes = [resolve_db_hash(args.db, hash_prefix) for hash_prefix in args.db_hashes]
+        if all(bp_hashes):
+            try:
+                print(build_book_from_db(args.db, args.book_name, bp_hashes, validate=not args.skip_validation))
+            except ValueError as err:
+                print(f'Not encoded: {args.book_name}: {err}', file=sys.stderr)
+    elif args.db_hashes:
+        for hash_prefix in args.db_hashes:
+            bp_hash = resolve_db_hash(args.db, hash_prefix)
+            if bp_hash and args.query:
+                query_blueprint(args.db.get(bp_hash), args, bp_hash[:12])
+            elif bp_hash and args.bom and args.index is None:
+                # Stored in the DB
+                print_bill_of_materials(args.db.bill_of_materials(bp_hash), args)
+            elif bp_hash:
+                process_blueprint_object(args.db.get(bp_hash), args)
+    elif args.bp_exchange_string:
+        assert not args.blueprint_files, 'Incompatible options -s and -f'
+        if uses_cache(args):
+            blueprint_obj = args.cache.parse_exchange_string_as_json_object(args.bp_exchange_string[0])
+            if args.query:
+                query_blueprint(blueprint_obj, args)
+            else:
+                process_blueprint_object(blueprint_obj, args)
         else:
-            info_from_blueprint_object(blueprint_obj, args.max_recursion_level)
+            blueprint_json_str = blueprints.parse_exchange_string(args.bp_exchange_string[0])
+            if args.query:
+                query_blueprint(blueprint_json_str, args)
+            else:
+                process_blueprint_json_string(blueprint_json_str, args)
+    elif args.blueprint_files:
+        assert not args.bp_exchange_string, 'Incompatible options -f and -s'
+        # The matches of a query are prefixed with their file name
+        print_out_filename = len(args.blueprint_files) > 1 and not args.query
+        for blueprint_file in args.blueprint_files:
+            if print_out_filename:
+                print('-' * 40)
+                print('File: ' + blueprint_file)
+            process_blueprint_file(blueprint_file, args)
 
 
-def main():
+def print_profiling_stats() -> None:
+    # On the standard error, so that the standard output is unchanged
+    for line in profiling.format_stats(profiling.stats()):
+        print(line, file=sys.stderr)
+
+
+def main(argv: list[str] = None) -> None:
     parser = argparse.ArgumentParser(description='Manage blueprint exchange strings from the game Factorio (https://www.factorio.com/)')
     # Options to control the source blueprint
     parser.add_argument('-s', '--from-string', metavar='EXCHANGE_STRING', dest='bp_exchange_string', nargs=1, help='From a blueprint exchange string')
     parser.add_argument('-f', '--from-file', metavar='FILE', dest='blueprint_files', nargs='+', help='From a file (or files) with one blueprint exchange string per line')
-    parser.add_argument('--index', metavar='INDEX_IN_BOOK', type=int, dest='index', help='Index of an element in a blueprint book')
+    parser.add_argument('-d', '--from-db', metavar='HASH', dest='db_hashes', nargs='+', help='From the local blueprint DB (a unique prefix of the hash is enough)')
+    parser.add_argument('--index', metavar='INDEX_IN_BOOK', type=index_path, dest='index', help='Index of an element in a blueprint book, or path of indices in nested books (e.g. 2/0/5)')
     # Options to control the output of the script. By default --info is assumed.
     parser.add_argument('--info', dest='info', action='store_true', help='Print out information regarding the blueprint (This is the default behavior)')
     parser.add_argument('--json', dest='json', action='store_true', help='Print out the blueprint as pretty-printed JSON')
     parser.add_argument('--raw', dest='raw', action='store_true', help='Print out the decoded exchange string')
     parser.add_argument('--exchange', dest='exchange', action='store_true', help='Print out the exchange string')
+    parser.add_argument('--import', dest='import_db', action='store_true', help='Store the blueprint in the local blueprint DB')
+    parser.add_argument('--build-book', metavar='BOOK_NAME', dest='book_name', help='Print out the exchange string of a new blueprint book made of the blueprints selected in the local DB (option -d)')
+    parser.add_argument('--db-list', dest='db_list', action='store_true', help='List the contents of the local blueprint DB')
     parser.add_argument('--name', dest='bp_name', action='store_true', help='Print out the name of the blueprint')
     parser.add_argument('--version', dest='bp_version', action='store_true', help='Print out the version of the game that generated the blueprint')
-    parser.add_argument('-l', '--max-recursion-level', metavar='LEVEL', type=int, dest='max_recursion_level', default=0, help='Max recursion level while traversing blueprint books. Default: 0 (only the first level)')
-    #parser.add_argument('--update-to-0.17', dest='update_to_0_17', action='store_true', help='(Old-fashioned) Update some entity names from 0.16 to 0.17 version')
-    args = parser.parse_args()
-
-    # Parse blueprints and blueprint books
-    if args.bp_exchange_string:
-        assert not args.blueprint_files, 'Incompatible options -s and -f'
-        blueprint_json_str = blueprints.parse_exchange_string(args.bp_exchange_string[0])
-        process_blueprint_json_string(blueprint_json_str, args)
-    elif args.blueprint_files:
-        assert not args.bp_exchange_string, 'Incompatible options -f and -s'
-        print_out_filename = len(args.blueprint_files) > 1
-        for blueprint_file in args.blueprint_files:
-            with open(blueprint_file, 'rt', encoding='ascii') as f:
-                if print_out_filename:
-                    print('-' * 40)
-                    print('File: ' + blueprint_file)
-                for bp_exchange_string in f:
-                    blueprint_json_str = blueprints.parse_exchange_string(bp_exchange_string.strip())
-                    process_blueprint_json_string(blueprint_json_str, args)
+    parser.add_argument('--rotate', metavar='QUARTER_TURNS', type=int, dest='rotate', help='Print out the exchange string of the blueprint rotated clockwise by a number of quarter turns')
+    parser.add_argument('--flip-horizontal', dest='flip_horizontal', action='store_true', help='Print out the exchange string of the blueprint mirrored left to right')
+    parser.add_argument('--flip-vertical', dest='flip_vertical', action='store_true', help='Print out the exchange string of the blueprint mirrored top to bottom')
+    parser.add_argument('--translate', metavar=('DX', 'DY'), type=number, nargs=2, dest='translate', help='Print out the exchange string of the blueprint moved by (DX, DY) tiles')
+    parser.add_argument('--validate', dest='validate', action='store_true', help='Print out the structural issues of the blueprint: missing keys, duplicate entity numbers, wires to missing entities, duplicate indices in books')
+    parser.add_argument('--no-validate', dest='skip_validation', action='store_true', help='Do not validate the blueprints before printing out their exchange string or importing them in the local DB (they are validated by default, and the invalid ones are skipped)')
+    parser.add_argument('--bounding-box', dest='bounding_box', action='store_true', help='Print out the bounding box of the entities and tiles of the blueprint')
+    parser.add_argument('--check-overlap', metavar='FILE', type=blueprint_file, nargs='?', const=True, dest='check_overlap', help='Print out the entities of the blueprint that overlap each other or, with FILE, the ones that overlap the entities of the blueprint of FILE (first exchange string of the file) placed at the offset of option --offset')
+    parser.add_argument('--offset', metavar=('DX', 'DY'), type=number, nargs=2, dest='offset', default=(0, 0), help='Position of the blueprint of --check-overlap FILE, in tiles. Default: 0 0')
+    parser.add_argument('--circuits', dest='circuits', action='store_true', help='Print out the red and green circuit networks and the copper wire networks of the blueprint, with their members (entity number, and :2 for the output of a combinator or the right side of a power switch). In JSON format with --json, in the DOT format of Graphviz with --dot')
+    parser.add_argument('--dot', dest='dot', action='store_true', help='With --circuits, print out the graph of the wires in the DOT format')
+    parser.add_argument('--bom', dest='bom', action='store_true', help='Print out the bill of materials: entity, module, item and tile counts, and size (the totals of all the blueprints of a book). In JSON format with --json')
+    parser.add_argument('--diff', metavar='FILE', type=blueprint_file, dest='diff', help='Print out the entities, tiles, book pages and keys added, removed or changed from the blueprint to the one of FILE (first exchange string of the file). With --json, print out the patch from one to the other')
+    parser.add_argument('--apply-patch', metavar='PATCH_FILE', type=patch_file, dest='patch', help='Print out the exchange string of the blueprint updated by a patch (made with --diff --json)')
+    parser.add_argument('--stamp', metavar=('COLUMNS', 'ROWS', 'DX', 'DY'), type=number, nargs=4, dest='stamp', help='Print out the exchange string of the blueprint repeated on a grid of COLUMNS x ROWS, with a spacing of (DX, DY) tiles')
+    parser.add_argument('--compression', metavar='PROFILE', type=compression_profile, dest='compression', help='Compression of the exchange strings printed out: fast, default, max, smallest (try several settings and keep the shortest string), or LEVEL[:WBITS[:MEM_LEVEL]]')
+    parser.add_argument('--compression-stats', dest='compression_stats', action='store_true', help='Print out the size of the exchange strings on the standard error')
+    parser.add_argument('--query', metavar='FILTER', type=query_filter, nargs='+', dest='query', help='Print out the blueprints, planners and books (at any level of nesting) that match all the filters FIELD OP VALUE. Fields: type, label, version, entities, entity, item, entity:NAME, item:NAME. E.g. --query "entity=beacon" "item=speed-module*" "version>=1.1"')
+    parser.add_argument('-l', '--max-recursion-level', metavar='LEVEL', type=int, dest='max_recursion_level', help='Max recursion level while traversing blueprint books. Default: 0 (only the first level), no limit with --query')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs', default=1, help='Number of worker processes used to decode the exchange strings read from files. Default: 1')
+    parser.add_argument('--migrate', metavar='VERSION', dest='migrate_to', choices=MIGRATION_VERSIONS, help='Update the entity names to a later version of the game. Choices: ' + ', '.join(MIGRATION_VERSIONS))
+    parser.add_argument('--update-to-0.17', dest='migrate_to', action='store_const', const='0.17', help='(Old-fashioned) Update some entity names from 0.16 to 0.17 version. Same as --migrate 0.17')
+    parser.add_argument('--cache', dest='use_cache', action='store_true', help='Keep the decoded exchange strings in a cache, in the directory of the local blueprint DB')
+    parser.add_argument('--cache-stats', dest='cache_stats', action='store_true', help='Print out the hits and misses of the cache on the standard error')
+    parser.add_argument('--profile', '--stats', dest='profile', action='store_true', help='Print out the time spent and the bytes processed in each stage (decode, inflate, parse, walk, serialize, deflate, encode) on the standard error, in total over all the exchange strings. With -j N, the decoding done in the worker processes is not counted')
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profiling.enable()
+    if args.max_recursion_level is None:
+        args.max_recursion_level = -1 if args.query else 0
+    args.query = query.Query(args.query) if args.query else None
+
+    args.db = open_db() if args.import_db or args.db_hashes or args.db_list or args.book_name else None
+    args.cache = open_cache() if args.use_cache or args.cache_stats else None
+    try:
+        process_sources(args)
+        if args.db:
+            args.db.commit()
+        if args.cache_stats:
+            print_cache_stats(args.cache)
+        if args.query:
+            print_query_stats(args.query)
+        if args.profile:
+            print_profiling_stats()
+    finally:
+        if args.db:
+            args.db.close()
+        if args.cache:
+            args.cache.close()
 
 
 if __name__ == "__main__":
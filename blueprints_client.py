@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Thin client of blueprints_server.py, with the same command line as blueprints.py
+
+  The command is run by the server, which spares the start-up of a new Python process and the imports. If no server
+  is running, the command is run by this process, as blueprints.py would.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import os
+import sys
+from factorio_game import service_client
+
+
+SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def main(argv: list[str] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        client = service_client.Client(service_client.default_address(SCRIPT_PATH))
+    except OSError:
+        import blueprints
+        blueprints.main(argv)
+        return
+    with client:
+        result = client.run_cli(argv, os.getcwd(), os.path.basename(sys.argv[0]))
+    sys.stdout.write(result['stdout'])
+    sys.stderr.write(result['stderr'])
+    sys.exit(result['status'])
+
+
+if __name__ == "__main__":
+    main()
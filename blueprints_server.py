@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Resident service for blueprints.py: decode, encode and print out information on blueprint exchange strings without
+starting a new process for each of them (see module factorio_game.service, and the client blueprints_client.py)
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import argparse
+import asyncio
+import os
+import blueprints
+from factorio_game import service, service_client
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Resident service for blueprints.py, see blueprints_client.py')
+    parser.add_argument('--address', metavar='ADDRESS', dest='address', default=service_client.default_address(blueprints.SCRIPT_PATH), help=f'Path of a unix socket, or HOST:PORT. Default: ${service_client.ADDRESS_ENV_VAR}, or else {service_client.SOCKET_FILENAME} in the directory of the script')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs', default=os.cpu_count() or 1, help='Number of worker processes. Default: the number of CPUs')
+    parser.add_argument('--batch-size', metavar='N', type=int, dest='batch_size', default=service.DEFAULT_BATCH_SIZE, help=f'Max number of requests processed together by a worker. Default: {service.DEFAULT_BATCH_SIZE}')
+    parser.add_argument('--batch-delay', metavar='MS', type=float, dest='batch_delay', default=1000 * service.DEFAULT_BATCH_DELAY, help=f'Max time to wait for the requests of a batch, in milliseconds. Default: {1000 * service.DEFAULT_BATCH_DELAY}')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='Do not keep the decoded exchange strings in the cache of the local blueprint DB')
+    args = parser.parse_args(argv)
+
+    cache_directory = None
+    if args.use_cache:
+        blueprints.create_db_directories()
+        cache_directory = blueprints.full_db_path()
+    try:
+        asyncio.run(service.serve(args.address, args.jobs, cache_directory, 'blueprints', args.batch_size, args.batch_delay / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Entry point of python -m factorio_game (see module cli)
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+from factorio_game import cli
+
+
+if __name__ == "__main__":
+    cli.main()
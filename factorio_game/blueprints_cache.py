@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Persistent cache of decoded blueprint exchange strings
+
+  The JSON objects decoded from exchange strings are stored in a compact binary form (module marshal, about three
+  times faster to load than decoding the exchange string), keyed by a hash of the exchange string. The cache is an
+  SQLite database next to the local blueprint DB. Its size is bounded: the least recently used entries are evicted.
+  The hits and misses are counted, per instance and in total in the database. The total size of the entries is kept in
+  the database too (counter 'size', updated with the entries), so that adding an entry does not sum all of them. The
+  database is in WAL mode, and waits for the locks of the other processes (e.g. the workers of module service) up to
+  BUSY_TIMEOUT seconds.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import hashlib
+import marshal
+import os
+import sqlite3
+import time
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+CACHE_FILENAME = 'decoded_cache.sqlite3'
+DEFAULT_CACHE_MAX_SIZE = 64 << 20         # Bytes of marshaled data
+BUSY_TIMEOUT = 5.0                        # Seconds
+_MARSHAL_VERSION = 4
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS decoded (
+    key BLOB PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS decoded_last_used ON decoded(last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    size: int                   # Bytes of marshaled data
+
+
+def cache_key(exchange_str: str) -> bytes:
+    return hashlib.sha256(exchange_str.strip().encode()).digest()
+
+
+class BlueprintsCache:
+    """
+    Cache of decoded exchange strings. Use as a context manager:
+
+        with BlueprintsCache(db_directory) as cache:
+            blueprint_obj = cache.parse_exchange_string_as_json_object(exchange_str)
+    """
+    def __init__(self, db_directory: str, max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        assert max_size >= 0, 'The size of the cache cannot be negative'
+        self.filepath = os.path.join(db_directory, CACHE_FILENAME)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(self.filepath, timeout=BUSY_TIMEOUT)
+        # The readers do not block the writer, and the other way around
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(_SCHEMA)
+        if self.connection.execute("SELECT 1 FROM counters WHERE name = 'size'").fetchone() is None:
+            # New cache, or cache created before the counter 'size'
+            self.connection.execute("INSERT INTO counters SELECT 'size', coalesce(sum(size), 0) FROM decoded")
+            self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def commit(self) -> None:
+        """Save the entries, and add the hits and misses to the totals"""
+        for name, value in (('hits', self.hits), ('misses', self.misses)):
+            self.connection.execute('INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value', (name, value))
+        self.hits = 0
+        self.misses = 0
+        self.connection.commit()
+
+    def get(self, exchange_str: str):
+        """The decoded JSON object, None if not in the cache"""
+        key = cache_key(exchange_str)
+        row = self.connection.execute('SELECT data FROM decoded WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute('UPDATE decoded SET last_used = ? WHERE key = ?', (time.time_ns(), key))
+        return marshal.loads(row[0])
+
+    def put(self, exchange_str: str, blueprint_obj) -> None:
+        data = marshal.dumps(blueprint_obj, _MARSHAL_VERSION)
+        if len(data) > self.max_size:
+            return
+        key = cache_key(exchange_str)
+        row = self.connection.execute('SELECT size FROM decoded WHERE key = ?', (key,)).fetchone()
+        self.connection.execute('INSERT OR REPLACE INTO decoded VALUES (?, ?, ?, ?)', (key, data, len(data), time.time_ns()))
+        self._add_size(len(data) - (row[0] if row else 0))
+        self.evict()
+
+    def parse_exchange_string_as_json_object(self, exchange_str: str):
+        """Same as blueprints.parse_exchange_string_as_json_object, through the cache"""
+        blueprint_obj = self.get(exchange_str)
+        if blueprint_obj is None:
+            blueprint_obj = blueprints.parse_exchange_string_as_json_object(exchange_str.strip())
+            self.put(exchange_str, blueprint_obj)
+        return blueprint_obj
+
+    def size(self) -> int:
+        return self.connection.execute("SELECT value FROM counters WHERE name = 'size'").fetchone()[0]
+
+    def _add_size(self, size: int) -> None:
+        self.connection.execute("UPDATE counters SET value = value + ? WHERE name = 'size'", (size,))
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in its maximum size"""
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+        evicted_keys = []
+        evicted_size = 0
+        for key, size in self.connection.execute('SELECT key, size FROM decoded ORDER BY last_used'):
+            evicted_keys.append((key,))
+            evicted_size += size
+            if evicted_size >= excess:
+                break
+        self.connection.executemany('DELETE FROM decoded WHERE key = ?', evicted_keys)
+        self._add_size(-evicted_size)
+
+    def clear(self) -> None:
+        self.connection.execute('DELETE FROM decoded')
+        self.connection.execute("UPDATE counters SET value = 0 WHERE name = 'size'")
+
+    def stats(self) -> CacheStats:
+        """Total hits and misses (including the ones of this instance), and contents of the cache"""
+        counters = dict(self.connection.execute('SELECT name, value FROM counters'))
+        entries = self.connection.execute('SELECT count(*) FROM decoded').fetchone()[0]
+        return CacheStats(counters.get('hits', 0) + self.hits, counters.get('misses', 0) + self.misses, entries, counters['size'])
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+Local database of blueprints from the game Factorio (https://www.factorio.com/)
+
+  The blueprints are content-addressed: the key of a blueprint is the hash of its canonical JSON form (see
+  blueprints.content_hash), so importing the same blueprint twice does not duplicate it. The data is stored in
+  an SQLite database, along with an index of the name, type, game version and entity count of each blueprint.
+
+  The pages of a blueprint book are stored as blueprints of their own, without their 'index' key, so that a
+  blueprint shared by several books is only stored once. The table book_contents links the books to their pages.
+
+  The bill of materials of each blueprint (see module bom) is stored as well, the one of a book being the sum of the
+  ones of its pages.
+
+  The blueprints are validated before they are imported (see module validation), so that the DB only holds
+  well-formed blueprints. The blueprints imported without validation are flagged as such (column validated).
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import json
+import os
+import sqlite3
+import zlib
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints, bom, book_builder, validation
+
+
+DB_FILENAME = 'blueprints.sqlite3'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blueprints (
+    hash TEXT PRIMARY KEY,
+    type TEXT,
+    label TEXT,
+    version INTEGER,
+    entity_count INTEGER NOT NULL,
+    tile_count INTEGER NOT NULL,
+    top_level INTEGER NOT NULL DEFAULT 0,
+    data BLOB NOT NULL,
+    validated INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blueprints_label ON blueprints(label);
+CREATE TABLE IF NOT EXISTS book_contents (
+    book_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    book_index INTEGER,
+    child_hash TEXT NOT NULL,
+    PRIMARY KEY (book_hash, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS book_contents_child ON book_contents(child_hash);
+CREATE TABLE IF NOT EXISTS bill_of_materials (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS deflate_segments (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    adler32 INTEGER NOT NULL,
+    length INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+
+_RECORD_COLUMNS = 'hash, type, label, version, entity_count, tile_count'
+
+
+class Record(NamedTuple):
+    hash: str
+    type: str                   # blueprints.Type value, None if unknown
+    label: str                  # None if no label
+    version: int                # Encoded game version, None if not available
+    entity_count: int           # Summed over the pages of a book
+    tile_count: int
+
+
+class BookPage(NamedTuple):
+    book_hash: str
+    position: int               # Position in the list of blueprints of the book
+    book_index: int             # The 'index' key of the page, None if not available
+    child_hash: str
+
+
+def _blueprint_subobj(blueprint_obj: dict) -> dict:
+    bp_type = blueprints.read_blueprint_type(blueprint_obj)
+    return blueprint_obj[bp_type.value] if bp_type else {}
+
+
+class _SegmentCache:
+    """Persistent cache of the compressed pages of books (see book_builder.generate_book_exchange_string)"""
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def get(self, key: str) -> book_builder.Segment:
+        row = self.connection.execute('SELECT data, adler32, length FROM deflate_segments WHERE key = ?', (key,)).fetchone()
+        return book_builder.Segment(*row) if row else None
+
+    def __setitem__(self, key: str, segment: book_builder.Segment) -> None:
+        self.connection.execute('INSERT OR REPLACE INTO deflate_segments VALUES (?, ?, ?, ?)', (key, *segment))
+
+
+class BlueprintsDB:
+    """
+    Connection to a local database of blueprints. Use as a context manager:
+
+        with BlueprintsDB(db_directory) as db:
+            bp_hash, is_new = db.import_blueprint(blueprint_obj)
+    """
+    def __init__(self, db_directory: str):
+        self.filepath = os.path.join(db_directory, DB_FILENAME)
+        self.connection = sqlite3.connect(self.filepath)
+        self.connection.executescript(_SCHEMA)
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(blueprints)')]
+        if 'validated' not in columns:
+            # DB created before the column: its blueprints are validated again when needed
+            self.connection.execute('ALTER TABLE blueprints ADD COLUMN validated INTEGER NOT NULL DEFAULT 0')
+        self.segment_cache = _SegmentCache(self.connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.commit()
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def _insert(self, blueprint_obj: dict, top_level: bool, validated: bool) -> tuple[str, bom.BillOfMaterials, bool]:
+        """Insert a blueprint and, recursively, the pages of a book. Return (hash, bill of materials, is_new)"""
+        bp_hash = blueprints.content_hash(blueprint_obj)
+        row = self.connection.execute('SELECT hash FROM blueprints WHERE hash = ?', (bp_hash,)).fetchone()
+        if row:
+            if top_level:
+                self.connection.execute('UPDATE blueprints SET top_level = 1 WHERE hash = ?', (bp_hash,))
+            if validated:
+                self._set_validated(bp_hash)
+            return bp_hash, self.bill_of_materials(bp_hash), False
+        bp_type = blueprints.read_blueprint_type(blueprint_obj)
+        bp_subobj = _blueprint_subobj(blueprint_obj)
+        stored_obj = blueprint_obj
+        if bp_type == blueprints.Type.BOOK:
+            # The pages are stored separately, and the book is stored with an empty list of blueprints
+            pages = []
+            page_boms = []
+            for position, page_obj in enumerate(bp_subobj.get('blueprints', [])):
+                child_obj = { key: value for key, value in page_obj.items() if key != 'index' }
+                child_hash, child_bom, _ = self._insert(child_obj, top_level=False, validated=validated)
+                pages.append((bp_hash, position, page_obj.get('index'), child_hash))
+                page_boms.append(child_bom)
+            self.connection.executemany('INSERT OR REPLACE INTO book_contents VALUES (?, ?, ?, ?)', pages)
+            stored_obj = { **blueprint_obj, bp_type.value: { **bp_subobj, 'blueprints': [] } }
+            bill = bom.merge(page_boms)
+        else:
+            bill = bom.bill_of_materials(blueprint_obj)
+        data = zlib.compress(blueprints.canonical_json_string(stored_obj).encode())
+        label = bp_subobj.get('label')
+        version = bp_subobj.get('version')
+        self.connection.execute(f'INSERT INTO blueprints ({_RECORD_COLUMNS}, top_level, data, validated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (bp_hash, bp_type.value if bp_type else None, label, version, bill.entity_count, bill.tile_count, int(top_level), data, int(validated)))
+        self._store_bill_of_materials(bp_hash, bill)
+        return bp_hash, bill, True
+
+    def import_blueprint(self, blueprint_obj: dict, validate: bool = True) -> tuple[str, bool]:
+        """
+        Store a blueprint object (of any type). Return its hash, and False if it was already in the DB. Raise ValueError,
+        and store nothing, if the blueprint is not valid (see validation.check). A book is validated as a whole, once.
+        """
+        if validate:
+            validation.check(blueprint_obj)
+        bp_hash, _, is_new = self._insert(blueprint_obj, top_level=True, validated=validate)
+        return bp_hash, is_new
+
+    def _set_validated(self, bp_hash: str) -> None:
+        """Flag a blueprint and, recursively, the pages of a book as validated"""
+        hashes = [bp_hash]
+        while hashes:
+            bp_hash = hashes.pop()
+            self.connection.execute('UPDATE blueprints SET validated = 1 WHERE hash = ?', (bp_hash,))
+            hashes.extend(page.child_hash for page in self.book_pages(bp_hash))
+
+    def is_validated(self, bp_hash: str) -> bool:
+        """True if the blueprint of a given hash was validated when imported"""
+        row = self.connection.execute('SELECT validated FROM blueprints WHERE hash = ?', (bp_hash,)).fetchone()
+        return bool(row and row[0])
+
+    def _store_bill_of_materials(self, bp_hash: str, bill: bom.BillOfMaterials) -> None:
+        self.connection.execute('INSERT OR REPLACE INTO bill_of_materials VALUES (?, ?)', (bp_hash, json.dumps(bom.to_json_object(bill))))
+
+    def bill_of_materials(self, bp_hash: str) -> bom.BillOfMaterials:
+        """The bill of materials of a given hash, without decoding the blueprint. None if not found."""
+        row = self.connection.execute('SELECT data FROM bill_of_materials WHERE hash = ?', (bp_hash,)).fetchone()
+        if row:
+            return bom.from_json_object(json.loads(row[0]))
+        # Not stored by the versions of the DB prior to the bills of materials
+        blueprint_obj = self.get(bp_hash)
+        if blueprint_obj is None:
+            return None
+        bill = bom.bill_of_materials(blueprint_obj)
+        self._store_bill_of_materials(bp_hash, bill)
+        return bill
+
+    def resolve(self, hash_prefix: str) -> str:
+        """Full hash from a unique prefix of it (like git). None if not found, ValueError if ambiguous."""
+        # The hashes are hexadecimal strings, therefore all the hashes starting with the prefix are lower than prefix + 'g'
+        rows = self.connection.execute('SELECT hash FROM blueprints WHERE hash >= ? AND hash < ? ORDER BY hash LIMIT 2',
+                                       (hash_prefix, hash_prefix + 'g')).fetchall()
+        if len(rows) > 1:
+            raise ValueError('Ambiguous blueprint hash prefix: ' + hash_prefix)
+        return rows[0][0] if rows else None
+
+    def lookup(self, bp_hash: str) -> Record:
+        row = self.connection.execute(f'SELECT {_RECORD_COLUMNS} FROM blueprints WHERE hash = ?', (bp_hash,)).fetchone()
+        return Record(*row) if row else None
+
+    def find_by_label(self, label: str) -> list[Record]:
+        rows = self.connection.execute(f'SELECT {_RECORD_COLUMNS} FROM blueprints WHERE label = ? ORDER BY hash', (label,))
+        return [Record(*row) for row in rows]
+
+    def list_top_level(self) -> list[Record]:
+        """The blueprints that were imported directly (not only as a page of a book)"""
+        rows = self.connection.execute(f'SELECT {_RECORD_COLUMNS} FROM blueprints WHERE top_level = 1 ORDER BY label, hash')
+        return [Record(*row) for row in rows]
+
+    def book_pages(self, book_hash: str) -> list[BookPage]:
+        rows = self.connection.execute('SELECT * FROM book_contents WHERE book_hash = ? ORDER BY position', (book_hash,))
+        return [BookPage(*row) for row in rows]
+
+    def parent_books(self, bp_hash: str) -> list[BookPage]:
+        rows = self.connection.execute('SELECT * FROM book_contents WHERE child_hash = ? ORDER BY book_hash, position', (bp_hash,))
+        return [BookPage(*row) for row in rows]
+
+    def get_json(self, bp_hash: str) -> str:
+        """The canonical JSON of the blueprint object of a given hash. None if not found."""
+        row = self.connection.execute('SELECT type, data FROM blueprints WHERE hash = ?', (bp_hash,)).fetchone()
+        if not row:
+            return None
+        bp_type, data = row
+        if bp_type == blueprints.Type.BOOK.value:
+            return blueprints.canonical_json_string(self.get(bp_hash))
+        # Blueprints other than books are stored as is
+        return zlib.decompress(data).decode()
+
+    def get(self, bp_hash: str) -> dict:
+        """The blueprint object of a given hash (books are reassembled from their pages). None if not found."""
+        row = self.connection.execute('SELECT type, data FROM blueprints WHERE hash = ?', (bp_hash,)).fetchone()
+        if not row:
+            return None
+        bp_type, data = row
+        blueprint_obj = blueprints.parse_json_string(zlib.decompress(data))
+        if bp_type == blueprints.Type.BOOK.value:
+            book_contents = blueprint_obj[bp_type]['blueprints']
+            for page in self.book_pages(bp_hash):
+                page_obj = self.get(page.child_hash)
+                if page.book_index is not None:
+                    page_obj['index'] = page.book_index
+                book_contents.append(page_obj)
+        return blueprint_obj
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Package-level command line: python -m factorio_game COMMAND [ARGS...]
+
+  The commands are the scripts of the repository (blueprints.py, maps.py...). Only the module of the selected command
+  is imported, and the scripts defer the imports that only some of their options need with lazy_import, so that
+  trivial queries such as --name or --version start up quickly.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import importlib
+import importlib.util
+import os
+import sys
+
+
+# The directory of the scripts, i.e. the parent directory of the package
+SCRIPTS_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PROG = 'python -m factorio_game'
+
+# Command -> (module, description)
+COMMANDS = {
+    'blueprints': ('blueprints', 'Manage blueprint exchange strings (same as blueprints.py)'),
+    'maps': ('maps', 'Parse map exchange strings (same as maps.py)'),
+    'server': ('blueprints_server', 'Resident service for blueprints.py (same as blueprints_server.py)'),
+    'client': ('blueprints_client', 'Thin client of the resident service (same as blueprints_client.py)'),
+    'benchmark': ('benchmark', 'Benchmarks of the exchange string codec (same as benchmark.py)'),
+}
+
+
+def lazy_import(name: str):
+    """
+    The module of a given name, which is only executed on the first access to one of its attributes. Used for the
+    modules that are slow to import and needed by some options only (e.g. the ones that depend on sqlite3).
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    assert spec is not None, 'Module not found: ' + name
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def usage() -> str:
+    lines = [f'usage: {PROG} COMMAND [ARGS...]', '', 'Commands:']
+    lines.extend(f'  {command:12} {description}' for command, (_, description) in COMMANDS.items())
+    lines.append('')
+    lines.append(f'See {PROG} COMMAND --help for the arguments of a command')
+    return '\n'.join(lines)
+
+
+def main(argv: list[str] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return
+    command = argv[0]
+    if command not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        print(f'{PROG}: error: unknown command {command}', file=sys.stderr)
+        sys.exit(2)
+    if SCRIPTS_PATH not in sys.path:
+        sys.path.insert(0, SCRIPTS_PATH)
+    module = importlib.import_module(COMMANDS[command][0])
+    # Name of the program in the messages of argparse
+    sys.argv[0] = f'{PROG} {command}'
+    module.main(argv[1:])
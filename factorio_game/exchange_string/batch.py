@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Batch processing of exchange strings, one per line, possibly across a pool of worker processes
+
+  The lines are grouped in chunks, and each chunk is processed by a worker. The results are yielded in input order,
+  and at most 2 * jobs chunks are in flight at any time, so that the input is consumed lazily.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import collections
+from collections.abc import Callable, Iterable, Iterator
+
+
+DEFAULT_BATCH_CHUNK_SIZE = 64
+
+
+def chunk_lines(lines: Iterable[str], chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE) -> Iterator[list[tuple[int, str]]]:
+    """Chunks of (1-based line number, stripped line). Blank lines are skipped."""
+    assert chunk_size >= 1, 'The chunk size must be at least 1'
+    chunk = []
+    for line_number, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        chunk.append((line_number, stripped))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_chunks(process_chunk: Callable[[list], list], chunks: Iterable[list], jobs: int = 1) -> Iterator:
+    """
+    Yield the results of process_chunk for each chunk, in order. process_chunk returns a list of results.
+
+    With jobs > 1, process_chunk must be picklable (a function of a module, or a functools.partial of it).
+    """
+    assert jobs >= 1, 'The number of jobs must be at least 1'
+    if jobs == 1:
+        for chunk in chunks:
+            yield from process_chunk(chunk)
+        return
+    # Imported on demand: multiprocessing is slow to import, and not needed with a single job
+    from concurrent.futures import ProcessPoolExecutor
+    max_pending_chunks = 2 * jobs
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(process_chunk, chunk))
+            if len(pending) >= max_pending_chunks:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
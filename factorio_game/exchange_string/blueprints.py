@@ -9,9 +9,15 @@ __version__ = "0.1"
 
 
 import base64
-import json
+import binascii
+import codecs
+import functools
+import hashlib
 import zlib
+from collections.abc import Iterable, Iterator
 from enum import Enum
+from typing import Any, NamedTuple
+from factorio_game.exchange_string import batch, json_backend, profiling
 
 
 DEFAULT_EXCHANGE_STRINGS_VERSION = 0
@@ -35,23 +41,352 @@ def _version_check(version: int):
 def parse_exchange_string(blueprint_base64: str) -> str:
     version = int(blueprint_base64[0])
     _version_check(version)
-    return zlib.decompress(base64.b64decode(blueprint_base64[1:])).decode()
+    if not profiling.enabled:
+        return zlib.decompress(base64.b64decode(blueprint_base64[1:])).decode()
+    start = profiling.clock()
+    compressed = base64.b64decode(blueprint_base64[1:])
+    profiling.record('decode', start, len(blueprint_base64), len(compressed))
+    start = profiling.clock()
+    blueprint_raw = zlib.decompress(compressed)
+    profiling.record('inflate', start, len(compressed), len(blueprint_raw))
+    return blueprint_raw.decode()
+
+
+def parse_json_string(blueprint_json_str: str) -> dict:
+    """Parse a JSON text with the JSON backend (see module json_backend)"""
+    if not profiling.enabled:
+        return json_backend.loads(blueprint_json_str)
+    start = profiling.clock()
+    blueprint_obj = json_backend.loads(blueprint_json_str)
+    profiling.record('parse', start, len(blueprint_json_str))
+    return blueprint_obj
 
 
 def parse_exchange_string_as_json_object(blueprint_base64: str) -> dict:
     blueprint_json_str = parse_exchange_string(blueprint_base64)
-    return json.loads(blueprint_json_str)
+    return parse_json_string(blueprint_json_str)
+
+
+class BatchResult(NamedTuple):
+    line_number: int            # 1-based position of the exchange string in the input
+    blueprint: Any              # JSON object (or JSON string if as_json_object=False), None on error
+    error: str                  # None on success
+
+
+DEFAULT_BATCH_CHUNK_SIZE = batch.DEFAULT_BATCH_CHUNK_SIZE
+_DECODING_ERRORS = (AssertionError, ValueError, binascii.Error, zlib.error)
+
+
+def _parse_exchange_string_chunk(chunk: list[tuple[int, str]], as_json_object: bool) -> list[BatchResult]:
+    results = []
+    for line_number, blueprint_base64 in chunk:
+        try:
+            blueprint = parse_exchange_string(blueprint_base64)
+            if as_json_object:
+                blueprint = parse_json_string(blueprint)
+            results.append(BatchResult(line_number, blueprint, None))
+        except _DECODING_ERRORS as err:
+            results.append(BatchResult(line_number, None, f'{type(err).__name__}: {err}'))
+    return results
+
+
+def parse_exchange_strings(exchange_strings: Iterable[str], jobs: int = 1, as_json_object: bool = True, chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE) -> Iterator[BatchResult]:
+    """
+    Decode a stream of exchange strings (e.g. the lines of a file), possibly across a pool of worker processes.
+
+    Blank lines are skipped. The results are yielded in input order, and a string that fails to decode yields
+    a result with an error message instead of interrupting the batch. At most 2 * jobs chunks are in flight
+    at any time, so the input is consumed lazily and memory stays bounded whatever the size of the input.
+    """
+    chunks = batch.chunk_lines(exchange_strings, chunk_size)
+    return batch.process_chunks(functools.partial(_parse_exchange_string_chunk, as_json_object=as_json_object), chunks, jobs)
+
+
+class ExchangeStringDecoder:
+    """
+    Decode an exchange string fed piece by piece (e.g. read from a file by chunks).
+
+    The base64 text and the compressed data are decoded on the fly, so that only the decoded JSON text is held in
+    memory. Call close() to get the JSON text.
+    """
+    def __init__(self):
+        self.version = None
+        self.decompressor = zlib.decompressobj()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.pending_base64 = ''
+        self.pieces = []
+
+    def feed(self, text: str) -> None:
+        if self.version is None and text:
+            self.version = int(text[0])
+            _version_check(self.version)
+            text = text[1:]
+        # Base64 decodes groups of 4 characters: keep the remainder for the next call
+        text = self.pending_base64 + text
+        split = len(text) - len(text) % 4
+        self._decompress(self._decode(text[:split]))
+        self.pending_base64 = text[split:]
+
+    @staticmethod
+    def _decode(text: str) -> bytes:
+        if not profiling.enabled:
+            return base64.b64decode(text)
+        start = profiling.clock()
+        data = base64.b64decode(text)
+        profiling.record('decode', start, len(text), len(data))
+        return data
+
+    def _decompress(self, data: bytes, final: bool = False) -> None:
+        profiled = profiling.enabled
+        start = profiling.clock() if profiled else 0.0
+        raw = self.decompressor.decompress(data)
+        if final:
+            raw += self.decompressor.flush()
+        if profiled:
+            profiling.record('inflate', start, len(data), len(raw))
+        self.pieces.append(self.text_decoder.decode(raw, final=final))
+
+    def close(self) -> str:
+        assert self.version is not None, 'Empty exchange string'
+        self._decompress(self._decode(self.pending_base64), final=True)
+        if not self.decompressor.eof:
+            raise zlib.error('Error -5 while decompressing data: incomplete or truncated stream')
+        blueprint_json_str = ''.join(self.pieces)
+        self.pieces = []
+        return blueprint_json_str
+
+
+DEFAULT_STREAM_CHUNK_SIZE = 1 << 20
+
+
+def parse_exchange_string_from_file(fp, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> str:
+    """Same as parse_exchange_string, for an exchange string read by chunks from a text file (up to the end of the file)"""
+    decoder = ExchangeStringDecoder()
+    for chunk in iter(lambda: fp.read(chunk_size), ''):
+        decoder.feed(chunk.strip())
+    return decoder.close()
+
+
+def read_exchange_strings(fp, as_json_object: bool = True, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[BatchResult]:
+    """
+    Sequential alternative to parse_exchange_strings, for a text file with one exchange string per line.
+
+    The file is read by chunks and each exchange string is decoded on the fly, so that the memory usage does not
+    depend on the length of the lines: this is the option of choice for huge blueprint books.
+    """
+    assert chunk_size >= 1, 'The chunk size must be at least 1'
+    line_number = 1
+    decoder = None
+    error = None
+
+    def result() -> BatchResult:
+        if error:
+            return BatchResult(line_number, None, error)
+        try:
+            blueprint = decoder.close()
+            if as_json_object:
+                blueprint = parse_json_string(blueprint)
+            return BatchResult(line_number, blueprint, None)
+        except _DECODING_ERRORS as err:
+            return BatchResult(line_number, None, f'{type(err).__name__}: {err}')
+
+    for chunk in iter(lambda: fp.read(chunk_size), ''):
+        for part_idx, part in enumerate(chunk.split('\n')):
+            if part_idx > 0:
+                # End of line
+                if decoder is not None:
+                    yield result()
+                    decoder = None
+                    error = None
+                line_number += 1
+            part = part.strip()
+            if not part:
+                continue
+            if decoder is None:
+                decoder = ExchangeStringDecoder()
+            if error is None:
+                try:
+                    decoder.feed(part)
+                except _DECODING_ERRORS as err:
+                    error = f'{type(err).__name__}: {err}'
+    if decoder is not None:
+        yield result()
+
+
+class CompressionProfile(NamedTuple):
+    level: int                  # 0 to 9, or -1 (zlib.Z_DEFAULT_COMPRESSION)
+    wbits: int = zlib.MAX_WBITS # 9 to 15: the game reads zlib streams, so raw deflate and gzip are not allowed
+    mem_level: int = zlib.DEF_MEM_LEVEL
+    strategy: int = zlib.Z_DEFAULT_STRATEGY
+
+
+COMPRESSION_PROFILES = {
+    'fast': CompressionProfile(1),
+    'default': CompressionProfile(zlib.Z_DEFAULT_COMPRESSION),
+    'max': CompressionProfile(9, zlib.MAX_WBITS, 9),
+}
+# Try all the candidates and keep the shortest output
+SMALLEST = 'smallest'
+_SMALLEST_CANDIDATES = [
+    CompressionProfile(9, zlib.MAX_WBITS, 9),
+    CompressionProfile(9, zlib.MAX_WBITS, 9, zlib.Z_FILTERED),
+    CompressionProfile(6, zlib.MAX_WBITS, 9),
+]
+
+
+def parse_compression_profile(profile_str: str):
+    """A profile name (fast, default, max, smallest), or LEVEL[:WBITS[:MEM_LEVEL]]"""
+    if profile_str == SMALLEST:
+        return SMALLEST
+    if profile_str in COMPRESSION_PROFILES:
+        return COMPRESSION_PROFILES[profile_str]
+    try:
+        numbers = [int(number) for number in profile_str.split(':')]
+        assert len(numbers) <= 3, 'Too many values'
+        profile = CompressionProfile(*numbers)
+        _compression_profile_check(profile)
+    except (AssertionError, ValueError) as err:
+        raise ValueError('Invalid compression profile: ' + profile_str + ' (' + str(err) + '). Expected one of ' + ', '.join([*COMPRESSION_PROFILES, SMALLEST]) + ', or LEVEL[:WBITS[:MEM_LEVEL]]')
+    return profile
+
+
+def _compression_profile_check(profile: CompressionProfile):
+    assert -1 <= profile.level <= 9, 'Compression level ' + str(profile.level) + ' is not in [-1, 9]'
+    assert 9 <= profile.wbits <= zlib.MAX_WBITS, 'Window size ' + str(profile.wbits) + ' is not in [9, 15]'
+    assert 1 <= profile.mem_level <= 9, 'Memory level ' + str(profile.mem_level) + ' is not in [1, 9]'
 
 
-def generate_exchange_string(blueprint_raw_string: str, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION) -> str:
+def _compressobj(profile: CompressionProfile):
+    return zlib.compressobj(profile.level, zlib.DEFLATED, profile.wbits, profile.mem_level, profile.strategy)
+
+
+def compress(data: bytes, compression = None) -> bytes:
+    """zlib stream of the data, with a compression profile (or SMALLEST). None: default profile (same as zlib.compress)"""
+    if compression is None:
+        return zlib.compress(data)
+    if compression == SMALLEST:
+        candidates = (compress(data, profile) for profile in _SMALLEST_CANDIDATES)
+        smallest = min(candidates, key=len)
+        assert zlib.decompress(smallest) == data, 'Compression error'
+        return smallest
+    _compression_profile_check(compression)
+    compressor = _compressobj(compression)
+    return compressor.compress(data) + compressor.flush()
+
+
+def generate_exchange_string(blueprint_raw_string: str, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION, compression = None) -> str:
     _version_check(exchange_str_version)
-    return str(exchange_str_version) + base64.b64encode(zlib.compress(blueprint_raw_string.encode())).decode()
+    if not profiling.enabled:
+        return str(exchange_str_version) + base64.b64encode(compress(blueprint_raw_string.encode(), compression)).decode()
+    blueprint_raw = blueprint_raw_string.encode()
+    start = profiling.clock()
+    compressed = compress(blueprint_raw, compression)
+    profiling.record('deflate', start, len(blueprint_raw), len(compressed))
+    start = profiling.clock()
+    base64_str = base64.b64encode(compressed).decode()
+    profiling.record('encode', start, len(compressed), len(base64_str))
+    return str(exchange_str_version) + base64_str
+
+
+class EncodingStats(NamedTuple):
+    json_size: int              # Size of the JSON text (bytes)
+    compressed_size: int        # Size of the zlib stream (bytes)
+    exchange_string_size: int   # Length of the exchange string
+
+    @property
+    def ratio(self) -> float:
+        """Exchange string size over JSON size"""
+        return self.exchange_string_size / self.json_size if self.json_size else 0.0
+
+
+def encoding_stats(blueprint_raw_string: str, exchange_string: str) -> EncodingStats:
+    base64_str = exchange_string[1:]
+    padding = len(base64_str) - len(base64_str.rstrip('='))
+    compressed_size = len(base64_str) * 3 // 4 - padding
+    return EncodingStats(len(blueprint_raw_string.encode()), compressed_size, len(exchange_string))
+
+
+class ExchangeStringWriter:
+    """
+    Write an exchange string to a text file, from the JSON text written piece by piece.
+
+    The JSON text is compressed and encoded on the fly, so that neither the JSON text, nor the compressed data,
+    nor the exchange string need to be held in memory as a whole. Call close() to write the end of the string.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, fp, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION, compression: CompressionProfile = None):
+        _version_check(exchange_str_version)
+        assert compression != SMALLEST, 'The smallest output cannot be searched for while streaming'
+        self.fp = fp
+        self.compressor = _compressobj(compression) if compression is not None else zlib.compressobj()
+        self.pending_text = []
+        self.pending_text_size = 0
+        self.pending_bytes = b''
+        fp.write(str(exchange_str_version))
+
+    def write(self, text: str) -> None:
+        self.pending_text.append(text)
+        self.pending_text_size += len(text)
+        if self.pending_text_size >= self.CHUNK_SIZE:
+            self._flush_text()
+
+    def _flush_text(self, final: bool = False) -> None:
+        text = ''.join(self.pending_text).encode()
+        profiled = profiling.enabled
+        start = profiling.clock() if profiled else 0.0
+        data = self.compressor.compress(text)
+        if final:
+            data += self.compressor.flush()
+        if profiled:
+            profiling.record('deflate', start, len(text), len(data))
+        self._write_compressed(data)
+        self.pending_text = []
+        self.pending_text_size = 0
+
+    def _write_compressed(self, data: bytes, final: bool = False) -> None:
+        # Base64 encodes groups of 3 bytes: keep the remainder for the next call
+        data = self.pending_bytes + data
+        split = len(data) if final else len(data) - len(data) % 3
+        profiled = profiling.enabled
+        start = profiling.clock() if profiled else 0.0
+        base64_str = base64.b64encode(data[:split]).decode()
+        if profiled:
+            profiling.record('encode', start, split, len(base64_str))
+        self.fp.write(base64_str)
+        self.pending_bytes = data[split:]
+
+    def close(self) -> None:
+        self._flush_text(final=True)
+        self._write_compressed(b'', final=True)
+
 
+def write_exchange_string(blueprint_raw_string: str, fp, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION, compression: CompressionProfile = None) -> None:
+    """Same as generate_exchange_string, written by chunks to a text file"""
+    writer = ExchangeStringWriter(fp, exchange_str_version, compression)
+    for start in range(0, len(blueprint_raw_string), ExchangeStringWriter.CHUNK_SIZE):
+        writer.write(blueprint_raw_string[start:start + ExchangeStringWriter.CHUNK_SIZE])
+    writer.close()
 
-def generate_exchange_string_from_json_object(blueprint_obj: dict, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION) -> str:
-    # Ensure the most compact JSON format
-    json_str = json.dumps(blueprint_obj, sort_keys=True, separators=(',', ':'))
-    return generate_exchange_string(json_str, exchange_str_version)
+
+def canonical_json_string(blueprint_obj: dict) -> str:
+    # The most compact JSON format, with a stable order of the keys. The same text whatever the JSON backend.
+    if not profiling.enabled:
+        return json_backend.canonical_dumps(blueprint_obj)
+    start = profiling.clock()
+    blueprint_json_str = json_backend.canonical_dumps(blueprint_obj)
+    profiling.record('serialize', start, 0, len(blueprint_json_str))
+    return blueprint_json_str
+
+
+def content_hash(blueprint_obj: dict) -> str:
+    """Hash of the canonical JSON form of a blueprint object (hexadecimal SHA-256)"""
+    return hashlib.sha256(canonical_json_string(blueprint_obj).encode()).hexdigest()
+
+
+def generate_exchange_string_from_json_object(blueprint_obj: dict, exchange_str_version = DEFAULT_EXCHANGE_STRINGS_VERSION, compression = None) -> str:
+    """compression: a CompressionProfile, SMALLEST, or None for the default profile"""
+    return generate_exchange_string(canonical_json_string(blueprint_obj), exchange_str_version, compression)
 
 
 def decode_game_version(version: int):
@@ -95,3 +430,61 @@ def read_blueprint_type(blueprint_obj: dict) -> Type:
 def read_blueprint_type_str(blueprint_obj: dict) -> str:
     bp_type = read_blueprint_type(blueprint_obj)
     return bp_type.value if bp_type else 'unknown'
+
+
+class BookNode(NamedTuple):
+    path: tuple                 # Indices of the element in the nested books (empty for the top level object, -1 for a page without index)
+    type: Type                  # None if unknown
+    label: str                  # None if no label
+    node: dict                  # The blueprint object
+
+
+def walk_blueprint_object(blueprint_obj: dict, max_recursion_level: int = -1) -> Iterator[BookNode]:
+    """
+    The blueprint object and, if it is a book, its contents (depth first, in the order of the books). The contents of
+    the books nested at a level greater than max_recursion_level are skipped (0: only the first level of a book),
+    max_recursion_level < 0: no limit. The walk is iterative, so there is no limit either on the nesting of the books.
+    """
+    stack = [((), blueprint_obj)]
+    while stack:
+        path, obj = stack.pop()
+        bp_type = read_blueprint_type(obj)
+        subobj = obj[bp_type.value] if bp_type else {}
+        yield BookNode(path, bp_type, subobj.get('label'), obj)
+        if bp_type == Type.BOOK and (max_recursion_level < 0 or len(path) <= max_recursion_level):
+            pages = subobj.get('blueprints', [])
+            stack.extend((path + (page.get('index', -1),), page) for page in reversed(pages))
+
+
+def contents_by_index(book_obj: dict) -> dict:
+    """Index -> page of a blueprint book (the pages without index are left out). Empty if not a book."""
+    if read_blueprint_type(book_obj) != Type.BOOK:
+        return {}
+    pages = book_obj[Type.BOOK.value].get('blueprints', [])
+    # In case of duplicate indices, the first page is the one found (same as a linear search)
+    return { page['index']: page for page in reversed(pages) if 'index' in page }
+
+
+def find_path(blueprint_obj: dict, path: tuple) -> dict:
+    """The element at a path of indices in nested books, e.g. (2, 0, 5). None if not found."""
+    obj = blueprint_obj
+    for index in path:
+        obj = contents_by_index(obj).get(index)
+        if obj is None:
+            return None
+    return obj
+
+
+def parse_index_path(path_str: str) -> tuple:
+    """Parse a path of indices in nested books, e.g. '2/0/5'. Raise ValueError if invalid."""
+    try:
+        path = tuple(int(index_str) for index_str in path_str.split('/'))
+    except ValueError:
+        raise ValueError('Invalid index path: ' + path_str + ' (expected indices separated by /, e.g. 2/0/5)')
+    if any(index < 0 for index in path):
+        raise ValueError('Invalid index path: ' + path_str + ' (negative index)')
+    return path
+
+
+def format_index_path(path: tuple) -> str:
+    return '/'.join(str(index) for index in path)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Bill of materials of blueprints: entity, item, module and tile counts, and footprint
+
+  The bill of materials of a blueprint book is the sum of the ones of its pages (recursively), computed in a single
+  pass over the book. It is a named tuple of numbers and of dictionaries (name -> count), which converts to and
+  from a JSON object, so that it can be stored (see the blueprint DB) and reused without decoding the blueprints again.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import collections
+import operator
+import re
+import sys
+from collections.abc import Iterable
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+_MODULE_REGEX = re.compile(r'.*-module(-\d+)?')
+_NAME = operator.itemgetter('name')
+
+
+def _names(elements: list) -> list[str]:
+    """The names of the entities or tiles. The elements without a name are left out (the blueprint may not be validated)."""
+    try:
+        names = list(map(_NAME, elements))
+    except (KeyError, TypeError):
+        names = [element.get('name') if type(element) is dict else None for element in elements]
+    return names if all(type(name) is str for name in names) else [name for name in names if type(name) is str]
+
+
+class BillOfMaterials(NamedTuple):
+    blueprint_count: int        # 1 for a blueprint, the number of blueprints for a book (recursively), 0 otherwise
+    entity_count: int
+    tile_count: int
+    width: float                # Size of the bounding box of the entity centers and tiles (the largest one of the pages of a book)
+    height: float
+    entities: dict              # Entity name -> count, by decreasing count
+    items: dict                 # Item name -> count (modules, fuel...), by decreasing count
+    modules: dict               # The modules among the items
+    tiles: dict                 # Tile name -> count, by decreasing count
+
+
+def _item_count(item: dict) -> int:
+    # Since 2.0, one record per item with the list of its positions in the inventories (each with an optional count)
+    positions = item.get('items', {})
+    return sum(position.get('count', 1) for inventory in positions.values() if isinstance(inventory, list) for position in inventory)
+
+
+class _Accumulator:
+    """Running totals of a bill of materials"""
+    def __init__(self):
+        self.blueprint_count = 0
+        self.entity_count = 0
+        self.tile_count = 0
+        self.width = 0
+        self.height = 0
+        self.entities = collections.Counter()
+        self.items = collections.Counter()
+        self.tiles = collections.Counter()
+
+    def add_blueprint(self, blueprint_subobj: dict) -> None:
+        entities = blueprint_subobj.get('entities', [])
+        tiles = blueprint_subobj.get('tiles', [])
+        self.blueprint_count += 1
+        self.entity_count += len(entities)
+        self.tile_count += len(tiles)
+        self.entities.update(_names(entities))
+        self.tiles.update(_names(tiles))
+        for entity_items in [entity['items'] for entity in entities if 'items' in entity]:
+            if isinstance(entity_items, dict):
+                # Before 2.0: item name -> count
+                self.items.update(entity_items)
+            else:
+                for item in entity_items:
+                    self.items[item['id']['name']] += _item_count(item)
+        # Same footprint as transforms.bounding_box: the entity centers, and the tiles (of size 1)
+        positions = [entity['position'] for entity in entities if 'position' in entity]
+        tile_positions = [tile['position'] for tile in tiles if 'position' in tile]
+        xs = [position['x'] for position in positions] + [position['x'] + offset for position in tile_positions for offset in (0, 1)]
+        ys = [position['y'] for position in positions] + [position['y'] + offset for position in tile_positions for offset in (0, 1)]
+        if xs:
+            self.width = max(self.width, max(xs) - min(xs))
+            self.height = max(self.height, max(ys) - min(ys))
+
+    def add(self, bom: BillOfMaterials) -> None:
+        self.blueprint_count += bom.blueprint_count
+        self.entity_count += bom.entity_count
+        self.tile_count += bom.tile_count
+        self.width = max(self.width, bom.width)
+        self.height = max(self.height, bom.height)
+        self.entities.update(bom.entities)
+        self.items.update(bom.items)
+        self.tiles.update(bom.tiles)
+
+    def result(self) -> BillOfMaterials:
+        items = _interned_counts(self.items)
+        modules = { name: count for name, count in items.items() if _MODULE_REGEX.fullmatch(name) }
+        return BillOfMaterials(self.blueprint_count, self.entity_count, self.tile_count, self.width, self.height,
+                               _interned_counts(self.entities), items, modules, _interned_counts(self.tiles))
+
+
+def _interned_counts(counter: collections.Counter) -> dict:
+    # The same few hundred names recur across all the bills of materials: keep one copy of each
+    return { sys.intern(name): count for name, count in counter.most_common() }
+
+
+def bill_of_materials(blueprint_obj: dict) -> BillOfMaterials:
+    """Bill of materials of a blueprint, or of all the blueprints of a book. The planners have an empty bill of materials."""
+    accumulator = _Accumulator()
+    stack = [blueprint_obj]
+    while stack:
+        obj = stack.pop()
+        bp_type = blueprints.read_blueprint_type(obj)
+        if bp_type == blueprints.Type.BP:
+            accumulator.add_blueprint(obj['blueprint'])
+        elif bp_type == blueprints.Type.BOOK:
+            stack.extend(obj['blueprint_book'].get('blueprints', []))
+    return accumulator.result()
+
+
+def merge(boms: Iterable[BillOfMaterials]) -> BillOfMaterials:
+    """Bill of materials of a book from the ones of its pages"""
+    accumulator = _Accumulator()
+    for bom in boms:
+        accumulator.add(bom)
+    return accumulator.result()
+
+
+def to_json_object(bom: BillOfMaterials) -> dict:
+    return bom._asdict()
+
+
+def from_json_object(bom_obj: dict) -> BillOfMaterials:
+    fields = { **bom_obj }
+    for key in ('entities', 'items', 'modules', 'tiles'):
+        fields[key] = _interned_counts(collections.Counter(bom_obj[key]))
+    return BillOfMaterials(**fields)
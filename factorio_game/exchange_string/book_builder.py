@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Incremental generation of the exchange string of a blueprint book
+
+  The canonical JSON of a book is the concatenation of a header, of the JSON of each page, and of a trailer. Each
+  piece is compressed as an independent segment of raw deflate data, ending with a full flush so that it does not
+  refer to the data before it. The zlib stream of the book is then assembled from those segments, and the segments
+  of the pages can be cached: when one page of a large book is edited, only that page is recompressed.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import base64
+import json
+import struct
+import zlib
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+_ADLER32_BASE = 65521
+# zlib header: deflate with a 32K window, default compression level
+_ZLIB_HEADER = b'\x78\x9c'
+
+
+class Segment(NamedTuple):
+    data: bytes                 # Raw deflate data, ending with a full flush
+    adler32: int                # Checksum of the uncompressed text
+    length: int                 # Length of the uncompressed text
+
+
+class Page(NamedTuple):
+    cache_key: str              # Identifies the contents of the page (e.g. the hash of the blueprint). None: no caching
+    index: int                  # The 'index' key of the page in the book
+    get_json: Callable          # () -> canonical JSON of the blueprint object, only called on a cache miss
+
+
+def adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """Checksum of the concatenation of two texts, from their checksums (same as adler32_combine() in zlib)"""
+    rem = length2 % _ADLER32_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % _ADLER32_BASE
+    sum1 += (adler2 & 0xFFFF) + _ADLER32_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + _ADLER32_BASE - rem
+    sum1 %= _ADLER32_BASE
+    sum2 %= _ADLER32_BASE
+    return sum1 | (sum2 << 16)
+
+
+def compress_segment(text: str) -> Segment:
+    data = text.encode()
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return Segment(compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH), zlib.adler32(data), len(data))
+
+
+def join_segments(segments: Iterable[Segment]) -> bytes:
+    """Assemble a zlib stream from deflate segments"""
+    chunks = [_ZLIB_HEADER]
+    checksum = zlib.adler32(b'')
+    for segment in segments:
+        chunks.append(segment.data)
+        checksum = adler32_combine(checksum, segment.adler32, segment.length)
+    # Final (empty) deflate block
+    chunks.append(zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH))
+    chunks.append(struct.pack('>I', checksum))
+    return b''.join(chunks)
+
+
+def page_json(blueprint_json_str: str, bp_type: blueprints.Type, index: int) -> str:
+    """Canonical JSON of a page of a book, from the canonical JSON of a blueprint object that only has a type key"""
+    index_member = '"index":' + json.dumps(index)
+    # Keep the keys sorted
+    if bp_type.value < 'index':
+        return blueprint_json_str[:-1] + ',' + index_member + '}'
+    return '{' + index_member + ',' + blueprint_json_str[1:]
+
+
+def _split_book_json(book_obj: dict) -> tuple[str, str]:
+    """Canonical JSON of a book without its pages, split where the pages go"""
+    assert blueprints.read_blueprint_type(book_obj) == blueprints.Type.BOOK, 'Not a blueprint book'
+    empty_book_obj = { **book_obj, 'blueprint_book': { **book_obj['blueprint_book'], 'blueprints': [] } }
+    header, trailer = blueprints.canonical_json_string(empty_book_obj).split('"blueprints":[]', 1)
+    return header + '"blueprints":[', ']' + trailer
+
+
+def _page_segment(page: Page, is_last: bool, cache) -> Segment:
+    cache_key = f'{page.cache_key}:{page.index}:{int(is_last)}' if cache is not None and page.cache_key else None
+    segment = cache.get(cache_key) if cache_key else None
+    if segment is None:
+        blueprint_json_str = page.get_json()
+        page_obj = blueprints.parse_json_string(blueprint_json_str)
+        bp_type = blueprints.read_blueprint_type(page_obj)
+        if bp_type and len(page_obj) == 1:
+            text = page_json(blueprint_json_str, bp_type, page.index)
+        else:
+            text = blueprints.canonical_json_string({ **page_obj, 'index': page.index })
+        segment = compress_segment(text if is_last else text + ',')
+        if cache_key:
+            cache[cache_key] = segment
+    return segment
+
+
+def generate_book_exchange_string(book_obj: dict, pages: list[Page], cache = None, exchange_str_version = blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION) -> str:
+    """
+    Exchange string of a blueprint book, given its header (book_obj, the 'blueprints' list is ignored) and its pages.
+
+    The cache is a mapping (supporting get and item assignment) of the compressed pages. With a cache, the exchange
+    string is identical to the one generated without it.
+    """
+    blueprints._version_check(exchange_str_version)
+    header, trailer = _split_book_json(book_obj)
+    segments = [compress_segment(header)]
+    segments.extend(_page_segment(page, position == len(pages) - 1, cache) for position, page in enumerate(pages))
+    segments.append(compress_segment(trailer))
+    return str(exchange_str_version) + base64.b64encode(join_segments(segments)).decode()
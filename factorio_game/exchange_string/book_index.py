@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Lazy table of contents of blueprint books, built directly on the decoded JSON text of an exchange string
+
+  The JSON text is scanned without building the blueprint objects: only the type, label, version and index of each
+  blueprint are kept, and the entities (which make up most of the payload) are skipped over, each JSON object being
+  discarded as soon as it is decoded. Each entry records the span of its blueprint in the JSON text, so that a single
+  page of a book can be fully decoded later on.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import json
+import re
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_TYPE_KEYS = { bp_type.value: bp_type for bp_type in blueprints.Type }
+
+# The skipping scanner relies on the C implementation of the JSON scanner. Each JSON object is discarded (replaced by
+# its length) as soon as it is decoded: the strings, numbers and lists inside an object are still decoded, but the
+# objects are never kept, so skipping over a blueprint is faster than json.loads and holds little memory.
+_scan_value = json.JSONDecoder().scan_once
+_scan_and_discard_value = json.JSONDecoder(object_hook=len).scan_once
+
+
+class BookEntry(NamedTuple):
+    index: int                  # Index in the parent book, -1 if not available
+    type: blueprints.Type       # None if unknown
+    label: str                  # None if no label
+    version: int                # Encoded game version, None if not available
+    start: int                  # Span of the blueprint object in the JSON text
+    end: int
+    contents_start: int         # Span of the 'blueprints' list of a book, -1 for other types
+    contents_end: int
+    contents: tuple             # Entries of a book (tuple of BookEntry), None if not read or not a book
+
+
+def _skip_whitespace(json_str: str, pos: int) -> int:
+    return _WHITESPACE.match(json_str, pos).end()
+
+
+def _scan(scanner, json_str: str, pos: int):
+    try:
+        return scanner(json_str, pos)
+    except StopIteration as err:
+        raise json.JSONDecodeError('Expecting value', json_str, err.value) from None
+
+
+def _expect(json_str: str, pos: int, char: str) -> int:
+    if json_str[pos:pos + 1] != char:
+        raise json.JSONDecodeError(f"Expecting '{char}'", json_str, pos)
+    return _skip_whitespace(json_str, pos + 1)
+
+
+def _walk_object(json_str: str, pos: int, read_member) -> int:
+    """Call read_member(key, value_start) -> value_end on each member of the JSON object starting at pos. Return the end of the object."""
+    pos = _expect(json_str, pos, '{')
+    if json_str[pos:pos + 1] == '}':
+        return pos + 1
+    while True:
+        key, pos = _scan(_scan_value, json_str, pos)
+        pos = _expect(json_str, _skip_whitespace(json_str, pos), ':')
+        pos = _skip_whitespace(json_str, read_member(key, pos))
+        if json_str[pos:pos + 1] == '}':
+            return pos + 1
+        pos = _expect(json_str, pos, ',')
+
+
+def _read_contents(json_str: str, pos: int, contents_depth: int) -> tuple[tuple, int]:
+    entries = []
+    pos = _expect(json_str, pos, '[')
+    if json_str[pos:pos + 1] == ']':
+        return tuple(entries), pos + 1
+    while True:
+        entry = read_header(json_str, pos, contents_depth)
+        entries.append(entry)
+        pos = _skip_whitespace(json_str, entry.end)
+        if json_str[pos:pos + 1] == ']':
+            return tuple(entries), pos + 1
+        pos = _expect(json_str, pos, ',')
+
+
+def read_header(blueprint_json_str: str, start: int = 0, contents_depth: int = -1) -> BookEntry:
+    """
+    Read the type, label, version and index of the blueprint object starting at position start in the JSON text.
+
+    If contents_depth >= 0 the headers of the contents of a book are read as well, down to that many levels of
+    nested books (similar to max_recursion_level). Otherwise the contents are skipped.
+    """
+    header = { 'index': -1, 'type': None, 'label': None, 'version': None, 'contents_start': -1, 'contents_end': -1, 'contents': None }
+
+    def read_blueprint_member(key: str, value_start: int) -> int:
+        if key in ('label', 'version'):
+            header[key], value_end = _scan(_scan_value, blueprint_json_str, value_start)
+        elif key == 'blueprints' and header['type'] == blueprints.Type.BOOK and contents_depth >= 0:
+            header['contents'], value_end = _read_contents(blueprint_json_str, value_start, contents_depth - 1)
+        else:
+            _, value_end = _scan(_scan_and_discard_value, blueprint_json_str, value_start)
+        if key == 'blueprints':
+            header['contents_start'], header['contents_end'] = value_start, value_end
+        return value_end
+
+    def read_member(key: str, value_start: int) -> int:
+        if key == 'index':
+            header['index'], value_end = _scan(_scan_value, blueprint_json_str, value_start)
+        elif key in _TYPE_KEYS and header['type'] is None:
+            header['type'] = _TYPE_KEYS[key]
+            value_end = _walk_object(blueprint_json_str, value_start, read_blueprint_member)
+        else:
+            _, value_end = _scan(_scan_and_discard_value, blueprint_json_str, value_start)
+        return value_end
+
+    start = _skip_whitespace(blueprint_json_str, start)
+    end = _walk_object(blueprint_json_str, start, read_member)
+    if header['type'] != blueprints.Type.BOOK:
+        header['contents_start'], header['contents_end'] = -1, -1
+    return BookEntry(start=start, end=end, **header)
+
+
+def read_table_of_contents(blueprint_json_str: str, book_entry: BookEntry) -> tuple:
+    """Entries of a blueprint book, in the order of the JSON text"""
+    assert book_entry.type == blueprints.Type.BOOK, 'Not a blueprint book'
+    if book_entry.contents is not None:
+        return book_entry.contents
+    if book_entry.contents_start < 0:
+        return ()
+    contents, _ = _read_contents(blueprint_json_str, book_entry.contents_start, -1)
+    return contents
+
+
+def find_index(blueprint_json_str: str, book_entry: BookEntry, index: int) -> BookEntry:
+    if book_entry.type != blueprints.Type.BOOK:
+        return None
+    for entry in read_table_of_contents(blueprint_json_str, book_entry):
+        if entry.index == index:
+            return entry
+    return None
+
+
+def find_path(blueprint_json_str: str, book_entry: BookEntry, path: tuple) -> BookEntry:
+    """Same as blueprints.find_path: the entry at a path of indices in nested books"""
+    entry = book_entry
+    for index in path:
+        entry = find_index(blueprint_json_str, entry, index)
+        if entry is None:
+            return None
+    return entry
+
+
+def load_entry(blueprint_json_str: str, entry: BookEntry) -> dict:
+    """Fully decode the blueprint object of an entry"""
+    return blueprints.parse_json_string(blueprint_json_str[entry.start:entry.end])
+
+
+def read_entry_name(entry: BookEntry) -> str:
+    """Same as blueprints.read_blueprint_name"""
+    return entry.label if entry.label is not None else 'no-name'
+
+
+def read_entry_game_version(entry: BookEntry) -> str:
+    """Same as blueprints.parse_game_version"""
+    return blueprints.decode_game_version(entry.version) if entry.version is not None else 'unknonwn'
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""
+Graphs of the wires of a blueprint: red and green circuit networks, and copper wires
+
+  The wires are read from the connections and neighbours of the entities (before Factorio 2.0), or from the list of
+  wires of the blueprint (since 2.0). The nodes of the graphs are the wire connectors of the entities: connector 1 is
+  the input of a combinator, the left side of a power switch, or the only connector of the other entities; connector 2
+  is the output of a combinator, or the right side of a power switch. The node of connector c of the entity at index
+  i in the list of entities is 2 * i + c - 1.
+
+  There is one graph per wire color, stored in CSR form (compressed sparse rows): the neighbours of node n are
+  targets[offsets[n]:offsets[n + 1]], in typed arrays. The networks are the connected components of the graphs,
+  labelled in a single pass. The graphs, the labelling and the exports (JSON, and DOT for Graphviz) all run in linear
+  time in the number of entities and wires.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import itertools
+import json
+from array import array
+from factorio_game.exchange_string import blueprints
+
+
+WIRE_COLORS = ('red', 'green', 'copper')
+
+# Wire connector ids of Factorio 2.0 -> (color, connector)
+_WIRE_CONNECTORS = {
+    1: ('red', 1),              # Circuit red (input of a combinator)
+    2: ('green', 1),            # Circuit green (input of a combinator)
+    3: ('red', 2),              # Combinator output red
+    4: ('green', 2),            # Combinator output green
+    5: ('copper', 1),           # Pole copper, or power switch left copper
+    6: ('copper', 2),           # Power switch right copper
+}
+
+# Colors of the edges in the DOT format
+_DOT_COLORS = { 'red': 'red', 'green': 'green', 'copper': 'orange' }
+
+
+class WireGraph:
+    """The wires of one color, in CSR form, and their networks"""
+    def __init__(self, color: str, node_count: int, edges: set):
+        self.color = color
+        self.edges = sorted(edges)      # (node, node) with the smallest node first
+        degrees = array('I', [0]) * (node_count + 1)
+        for node_1, node_2 in self.edges:
+            degrees[node_1 + 1] += 1
+            degrees[node_2 + 1] += 1
+        self.offsets = array('I', itertools.accumulate(degrees))
+        self.targets = array('I', [0]) * (2 * len(self.edges))
+        fill = self.offsets[:node_count]
+        for node_1, node_2 in self.edges:
+            self.targets[fill[node_1]] = node_2
+            fill[node_1] += 1
+            self.targets[fill[node_2]] = node_1
+            fill[node_2] += 1
+        self._label_networks(node_count)
+
+    def _label_networks(self, node_count: int) -> None:
+        """Connected components of the nodes that have wires, numbered in the order of their smallest node. -1: no wire."""
+        offsets, targets = self.offsets, self.targets
+        network = array('i', [-1]) * node_count
+        # The members of each network, network after network: the members of network k are
+        # member_nodes[member_offsets[k]:member_offsets[k + 1]]
+        member_nodes = []
+        member_offsets = [0]
+        # The smallest node of a network is the first node of one of its edges, which are sorted
+        for start, _ in self.edges:
+            if network[start] != -1:
+                continue
+            label = len(member_offsets) - 1
+            network[start] = label
+            first_member = len(member_nodes)
+            member_nodes.append(start)
+            # Breadth first, with the list of the members as the queue
+            position = first_member
+            while position < len(member_nodes):
+                node = member_nodes[position]
+                position += 1
+                for target in targets[offsets[node]:offsets[node + 1]]:
+                    if network[target] == -1:
+                        network[target] = label
+                        member_nodes.append(target)
+            member_nodes[first_member:] = sorted(member_nodes[first_member:])
+            member_offsets.append(len(member_nodes))
+        self.network = network
+        self.network_count = len(member_offsets) - 1
+        self.member_nodes = array('I', member_nodes)
+        self.member_offsets = array('I', member_offsets)
+
+    def neighbours(self, node: int) -> array:
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def members(self, network: int) -> array:
+        """The nodes of a network, in increasing order"""
+        return self.member_nodes[self.member_offsets[network]:self.member_offsets[network + 1]]
+
+
+def node_of(entity_idx: int, connector: int) -> int:
+    return 2 * entity_idx + connector - 1
+
+
+def _entity_number(value) -> int:
+    """The entity number, or 0 if invalid (the entity numbers start at 1)"""
+    return value if type(value) is int and 0 < value < 1 << 32 else 0
+
+
+class CircuitGraph:
+    """
+    The graphs of the wires of a blueprint (not a book), by color. The malformed wires, and the wires to missing
+    entities, are ignored (see module validation).
+    """
+    def __init__(self, blueprint_obj: dict):
+        assert blueprints.read_blueprint_type(blueprint_obj) == blueprints.Type.BP, 'Only accept a blueprint as input'
+        blueprint_subobj = blueprint_obj['blueprint']
+        entities = blueprint_subobj.get('entities', [])
+        self.label = blueprint_subobj.get('label')
+        self.entity_numbers = array('I', [_entity_number(entity.get('entity_number')) for entity in entities])
+        self.names = [entity.get('name') for entity in entities]
+        self.entity_index = { entity_number: idx for idx, entity_number in enumerate(self.entity_numbers) if entity_number != 0 }
+        edges = { color: set() for color in WIRE_COLORS }
+        self._read_connections(entities, edges)
+        self._read_wires(blueprint_subobj.get('wires', []), edges)
+        node_count = 2 * len(entities)
+        self.graphs = { color: WireGraph(color, node_count, edges[color]) for color in WIRE_COLORS }
+
+    def _add_edge(self, edges: dict, color, entity_idx: int, connector: int, entity_number, target_connector) -> None:
+        if type(entity_number) is not int or target_connector not in (1, 2) or color not in WIRE_COLORS:
+            return
+        target_idx = self.entity_index.get(entity_number)
+        if target_idx is None:
+            return
+        node_1, node_2 = node_of(entity_idx, connector), node_of(target_idx, target_connector)
+        if node_1 != node_2:
+            # The wires are listed at both ends before 2.0
+            edges[color].add((node_1, node_2) if node_1 < node_2 else (node_2, node_1))
+
+    def _read_connections(self, entities: list[dict], edges: dict) -> None:
+        # Before 2.0: {'1': {'red': [{'entity_id': n, 'circuit_id': c}], 'green': [...]}, '2': {...}, 'Cu0': [{'entity_id': n, 'wire_id': w}], 'Cu1': [...]}
+        wired_entities = [(entity_idx, entity) for entity_idx, entity in enumerate(entities) if 'neighbours' in entity or 'connections' in entity]
+        for entity_idx, entity in wired_entities:
+            neighbours = entity.get('neighbours', [])
+            for entity_number in neighbours if type(neighbours) is list else []:
+                self._add_edge(edges, 'copper', entity_idx, 1, entity_number, 1)
+            connections = entity.get('connections', {})
+            for key, value in connections.items() if type(connections) is dict else []:
+                if key in ('Cu0', 'Cu1') and type(value) is list:
+                    for wire in value:
+                        if type(wire) is dict:
+                            wire_id = wire.get('wire_id', 0)
+                            self._add_edge(edges, 'copper', entity_idx, 1 if key == 'Cu0' else 2, wire.get('entity_id'), wire_id + 1 if type(wire_id) is int else None)
+                elif key in ('1', '2') and type(value) is dict:
+                    for color, wires in value.items():
+                        for wire in wires if type(wires) is list else []:
+                            if type(wire) is dict:
+                                self._add_edge(edges, color, entity_idx, int(key), wire.get('entity_id'), wire.get('circuit_id', 1))
+
+    def _read_wires(self, wires: list, edges: dict) -> None:
+        # Since 2.0: [entity number, wire connector id, entity number, wire connector id]
+        for wire in wires if type(wires) is list else []:
+            if type(wire) is not list or len(wire) != 4 or not all(type(value) is int for value in wire):
+                continue
+            entity_number_1, connector_id_1, entity_number_2, connector_id_2 = wire
+            color, connector_1 = _WIRE_CONNECTORS.get(connector_id_1, (None, 1))
+            color_2, connector_2 = _WIRE_CONNECTORS.get(connector_id_2, (None, 1))
+            entity_idx = self.entity_index.get(entity_number_1)
+            if entity_idx is not None and color == color_2:
+                self._add_edge(edges, color, entity_idx, connector_1, entity_number_2, connector_2)
+
+    def connector(self, node: int) -> tuple[int, int]:
+        """(entity number, connector) of a node"""
+        return self.entity_numbers[node // 2], node % 2 + 1
+
+    def network_of(self, color: str, entity_number: int, connector: int = 1) -> int:
+        """The network of a connector of an entity, None if the entity is not found or has no wire of this color"""
+        entity_idx = self.entity_index.get(entity_number)
+        if entity_idx is None:
+            return None
+        network = self.graphs[color].network[node_of(entity_idx, connector)]
+        return network if network >= 0 else None
+
+    def members(self, color: str, network: int) -> list[tuple[int, int]]:
+        """(entity number, connector) of the members of a network"""
+        return [self.connector(node) for node in self.graphs[color].members(network)]
+
+    def format_node(self, node: int) -> str:
+        entity_number, connector = self.connector(node)
+        return f'{self.names[node // 2]} #{entity_number}' + (f':{connector}' if connector != 1 else '')
+
+
+def to_json_object(graph: CircuitGraph) -> dict:
+    """Color -> list of the networks: {'members': [[entity number, connector], ...], 'wires': [[entity number, connector, entity number, connector], ...]}"""
+    json_obj = {}
+    for color, wire_graph in graph.graphs.items():
+        networks = [{ 'members': [list(graph.connector(node)) for node in wire_graph.members(network)], 'wires': [] } for network in range(wire_graph.network_count)]
+        for node_1, node_2 in wire_graph.edges:
+            networks[wire_graph.network[node_1]]['wires'].append([*graph.connector(node_1), *graph.connector(node_2)])
+        json_obj[color] = networks
+    return json_obj
+
+
+def to_dot(graph: CircuitGraph) -> str:
+    """The graph in the DOT format of Graphviz: one vertex per entity with wires, one edge per wire"""
+    wired = sorted({ node // 2 for wire_graph in graph.graphs.values() for edge in wire_graph.edges for node in edge })
+    lines = [f'graph {json.dumps(graph.label or "blueprint")} {{']
+    lines.extend(f'  e{graph.entity_numbers[idx]} [label={json.dumps(graph.names[idx] + " #" + str(graph.entity_numbers[idx]))}];' for idx in wired)
+    for color, wire_graph in graph.graphs.items():
+        for node_1, node_2 in wire_graph.edges:
+            (entity_number_1, connector_1), (entity_number_2, connector_2) = graph.connector(node_1), graph.connector(node_2)
+            attributes = f'color={_DOT_COLORS[color]}'
+            if connector_1 != 1:
+                attributes += f', taillabel="{connector_1}"'
+            if connector_2 != 1:
+                attributes += f', headlabel="{connector_2}"'
+            lines.append(f'  e{entity_number_1} -- e{entity_number_2} [{attributes}];')
+    lines.append('}')
+    return '\n'.join(lines)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""
+Structural diff of blueprints and blueprint books, and compact patches
+
+  The entities and tiles of two blueprints are matched by name and position, and the pages of two books by their
+  index, with hash maps: the diff runs in linear time whatever the order of the lists. The changes are reported as a
+  list of added, removed and changed entities, tiles, pages and keys.
+
+  The patch is a JSON object which rebuilds the new blueprint from the old one. The lists of entities, tiles and pages
+  are described in the order of the new list: runs of unchanged elements of the old list ['=', start, count], changed
+  elements ['~', old_position, patch] and added elements ['+', element]. The other keys are set, unset or patched.
+  The patch records the content hashes of both blueprints, so that it is only applied to the blueprint it was made for.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+from collections.abc import Callable
+from typing import Any, NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+PATCH_FORMAT = 1
+
+
+class Change(NamedTuple):
+    op: str                     # '+' added, '-' removed, '~' changed
+    path: tuple                 # Indices of the page in the nested books (empty for the top level object)
+    kind: str                   # 'entity', 'tile', 'page', 'key', or 'order' (same elements of a list in another order)
+    name: str                   # Name of the entity or tile, label of the page, or key (e.g. 'blueprint.label', 'blueprint.entities')
+    detail: Any                 # Position (x, y) of an entity or tile, index of a page; for '~' on an entity or tile, the changed keys
+
+
+def _entity_key(entity: dict, position: int) -> tuple:
+    entity_position = entity.get('position', {})
+    return entity.get('name'), entity_position.get('x'), entity_position.get('y')
+
+
+def _page_key(page: dict, position: int) -> tuple:
+    # Pages without index are matched by position
+    return ('index', page['index']) if 'index' in page else ('position', position)
+
+
+# Lists of which the elements are matched by key, instead of being compared as a whole
+_KEYED_LISTS = {
+    'entities': ('entity', _entity_key),
+    'tiles': ('tile', _entity_key),
+    'blueprints': ('page', _page_key),
+}
+
+
+def _page_label(page: dict) -> str:
+    return blueprints.read_blueprint_name(page)
+
+
+class _Differ:
+    def __init__(self):
+        self.changes = []
+
+    def diff_objects(self, old: dict, new: dict, path: tuple, key_prefix: str = '') -> dict:
+        patch = {}
+        set_values = {}
+        for key, new_value in new.items():
+            if key not in old:
+                set_values[key] = new_value
+                self.changes.append(Change('+', path, 'key', key_prefix + key, None))
+                continue
+            old_value = old[key]
+            if old_value == new_value:
+                continue
+            if key in _KEYED_LISTS and isinstance(old_value, list) and isinstance(new_value, list):
+                patch.setdefault('lists', {})[key] = self.diff_lists(old_value, new_value, _KEYED_LISTS[key], path, key_prefix + key)
+            elif isinstance(old_value, dict) and isinstance(new_value, dict) and key in _TYPE_KEYS:
+                patch.setdefault('objects', {})[key] = self.diff_objects(old_value, new_value, path, key_prefix + key + '.')
+            else:
+                set_values[key] = new_value
+                self.changes.append(Change('~', path, 'key', key_prefix + key, None))
+        unset_keys = [key for key in old if key not in new]
+        for key in unset_keys:
+            self.changes.append(Change('-', path, 'key', key_prefix + key, None))
+        if set_values:
+            patch['set'] = set_values
+        if unset_keys:
+            patch['unset'] = unset_keys
+        return patch
+
+    def diff_lists(self, old_list: list, new_list: list, keyed_list: tuple[str, Callable], path: tuple, key_name: str) -> list:
+        kind, key_func = keyed_list
+        # The common head and tail of the lists (usually most of them) are not indexed
+        head = 0
+        while head < len(old_list) and head < len(new_list) and old_list[head] == new_list[head]:
+            head += 1
+        old_tail, new_tail = len(old_list), len(new_list)
+        while old_tail > head and new_tail > head and old_list[old_tail - 1] == new_list[new_tail - 1]:
+            old_tail -= 1
+            new_tail -= 1
+        # Positions of the old elements by key, in reverse order so that the duplicates are matched in order
+        old_positions = {}
+        for position in range(old_tail - 1, head - 1, -1):
+            old_positions.setdefault(key_func(old_list[position], position), []).append(position)
+        matched = bytearray(len(old_list))
+        change_count = len(self.changes)
+        ops = []
+        _append_run(ops, 0, head)
+        for new_position in range(head, new_tail):
+            new_elt = new_list[new_position]
+            positions = old_positions.get(key_func(new_elt, new_position))
+            if not positions:
+                ops.append(['+', new_elt])
+                self.changes.append(self._element_change('+', kind, new_elt, path))
+                continue
+            old_position = positions.pop()
+            matched[old_position] = 1
+            old_elt = old_list[old_position]
+            if old_elt == new_elt:
+                _append_run(ops, old_position, 1)
+            elif kind == 'page':
+                page_path = path + (new_elt.get('index', -1),)
+                self.changes.append(self._element_change('~', kind, new_elt, path))
+                ops.append(['~', old_position, self.diff_objects(old_elt, new_elt, page_path)])
+            else:
+                element_patch = _diff_element(old_elt, new_elt)
+                changed_keys = sorted([*element_patch.get('set', {}), *element_patch.get('unset', [])])
+                self.changes.append(Change('~', path, kind, new_elt.get('name'), tuple(changed_keys)))
+                ops.append(['~', old_position, element_patch])
+        _append_run(ops, old_tail, len(old_list) - old_tail)
+        for old_position in range(head, old_tail):
+            if not matched[old_position]:
+                self.changes.append(self._element_change('-', kind, old_list[old_position], path))
+        if len(self.changes) == change_count:
+            # Same elements in a different order
+            self.changes.append(Change('~', path, 'order', key_name, None))
+        return ops
+
+    @staticmethod
+    def _element_change(op: str, kind: str, elt: dict, path: tuple) -> Change:
+        if kind == 'page':
+            return Change(op, path, kind, _page_label(elt), elt.get('index', -1))
+        position = elt.get('position', {})
+        return Change(op, path, kind, elt.get('name'), (position.get('x'), position.get('y')))
+
+
+def _append_run(ops: list, start: int, count: int) -> None:
+    """Append a run of unchanged elements of the old list, merged with the previous one if contiguous"""
+    if count == 0:
+        return
+    last_op = ops[-1] if ops else None
+    if last_op and last_op[0] == '=' and last_op[1] + last_op[2] == start:
+        last_op[2] += count
+    else:
+        ops.append(['=', start, count])
+
+
+# The objects that are patched key by key (the other values are replaced as a whole)
+_TYPE_KEYS = frozenset(bp_type.value for bp_type in blueprints.Type)
+
+
+def _diff_element(old: dict, new: dict) -> dict:
+    """Patch of an entity or tile: the keys set and unset"""
+    patch = {}
+    set_values = { key: value for key, value in new.items() if key not in old or old[key] != value }
+    unset_keys = [key for key in old if key not in new]
+    if set_values:
+        patch['set'] = set_values
+    if unset_keys:
+        patch['unset'] = unset_keys
+    return patch
+
+
+def diff(old_obj: dict, new_obj: dict) -> list[Change]:
+    """Changes from a blueprint object (of any type) to another"""
+    differ = _Differ()
+    differ.diff_objects(old_obj, new_obj, ())
+    return differ.changes
+
+
+def make_patch(old_obj: dict, new_obj: dict) -> dict:
+    """Patch from a blueprint object (of any type) to another, as a JSON object"""
+    patch = _Differ().diff_objects(old_obj, new_obj, ())
+    return { 'format': PATCH_FORMAT, 'from': blueprints.content_hash(old_obj), 'to': blueprints.content_hash(new_obj), 'patch': patch }
+
+
+def _check_object_patch(patch, where: str) -> None:
+    """Raise ValueError if a patch of an object is malformed"""
+    if type(patch) is not dict:
+        raise ValueError(f'Invalid patch at {where}: expected an object')
+    unknown_keys = [key for key in patch if key not in ('set', 'unset', 'objects', 'lists')]
+    if unknown_keys:
+        raise ValueError(f'Invalid patch at {where}: unknown key {unknown_keys[0]}')
+    if type(patch.get('set', {})) is not dict:
+        raise ValueError(f'Invalid patch at {where}: set must be an object')
+    unset_keys = patch.get('unset', [])
+    if type(unset_keys) is not list or not all(type(key) is str for key in unset_keys):
+        raise ValueError(f'Invalid patch at {where}: unset must be a list of keys')
+    object_patches = patch.get('objects', {})
+    if type(object_patches) is not dict:
+        raise ValueError(f'Invalid patch at {where}: objects must be an object')
+    for key, object_patch in object_patches.items():
+        _check_object_patch(object_patch, f'{where}.{key}')
+    list_patches = patch.get('lists', {})
+    if type(list_patches) is not dict:
+        raise ValueError(f'Invalid patch at {where}: lists must be an object')
+    for key, ops in list_patches.items():
+        if type(ops) is not list:
+            raise ValueError(f'Invalid patch at {where}.{key}: expected a list of operations')
+        for op_idx, op in enumerate(ops):
+            _check_list_op(op, f'{where}.{key}[{op_idx}]')
+
+
+def _check_list_op(op, where: str) -> None:
+    if type(op) is not list or not op or op[0] not in ('=', '~', '+'):
+        raise ValueError(f'Invalid list operation in patch at {where}: {op}')
+    if op[0] == '=' and not (len(op) == 3 and type(op[1]) is int and type(op[2]) is int and op[1] >= 0 and op[2] >= 0):
+        raise ValueError(f'Invalid list operation in patch at {where}: expected [\'=\', start, count]')
+    if op[0] == '~':
+        if not (len(op) == 3 and type(op[1]) is int and op[1] >= 0):
+            raise ValueError(f'Invalid list operation in patch at {where}: expected [\'~\', position, patch]')
+        _check_object_patch(op[2], where)
+    if op[0] == '+' and len(op) != 2:
+        raise ValueError(f'Invalid list operation in patch at {where}: expected [\'+\', element]')
+
+
+def _apply_object_patch(obj: dict, patch: dict) -> dict:
+    unset_keys = patch.get('unset', [])
+    result = { key: value for key, value in obj.items() if key not in unset_keys }
+    result.update(patch.get('set', {}))
+    for key, object_patch in patch.get('objects', {}).items():
+        if type(obj.get(key)) is not dict:
+            raise ValueError(f'The patch does not apply to this blueprint: {key} is not an object')
+        result[key] = _apply_object_patch(obj[key], object_patch)
+    for key, list_patch in patch.get('lists', {}).items():
+        if type(obj.get(key)) is not list:
+            raise ValueError(f'The patch does not apply to this blueprint: {key} is not a list')
+        result[key] = _apply_list_patch(obj[key], list_patch)
+    return result
+
+
+def _apply_list_patch(old_list: list, ops: list) -> list:
+    new_list = []
+    for op in ops:
+        if op[0] == '=':
+            if op[1] + op[2] > len(old_list):
+                raise ValueError(f'The patch does not apply to this blueprint: elements {op[1]} to {op[1] + op[2] - 1} of a list of {len(old_list)}')
+            new_list.extend(old_list[op[1]:op[1] + op[2]])
+        elif op[0] == '~':
+            if op[1] >= len(old_list) or type(old_list[op[1]]) is not dict:
+                raise ValueError(f'The patch does not apply to this blueprint: no object at position {op[1]} of a list of {len(old_list)}')
+            new_list.append(_apply_object_patch(old_list[op[1]], op[2]))
+        else:
+            new_list.append(op[1])
+    return new_list
+
+
+def apply_patch(old_obj: dict, patch: dict) -> dict:
+    """
+    The new blueprint object from the old one and a patch (see make_patch). The unchanged parts are shared with the
+    old object. Raise ValueError if the patch is malformed, or was not made for this blueprint.
+    """
+    if type(patch) is not dict:
+        raise ValueError('Invalid patch: expected an object')
+    if patch.get('format') != PATCH_FORMAT:
+        raise ValueError('Unsupported patch format: ' + str(patch.get('format')))
+    if type(patch.get('from')) is not str or type(patch.get('to')) is not str:
+        raise ValueError('Invalid patch: the hashes from and to are required')
+    _check_object_patch(patch.get('patch'), 'patch')
+    if blueprints.content_hash(old_obj) != patch['from']:
+        raise ValueError('The patch does not apply to this blueprint (hash ' + patch['from'][:12] + ' expected)')
+    new_obj = _apply_object_patch(old_obj, patch['patch'])
+    if blueprints.content_hash(new_obj) != patch['to']:
+        raise ValueError('The patched blueprint does not have the expected hash ' + patch['to'][:12])
+    return new_obj
+
+
+def format_change(change: Change) -> str:
+    path_str = '/'.join(f'#{index:03d}' if index >= 0 else '#' for index in change.path)
+    prefix = f'{change.op} {path_str + " " if path_str else ""}{change.kind}'
+    if change.kind == 'page':
+        return f'{prefix} #{change.detail:03d}: {change.name}' if change.detail >= 0 else f'{prefix} #: {change.name}'
+    if change.kind in ('key', 'order'):
+        return f'{prefix} {change.name}'
+    if change.op == '~':
+        return f'{prefix} {change.name}: {", ".join(change.detail)}'
+    x, y = change.detail
+    return f'{prefix} {change.name} at ({x}, {y})'
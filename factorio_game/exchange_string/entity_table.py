@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Compact, column-oriented representation of the entities and tiles of a blueprint
+
+  The names are interned to integer ids, and the positions, directions and entity numbers are stored in typed arrays
+  (module array of the standard library), instead of one dictionary per entity and per position. The other keys of an
+  entity (recipe, control behavior, etc.) are kept as is. The conversion back to the dictionaries is lossless.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import collections
+from array import array
+from factorio_game.exchange_string import blueprints
+
+
+# Flags of each entity
+HAS_POSITION = 0x01
+X_IS_INT = 0x02                 # The JSON numbers of the position are integers (3, not 3.0)
+Y_IS_INT = 0x04
+HAS_DIRECTION = 0x08
+HAS_ENTITY_NUMBER = 0x10
+
+_COLUMN_KEYS = frozenset(['name', 'position', 'direction', 'entity_number'])
+
+
+class NameTable:
+    """Interned names: name <-> integer id. A missing name (None) gets an id as well."""
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name: str) -> int:
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.ids[name] = name_id
+        return name_id
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class EntityTable:
+    """Entities (or tiles) of a blueprint, in columns"""
+    def __init__(self, names: NameTable = None):
+        self.names = names if names is not None else NameTable()
+        self.name_id = array('I')
+        self.x = array('d')
+        self.y = array('d')
+        self.direction = array('B')
+        self.entity_number = array('I')
+        self.flags = array('B')
+        self.extras = []        # Other keys of each entity (dict), None if none
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    @classmethod
+    def from_entities(cls, entities: list[dict], names: NameTable = None) -> 'EntityTable':
+        table = cls(names)
+        table.extend(entities)
+        return table
+
+    def extend(self, entities: list[dict]) -> None:
+        # Build each column in bulk (the loops run in list comprehensions)
+        intern = self.names.intern
+        self.name_id.extend([intern(entity.get('name')) for entity in entities])
+        positions = [entity.get('position') for entity in entities]
+        self.x.extend([position['x'] if position is not None else 0.0 for position in positions])
+        self.y.extend([position['y'] if position is not None else 0.0 for position in positions])
+        directions = [entity.get('direction') for entity in entities]
+        self.direction.extend([direction or 0 for direction in directions])
+        entity_numbers = [entity.get('entity_number') for entity in entities]
+        self.entity_number.extend([entity_number or 0 for entity_number in entity_numbers])
+        self.flags.extend([
+            (HAS_POSITION | (X_IS_INT if type(position['x']) is int else 0) | (Y_IS_INT if type(position['y']) is int else 0) if position is not None else 0)
+            | (HAS_DIRECTION if direction is not None else 0)
+            | (HAS_ENTITY_NUMBER if entity_number is not None else 0)
+            for position, direction, entity_number in zip(positions, directions, entity_numbers)])
+        column_keys = _COLUMN_KEYS
+        self.extras.extend([
+            { key: value for key, value in entity.items() if key not in column_keys } if not column_keys.issuperset(entity) else None
+            for entity in entities])
+
+    def append(self, entity: dict) -> None:
+        self.extend([entity])
+
+    def name(self, idx: int) -> str:
+        return self.names.names[self.name_id[idx]]
+
+    def entity(self, idx: int) -> dict:
+        """The dictionary of one entity"""
+        flags = self.flags[idx]
+        entity = {}
+        if flags & HAS_ENTITY_NUMBER:
+            entity['entity_number'] = self.entity_number[idx]
+        name = self.names.names[self.name_id[idx]]
+        if name is not None:
+            entity['name'] = name
+        if flags & HAS_POSITION:
+            x, y = self.x[idx], self.y[idx]
+            entity['position'] = { 'x': int(x) if flags & X_IS_INT else x, 'y': int(y) if flags & Y_IS_INT else y }
+        if flags & HAS_DIRECTION:
+            entity['direction'] = self.direction[idx]
+        extras = self.extras[idx]
+        if extras:
+            entity.update(extras)
+        return entity
+
+    def to_entities(self) -> list[dict]:
+        return [self.entity(idx) for idx in range(len(self))]
+
+    def count_by_name(self) -> dict[str, int]:
+        counts = collections.Counter(self.name_id)
+        return { self.names.names[name_id]: count for name_id, count in counts.items() if self.names.names[name_id] is not None }
+
+    def indices_of(self, name: str) -> list[int]:
+        name_id = self.names.ids.get(name)
+        if name_id is None:
+            return []
+        return [idx for idx, entity_name_id in enumerate(self.name_id) if entity_name_id == name_id]
+
+    def bounding_box(self) -> tuple[float, float, float, float]:
+        """(min_x, min_y, max_x, max_y) of the positions, None if empty"""
+        if not len(self):
+            return None
+        return min(self.x), min(self.y), max(self.x), max(self.y)
+
+
+class CompactBlueprint:
+    """A blueprint (not a book) with its entities and tiles in columns"""
+    def __init__(self, blueprint_obj: dict):
+        assert blueprints.read_blueprint_type(blueprint_obj) == blueprints.Type.BP, 'Only accept a blueprint as input'
+        blueprint_subobj = blueprint_obj['blueprint']
+        self.header = { key: value for key, value in blueprint_obj.items() if key != 'blueprint' }
+        self.blueprint = { key: value for key, value in blueprint_subobj.items() if key not in ('entities', 'tiles') }
+        self.has_entities = 'entities' in blueprint_subobj
+        self.has_tiles = 'tiles' in blueprint_subobj
+        self.names = NameTable()
+        self.entities = EntityTable.from_entities(blueprint_subobj.get('entities', []), self.names)
+        self.tiles = EntityTable.from_entities(blueprint_subobj.get('tiles', []), self.names)
+
+    def to_blueprint_object(self) -> dict:
+        blueprint_subobj = dict(self.blueprint)
+        if self.has_entities or len(self.entities):
+            blueprint_subobj['entities'] = self.entities.to_entities()
+        if self.has_tiles or len(self.tiles):
+            blueprint_subobj['tiles'] = self.tiles.to_entities()
+        return { **self.header, 'blueprint': blueprint_subobj }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+JSON backends of the exchange string codec
+
+  The JSON text of the exchange strings is parsed and serialized with orjson (https://github.com/ijl/orjson) if it is
+  installed, and with the standard library otherwise. The result does not depend on the backend: in particular the
+  canonical JSON text is byte-identical, so that the exchange strings and the content hashes are stable.
+
+  orjson differs from the standard library on a few edge cases (non-ASCII characters, floats in exponent notation,
+  NaN, integers out of the 64-bit range...). Those are detected by a quick scan of the text, and then left to the
+  standard library.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import importlib.util
+import json
+
+
+# orjson is imported on first use, as its import is slow (it imports datetime, uuid, zoneinfo...)
+orjson = None
+_orjson_installed = importlib.util.find_spec('orjson') is not None
+
+
+STDLIB = 'json'
+ORJSON = 'orjson'
+
+
+def _stdlib_canonical_dumps(obj) -> str:
+    # The most compact JSON format, with a stable order of the keys
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+# All the digits are mapped to 0, so that a number pattern is found with a single search
+_DIGITS = bytes.maketrans(b'123456789', b'000000000')
+_DIGITS_AND_MINUS = bytes.maketrans(b'123456789-', b'0000000000')
+# Integers of 19 digits or more may be out of the 64-bit range, which orjson parses as floats
+_LONG_NUMBER = b'0' * 19
+_ORJSON_OPTIONS = None
+
+
+def _import_orjson() -> bool:
+    """Import orjson. If the import fails, fall back on the standard library and return False."""
+    global orjson, _ORJSON_OPTIONS
+    try:
+        import orjson
+    except ImportError:
+        _BACKENDS.pop(ORJSON, None)
+        set_backend(STDLIB)
+        return False
+    # The subclasses of str, int, dict and list, the dataclasses and the dates are not serialized by orjson, but by the
+    # standard library (which raises TypeError on the types it does not support)
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+    return True
+
+
+def _orjson_loads(json_str):
+    if orjson is None and not _import_orjson():
+        return json.loads(json_str)
+    try:
+        json_bytes = json_str.encode() if isinstance(json_str, str) else json_str
+        if json_bytes.translate(_DIGITS).find(_LONG_NUMBER) < 0:
+            return orjson.loads(json_bytes)
+    except (UnicodeEncodeError, orjson.JSONDecodeError):
+        pass
+    # Long integers, NaN and Infinity (accepted by the standard library), or invalid JSON (the error is the one of the standard library)
+    return json.loads(json_str)
+
+
+def _may_differ_from_stdlib(json_bytes: bytes) -> bool:
+    """True if the JSON text written by orjson might not be the one of the standard library"""
+    # The standard library escapes the non-ASCII characters, and DEL
+    if not json_bytes.isascii() or json_bytes.find(b'\x7f') >= 0:
+        return True
+    # orjson writes NaN and infinite floats as null
+    if json_bytes.find(b'null') >= 0:
+        return True
+    # Floats in exponent notation: orjson writes 1e16 instead of 1e+16, and 0.00001 instead of 1e-05
+    return json_bytes.find(b'0.0000') >= 0 or json_bytes.translate(_DIGITS_AND_MINUS).find(b'0e0') >= 0
+
+
+def _orjson_canonical_dumps(obj) -> str:
+    if orjson is None and not _import_orjson():
+        return _stdlib_canonical_dumps(obj)
+    try:
+        json_bytes = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # Integers out of the 64-bit range, keys other than strings, unsupported types...
+        return _stdlib_canonical_dumps(obj)
+    if _may_differ_from_stdlib(json_bytes):
+        return _stdlib_canonical_dumps(obj)
+    return json_bytes.decode()
+
+
+_BACKENDS = {
+    STDLIB: (json.loads, _stdlib_canonical_dumps),
+}
+if _orjson_installed:
+    _BACKENDS[ORJSON] = (_orjson_loads, _orjson_canonical_dumps)
+
+
+def available_backends() -> list[str]:
+    return list(_BACKENDS)
+
+
+def set_backend(name: str) -> None:
+    """Select the backend used by loads and canonical_dumps"""
+    global backend, loads, canonical_dumps
+    if name not in _BACKENDS:
+        raise ValueError('JSON backend ' + name + ' is not available. Available backends: ' + ', '.join(_BACKENDS))
+    backend = name
+    loads, canonical_dumps = _BACKENDS[name]
+
+
+# The fastest backend available, by default. Use the functions loads and canonical_dumps through the module, e.g.
+# json_backend.loads(json_str), so that a change of backend is taken into account.
+backend = None
+loads = None
+canonical_dumps = None
+set_backend(ORJSON if _orjson_installed else STDLIB)
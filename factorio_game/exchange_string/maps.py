@@ -5,7 +5,14 @@ Module to parse map exchange strings from the game Factorio (https://www.factori
   With good information from: https://wiki.factorio.com/Map_exchange_string_format
 
   The binary format of the map exchange data was modified multiple times, and to my knowledge there is no exhaustive
-  documentation of the different formats. For that reason this script is limited to the most basic parsing.
+  documentation of the different formats. The map generation settings and the enemy settings are decoded for the
+  formats of the versions 1.x and 2.0 of the game, and for the uncompressed format of the versions prior to 0.16. The
+  other map settings (pollution, unit groups, path finder, etc.) are not decoded. In the uncompressed format, the
+  settings are read in sequence up to the seed; the width, height, starting area and peaceful mode that follow are
+  only decoded if they end the data exactly as in the format of 0.14, and are None otherwise (the oldest
+  versions have other fields there, of unknown meaning).
+
+  The data is read in place, through a memoryview, without copying slices of it.
 """
 __author__ = "Pierre DEJOUE"
 __copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
@@ -14,7 +21,13 @@ __version__ = "0.1"
 
 
 import base64
+import binascii
+import functools
+import struct
 import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple
+from factorio_game.exchange_string import batch, profiling
 
 
 def parse_exchange_string(map_ex_str: str) -> tuple[bytes, bool]:
@@ -22,7 +35,12 @@ def parse_exchange_string(map_ex_str: str) -> tuple[bytes, bool]:
     assert map_ex_str[0:3] == '>>>'
     assert map_ex_str[-3:] == '<<<'
     map_base64 = map_ex_str[3:-3]
+    profiled = profiling.enabled
+    start = profiling.clock() if profiled else 0.0
     raw_data = base64.b64decode(map_base64)
+    if profiled:
+        profiling.record('decode', start, len(map_base64), len(raw_data))
+        start = profiling.clock()
     compressed = True
     try:
         map_data = zlib.decompress(raw_data)
@@ -30,6 +48,8 @@ def parse_exchange_string(map_ex_str: str) -> tuple[bytes, bool]:
         # Uncompressed (the map data was not compressed prior to 0.16)
         compressed = False
         map_data = raw_data
+    if profiled:
+        profiling.record('inflate', start, len(raw_data), len(map_data))
     return map_data, compressed
 
 
@@ -43,3 +63,323 @@ def parse_game_version(map_bytes: bytes) -> str:
     if version_dev != 0:
         version_str = f'{version_str}.{version_dev}'
     return version_str
+
+
+class AutoplaceControl(NamedTuple):
+    frequency: Any              # float, or the name of a preset before 0.16 ('none', 'very-low', ..., 'very-high')
+    size: Any
+    richness: Any
+
+
+class CliffSettings(NamedTuple):
+    name: str
+    control: str                # Since 2.0, None before
+    cliff_elevation_0: float
+    cliff_elevation_interval: float
+    richness: float
+    cliff_smoothing: float      # Since 2.0, None before
+
+
+class MapGenSettings(NamedTuple):
+    terrain_segmentation: Any   # float, or the name of a preset before 0.16. None since 2.0 (see the 'water' control)
+    water: Any
+    autoplace_controls: dict    # name -> AutoplaceControl
+    default_enable_all_autoplace_controls: bool
+    seed: int
+    width: int                  # The width, height, starting area and peaceful mode are None in the oldest formats
+    height: int
+    starting_area: Any
+    peaceful_mode: bool
+    no_enemies_mode: bool       # Since 2.0, None before
+    starting_points: list       # [(x, y)]
+    property_expression_names: dict
+    cliff_settings: CliffSettings
+
+
+class EnemyEvolution(NamedTuple):
+    enabled: bool
+    time_factor: float
+    destroy_factor: float
+    pollution_factor: float
+
+
+class EnemyExpansion(NamedTuple):
+    enabled: bool
+    max_expansion_distance: int
+    friendly_base_influence_radius: int
+    enemy_building_influence_radius: int
+    building_coefficient: float
+    other_base_coefficient: float
+    neighbouring_chunk_coefficient: float
+    neighbouring_base_chunk_coefficient: float
+    max_colliding_tiles_coefficient: float
+    settler_group_min_size: int
+    settler_group_max_size: int
+    min_expansion_cooldown: int
+    max_expansion_cooldown: int
+
+
+class MapExchangeData(NamedTuple):
+    version: tuple              # (major, minor, patch, dev)
+    compressed: bool
+    map_gen_settings: MapGenSettings
+    enemy_evolution: EnemyEvolution     # None before 0.16
+    enemy_expansion: EnemyExpansion     # None before 0.16
+    checksum: int               # CRC32 of the map exchange data
+
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_I16 = struct.Struct('<h')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_FLOAT = struct.Struct('<f')
+_DOUBLE = struct.Struct('<d')
+_VERSION = struct.Struct('<4H')
+
+# Values of the map generation presets before 0.16
+_LEGACY_PRESETS = ['none', 'very-low', 'low', 'normal', 'high', 'very-high']
+# Escape value of a map position encoded as a delta
+_MAP_POSITION_ESCAPE = 0x7FFF
+_FIXED_POINT_ONE = 256
+
+
+class _Cursor:
+    """Sequential reader of little-endian binary data"""
+    def __init__(self, data: bytes):
+        self.view = memoryview(data)
+        self.pos = 0
+
+    def read_tuple(self, st: struct.Struct) -> tuple:
+        values = st.unpack_from(self.view, self.pos)
+        self.pos += st.size
+        return values
+
+    def read(self, st: struct.Struct):
+        return self.read_tuple(st)[0]
+
+    def read_bool(self) -> bool:
+        return self.read(_U8) != 0
+
+    def read_count(self) -> int:
+        """Space optimized unsigned integer: one byte, or 0xFF followed by four bytes"""
+        count = self.read(_U8)
+        return self.read(_U32) if count == 0xFF else count
+
+    def read_string(self, legacy: bool = False) -> str:
+        length = self.read(_U32) if legacy else self.read_count()
+        assert self.pos + length <= len(self.view), 'Unexpected end of the map exchange data'
+        value = str(self.view[self.pos:self.pos + length], 'utf-8')
+        self.pos += length
+        return value
+
+    def read_optional(self, st: struct.Struct):
+        return self.read(st) if self.read_bool() else None
+
+    def read_optional_bool(self) -> bool:
+        return self.read_bool() if self.read_bool() else None
+
+    def read_map_position(self, previous: tuple = (0, 0)) -> tuple:
+        """Fixed point coordinates, encoded as a delta to the previous position unless the delta overflows"""
+        dx = self.read(_I16)
+        if dx == _MAP_POSITION_ESCAPE:
+            x, y = self.read(_I32), self.read(_I32)
+        else:
+            x, y = previous[0] * _FIXED_POINT_ONE + dx, previous[1] * _FIXED_POINT_ONE + self.read(_I16)
+        return x / _FIXED_POINT_ONE, y / _FIXED_POINT_ONE
+
+
+def _read_legacy_preset(cursor: _Cursor) -> str:
+    value = cursor.read(_U8)
+    return _LEGACY_PRESETS[value] if value < len(_LEGACY_PRESETS) else value
+
+
+def _read_legacy_map_gen_settings(cursor: _Cursor, end: int) -> MapGenSettings:
+    terrain_segmentation = _read_legacy_preset(cursor)
+    water = _read_legacy_preset(cursor)
+    autoplace_controls = {}
+    for _ in range(cursor.read(_U32)):
+        name = cursor.read_string(legacy=True)
+        autoplace_controls[name] = AutoplaceControl(_read_legacy_preset(cursor), _read_legacy_preset(cursor), _read_legacy_preset(cursor))
+    seed = cursor.read(_U32)
+    # Format of 0.14: width, height, starting area and peaceful mode, up to the checksum
+    width = height = starting_area = peaceful_mode = None
+    if end - cursor.pos == 2 * _U32.size + 2:
+        width, height = cursor.read(_U32), cursor.read(_U32)
+        starting_area = _read_legacy_preset(cursor)
+        peaceful_mode = cursor.read_bool()
+    return MapGenSettings(terrain_segmentation, water, autoplace_controls, True, seed, width, height, starting_area, peaceful_mode, None, [], {}, None)
+
+
+def _read_map_gen_settings(cursor: _Cursor, version: tuple) -> MapGenSettings:
+    since_2_0 = version >= (2, 0)
+    terrain_segmentation = water = None
+    if not since_2_0:
+        terrain_segmentation, water = cursor.read(_FLOAT), cursor.read(_FLOAT)
+    autoplace_controls = {}
+    for _ in range(cursor.read_count()):
+        name = cursor.read_string()
+        autoplace_controls[name] = AutoplaceControl(cursor.read(_FLOAT), cursor.read(_FLOAT), cursor.read(_FLOAT))
+    assert cursor.read_count() == 0, 'Autoplace settings are not supported'
+    default_enable_all_autoplace_controls = cursor.read_bool()
+    seed, width, height = cursor.read(_U32), cursor.read(_U32), cursor.read(_U32)
+    # Area to generate at start: bounding box, and its orientation (vector)
+    left_top = cursor.read_map_position()
+    cursor.read_map_position(left_top)
+    cursor.read(_I16), cursor.read(_I16)
+    starting_area = cursor.read(_FLOAT)
+    peaceful_mode = cursor.read_bool()
+    no_enemies_mode = cursor.read_bool() if since_2_0 else None
+    starting_points = []
+    for _ in range(cursor.read_count()):
+        starting_points.append(cursor.read_map_position(starting_points[-1] if starting_points else (0, 0)))
+    property_expression_names = {}
+    for _ in range(cursor.read_count()):
+        key = cursor.read_string()
+        property_expression_names[key] = cursor.read_string()
+    cliff_name = cursor.read_string()
+    cliff_control = cursor.read_string() if since_2_0 else None
+    cliff_elevation_0, cliff_elevation_interval, cliff_richness = cursor.read(_FLOAT), cursor.read(_FLOAT), cursor.read(_FLOAT)
+    cliff_smoothing = cursor.read(_FLOAT) if since_2_0 else None
+    cliff_settings = CliffSettings(cliff_name, cliff_control, cliff_elevation_0, cliff_elevation_interval, cliff_richness, cliff_smoothing)
+    if since_2_0:
+        assert cursor.read_count() == 0, 'Territory settings are not supported'
+    return MapGenSettings(terrain_segmentation, water, autoplace_controls, default_enable_all_autoplace_controls, seed, width, height,
+                          starting_area, peaceful_mode, no_enemies_mode, starting_points, property_expression_names, cliff_settings)
+
+
+def _skip_pollution_and_steering_settings(cursor: _Cursor) -> None:
+    cursor.read_optional_bool()
+    for _ in range(11):
+        cursor.read_optional(_DOUBLE)
+    # Default and moving steering
+    for _ in range(2):
+        for _ in range(3):
+            cursor.read_optional(_DOUBLE)
+        cursor.read_optional_bool()
+
+
+def _read_enemy_evolution(cursor: _Cursor) -> EnemyEvolution:
+    return EnemyEvolution(cursor.read_optional_bool(), *(cursor.read_optional(_DOUBLE) for _ in range(3)))
+
+
+def _read_enemy_expansion(cursor: _Cursor) -> EnemyExpansion:
+    enabled = cursor.read_optional_bool()
+    radiuses = [cursor.read_optional(_U32) for _ in range(3)]
+    coefficients = [cursor.read_optional(_DOUBLE) for _ in range(5)]
+    sizes_and_cooldowns = [cursor.read_optional(_U32) for _ in range(4)]
+    return EnemyExpansion(enabled, *radiuses, *coefficients, *sizes_and_cooldowns)
+
+
+def decode_map_data(map_bytes: bytes, compressed: bool = True) -> MapExchangeData:
+    """Decode the map exchange data, as returned by parse_exchange_string"""
+    if not profiling.enabled:
+        return _decode_map_data(map_bytes, compressed)
+    start = profiling.clock()
+    map_data = _decode_map_data(map_bytes, compressed)
+    profiling.record('parse', start, len(map_bytes))
+    return map_data
+
+
+def _decode_map_data(map_bytes: bytes, compressed: bool) -> MapExchangeData:
+    assert len(map_bytes) >= _VERSION.size + _U32.size, 'Map exchange data is too short'
+    cursor = _Cursor(map_bytes)
+    checksum_pos = len(map_bytes) - _U32.size
+    checksum = _U32.unpack_from(cursor.view, checksum_pos)[0]
+    assert zlib.crc32(cursor.view[:checksum_pos]) == checksum, 'Invalid checksum of the map exchange data'
+    version = cursor.read_tuple(_VERSION)
+    if not compressed:
+        map_gen_settings = _read_legacy_map_gen_settings(cursor, checksum_pos)
+        return MapExchangeData(version, compressed, map_gen_settings, None, None, checksum)
+    assert version >= (1, 0), 'Unsupported format of the map exchange data: ' + '.'.join(str(number) for number in version)
+    cursor.read(_U8)        # Unknown
+    map_gen_settings = _read_map_gen_settings(cursor, version)
+    _skip_pollution_and_steering_settings(cursor)
+    enemy_evolution = _read_enemy_evolution(cursor)
+    enemy_expansion = _read_enemy_expansion(cursor)
+    assert cursor.pos <= checksum_pos, 'Unexpected end of the map exchange data'
+    return MapExchangeData(version, compressed, map_gen_settings, enemy_evolution, enemy_expansion, checksum)
+
+
+def parse_map_exchange_string(map_ex_str: str) -> MapExchangeData:
+    map_bytes, compressed = parse_exchange_string(map_ex_str)
+    return decode_map_data(map_bytes, compressed)
+
+
+def format_game_version(version: tuple) -> str:
+    major, minor, patch, dev = version
+    version_str = f'{major}.{minor}.{patch}'
+    if dev != 0:
+        version_str = f'{version_str}.{dev}'
+    return version_str
+
+
+# Columns of the summary of a map, in order
+MAP_SUMMARY_FIELDS = [
+    'version', 'compressed', 'seed', 'width', 'height', 'starting_area', 'peaceful_mode', 'no_enemies_mode',
+    'terrain_segmentation', 'water', 'cliff_elevation_interval', 'cliff_richness',
+    'evolution_enabled', 'evolution_time_factor', 'evolution_destroy_factor', 'evolution_pollution_factor',
+    'expansion_enabled', 'expansion_min_cooldown', 'expansion_max_cooldown', 'autoplace_controls',
+]
+
+
+def map_summary(map_data: MapExchangeData) -> dict:
+    """One flat row of key settings per map. The autoplace controls are packed as name=frequency:size:richness;..."""
+    settings = map_data.map_gen_settings
+    cliffs = settings.cliff_settings
+    evolution = map_data.enemy_evolution or EnemyEvolution(None, None, None, None)
+    expansion = map_data.enemy_expansion or EnemyExpansion(*[None] * len(EnemyExpansion._fields))
+    autoplace_controls = ';'.join(f'{name}={control.frequency}:{control.size}:{control.richness}' for name, control in settings.autoplace_controls.items())
+    return {
+        'version': format_game_version(map_data.version),
+        'compressed': map_data.compressed,
+        'seed': settings.seed,
+        'width': settings.width,
+        'height': settings.height,
+        'starting_area': settings.starting_area,
+        'peaceful_mode': settings.peaceful_mode,
+        'no_enemies_mode': settings.no_enemies_mode,
+        'terrain_segmentation': settings.terrain_segmentation,
+        'water': settings.water,
+        'cliff_elevation_interval': cliffs.cliff_elevation_interval if cliffs else None,
+        'cliff_richness': cliffs.richness if cliffs else None,
+        'evolution_enabled': evolution.enabled,
+        'evolution_time_factor': evolution.time_factor,
+        'evolution_destroy_factor': evolution.destroy_factor,
+        'evolution_pollution_factor': evolution.pollution_factor,
+        'expansion_enabled': expansion.enabled,
+        'expansion_min_cooldown': expansion.min_expansion_cooldown,
+        'expansion_max_cooldown': expansion.max_expansion_cooldown,
+        'autoplace_controls': autoplace_controls,
+    }
+
+
+class MapBatchResult(NamedTuple):
+    line_number: int            # 1-based position of the map exchange string in the input
+    map_data: Any               # MapExchangeData, or its summary (dict) if summary=True. None on error
+    error: str                  # None on success
+
+
+_DECODING_ERRORS = (AssertionError, ValueError, IndexError, binascii.Error, struct.error, zlib.error)
+
+
+def _parse_map_exchange_string_chunk(chunk: list[tuple[int, str]], summary: bool) -> list[MapBatchResult]:
+    results = []
+    for line_number, map_ex_str in chunk:
+        try:
+            map_data = parse_map_exchange_string(map_ex_str)
+            results.append(MapBatchResult(line_number, map_summary(map_data) if summary else map_data, None))
+        except _DECODING_ERRORS as err:
+            results.append(MapBatchResult(line_number, None, f'{type(err).__name__}: {err}'))
+    return results
+
+
+def parse_map_exchange_strings(map_ex_strs: Iterable[str], jobs: int = 1, summary: bool = False, chunk_size: int = batch.DEFAULT_BATCH_CHUNK_SIZE) -> Iterator[MapBatchResult]:
+    """
+    Decode a stream of map exchange strings (e.g. the lines of a file), possibly across a pool of worker processes.
+
+    Same behavior as blueprints.parse_exchange_strings. With summary=True, the workers only send back the summary of
+    each map (see map_summary).
+    """
+    chunks = batch.chunk_lines(map_ex_strs, chunk_size)
+    return batch.process_chunks(functools.partial(_parse_map_exchange_string_chunk, summary=summary), chunks, jobs)
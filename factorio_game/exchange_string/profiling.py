@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Stage-level timing and byte counters of the exchange string codec
+
+  The stages are: decode (base64), inflate (zlib), parse (JSON, or binary map data), walk (traversal of the decoded
+  object, e.g. to print out information), serialize (JSON), deflate (zlib) and encode (base64).
+
+  The instrumented functions check the flag 'enabled' before measuring anything, so that the counters cost nothing
+  but that check when they are disabled (the default). The counters are global to the process: the stages run in
+  worker processes (batch decoding with jobs > 1) are not counted.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import functools
+import time
+from typing import NamedTuple
+
+
+STAGES = ['decode', 'inflate', 'parse', 'walk', 'serialize', 'deflate', 'encode']
+
+enabled = False
+clock = time.perf_counter
+_counters = {}
+
+
+class StageStats(NamedTuple):
+    calls: int
+    seconds: float
+    bytes_in: int
+    bytes_out: int
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    _counters.clear()
+
+
+def record(stage: str, start: float, bytes_in: int = 0, bytes_out: int = 0) -> None:
+    """Count one call of a stage, started at time start (see clock)"""
+    seconds = clock() - start
+    counter = _counters.get(stage)
+    if counter is None:
+        _counters[stage] = [1, seconds, bytes_in, bytes_out]
+    else:
+        counter[0] += 1
+        counter[1] += seconds
+        counter[2] += bytes_in
+        counter[3] += bytes_out
+
+
+def profiled(stage: str):
+    """Decorator counting each call of the function as a call of the stage (the bytes are not counted)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, start)
+        return wrapper
+    return decorator
+
+
+def stats() -> dict[str, StageStats]:
+    """The counters of the stages that were called, in the order of STAGES"""
+    ordered_stages = STAGES + sorted(stage for stage in _counters if stage not in STAGES)
+    return { stage: StageStats(*_counters[stage]) for stage in ordered_stages if stage in _counters }
+
+
+def format_stats(stage_stats: dict[str, StageStats]) -> list[str]:
+    lines = [f'{"Stage":10} {"Calls":>8} {"Time (ms)":>12} {"Share":>7} {"In (bytes)":>14} {"Out (bytes)":>14} {"MB/s":>9}']
+    total_seconds = sum(stats.seconds for stats in stage_stats.values())
+    for stage, stats in stage_stats.items():
+        share = stats.seconds / total_seconds if total_seconds else 0.0
+        # Throughput of the input bytes, or of the output bytes for the stages that only count those (serialize)
+        processed_bytes = stats.bytes_in or stats.bytes_out
+        throughput = processed_bytes / stats.seconds / 1e6 if stats.seconds else 0.0
+        lines.append(f'{stage:10} {stats.calls:8} {stats.seconds * 1e3:12.3f} {share:7.1%} {stats.bytes_in:14} {stats.bytes_out:14} {throughput:9.1f}')
+    lines.append(f'{"Total":10} {"":8} {total_seconds * 1e3:12.3f}')
+    return lines
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Queries over collections of blueprints: filters on the type, label, game version, entities and items
+
+  A query is a list of filters FIELD OP VALUE, which must all match. It is evaluated on every blueprint, planner and
+  blueprint book of a collection, at every level of nesting of the books. Fields:
+
+    type                      blueprint, blueprint_book, deconstruction_planner, upgrade_planner (or bp, book, decon, upgrade)
+    label                     = and != match a pattern (with the wildcards * and ?), ~ a substring (case insensitive)
+    version                   game version, e.g. version>=1.1 (version=1.1 matches any version 1.1.x)
+    entities                  number of entities
+    entity, item              = and != select the blueprints that have (or do not have) an entity (or an item) of a
+                              given name or pattern, e.g. entity=beacon, item=speed-module*
+    entity:NAME, item:NAME    number of entities (or items) of a given name or pattern, e.g. entity:beacon>=8
+
+  The filters on the type, label and version are evaluated first, on the table of contents of the JSON text (see
+  module book_index): the entities of a blueprint are only decoded if it passed those filters and the query has
+  filters on the entities or items. Blueprint books have no entities of their own.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import fnmatch
+import operator
+import re
+from collections.abc import Iterator
+from typing import Any, NamedTuple
+from factorio_game.exchange_string import blueprints, bom, book_index
+
+
+_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+_FILTER_REGEX = re.compile(r'\s*([a-z_]+)(?::([^<>=!~]+?))?\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*$')
+_TYPE_VALUES = { **{ bp_type.value: bp_type for bp_type in blueprints.Type }, 'bp': blueprints.Type.BP, 'book': blueprints.Type.BOOK, 'decon': blueprints.Type.DECON, 'upgrade': blueprints.Type.UPGRADE }
+# Fields read from the table of contents, and fields that require the entities to be decoded
+_HEADER_FIELDS = ['type', 'label', 'version']
+_ENTITY_FIELDS = ['entities', 'entity', 'item']
+_NUMERIC_OPERATORS = list(_OPERATORS)
+_FIELD_OPERATORS = {
+    'type': ['=', '!='],
+    'label': ['=', '!=', '~'],
+    'version': _NUMERIC_OPERATORS,
+    'entities': _NUMERIC_OPERATORS,
+    'entity': ['=', '!='],
+    'item': ['=', '!='],
+}
+
+
+class Filter(NamedTuple):
+    field: str                  # One of _HEADER_FIELDS or _ENTITY_FIELDS
+    name: str                   # Name pattern of entity:NAME and item:NAME (compared to a number), None otherwise
+    op: str
+    value: Any                  # Type, str (pattern), version tuple or int, depending on the field
+
+
+def _parse_version(version_str: str) -> tuple:
+    numbers = tuple(int(number) for number in version_str.split('.'))
+    assert 1 <= len(numbers) <= 4, 'A version has 1 to 4 numbers'
+    return numbers
+
+
+def parse_filter(filter_str: str) -> Filter:
+    """Parse a filter FIELD OP VALUE, e.g. 'version>=1.1' or 'entity:beacon>=8'. Raise ValueError if invalid."""
+    match = _FILTER_REGEX.fullmatch(filter_str)
+    try:
+        assert match, 'Expected FIELD OP VALUE'
+        field, name, op, value_str = match.groups()
+        assert field in _FIELD_OPERATORS, 'Unknown field ' + field + '. Expected one of ' + ', '.join(_FIELD_OPERATORS)
+        if name is not None:
+            assert field in ('entity', 'item'), 'Only the fields entity and item accept a name'
+            assert op in _NUMERIC_OPERATORS, 'Operator ' + op + ' is not supported by field ' + field + ':NAME'
+            return Filter(field, name, op, int(value_str))
+        assert op in _FIELD_OPERATORS[field], 'Operator ' + op + ' is not supported by field ' + field
+        if field == 'type':
+            assert value_str in _TYPE_VALUES, 'Unknown type ' + value_str
+            value = _TYPE_VALUES[value_str]
+        elif field == 'version':
+            value = _parse_version(value_str)
+        elif field == 'entities':
+            value = int(value_str)
+        else:
+            value = value_str
+    except (AssertionError, ValueError) as err:
+        raise ValueError('Invalid filter: ' + filter_str + ' (' + str(err) + ')')
+    return Filter(field, None, op, value)
+
+
+def _version_tuple(version: int) -> tuple:
+    return ((version >> 48) & 0xFFFF, (version >> 32) & 0xFFFF, (version >> 16) & 0xFFFF, version & 0xFFFF)
+
+
+def _match_header(query_filter: Filter, bp_type: blueprints.Type, label: str, version: int) -> bool:
+    if query_filter.field == 'type':
+        return (bp_type == query_filter.value) == (query_filter.op == '=')
+    if query_filter.field == 'label':
+        if query_filter.op == '~':
+            return label is not None and query_filter.value.lower() in label.lower()
+        matched = label is not None and fnmatch.fnmatchcase(label, query_filter.value)
+        return matched == (query_filter.op == '=')
+    # version: the blueprints of unknown version never match
+    if version is None:
+        return False
+    version = _version_tuple(version)
+    if query_filter.op in ('=', '!='):
+        # Prefix match: version=1.1 matches 1.1.x
+        return _OPERATORS[query_filter.op](version[:len(query_filter.value)], query_filter.value)
+    return _OPERATORS[query_filter.op](version, query_filter.value + (0,) * (4 - len(query_filter.value)))
+
+
+def _count_matching(counts: dict, pattern: str) -> int:
+    if pattern in counts or not any(char in pattern for char in '*?['):
+        return counts.get(pattern, 0)
+    return sum(count for name, count in counts.items() if fnmatch.fnmatchcase(name, pattern))
+
+
+def _match_contents(query_filter: Filter, contents: bom.BillOfMaterials) -> bool:
+    if query_filter.field == 'entities':
+        return _OPERATORS[query_filter.op](contents.entity_count, query_filter.value)
+    counter = contents.entities if query_filter.field == 'entity' else contents.items
+    if query_filter.name is not None:
+        return _OPERATORS[query_filter.op](_count_matching(counter, query_filter.name), query_filter.value)
+    return (_count_matching(counter, query_filter.value) > 0) == (query_filter.op == '=')
+
+
+# Blueprint books have no entities of their own
+_NO_CONTENTS = bom.merge([])
+
+
+class QueryMatch(NamedTuple):
+    path: tuple                 # Indices of the element in the nested books (empty for the top level object)
+    type: blueprints.Type
+    label: str
+    version: int                # Encoded game version, None if not available
+
+
+def format_path(path: tuple) -> str:
+    return '/'.join(f'#{index:03d}' if index >= 0 else '#' for index in path)
+
+
+class Query:
+    """
+    A list of filters, which must all match. The number of elements examined, of blueprints fully decoded and of
+    matches are counted in the attributes scanned, decoded and matched.
+    """
+    def __init__(self, filters: list[Filter]):
+        self.header_filters = [query_filter for query_filter in filters if query_filter.field in _HEADER_FIELDS]
+        self.contents_filters = [query_filter for query_filter in filters if query_filter.field in _ENTITY_FIELDS]
+        self.scanned = 0
+        self.decoded = 0
+        self.matched = 0
+
+    @classmethod
+    def parse(cls, filter_strs: list[str]):
+        return cls([parse_filter(filter_str) for filter_str in filter_strs])
+
+    def _match_header(self, bp_type: blueprints.Type, label: str, version: int) -> bool:
+        self.scanned += 1
+        return all(_match_header(query_filter, bp_type, label, version) for query_filter in self.header_filters)
+
+    def _match_contents(self, contents: bom.BillOfMaterials) -> bool:
+        return all(_match_contents(query_filter, contents) for query_filter in self.contents_filters)
+
+    def match_json_string(self, blueprint_json_str: str, max_recursion_level: int = -1) -> Iterator[QueryMatch]:
+        """
+        Matching elements of the decoded JSON text of an exchange string. Only the blueprints that pass the filters on
+        the type, label and version are fully decoded. max_recursion_level < 0: no limit on the nesting of books.
+        """
+        contents_depth = max_recursion_level if max_recursion_level >= 0 else 1 << 16
+        root = book_index.read_header(blueprint_json_str, contents_depth=contents_depth)
+        stack = [((), root)]
+        while stack:
+            path, entry = stack.pop()
+            if self._match_header(entry.type, entry.label, entry.version) and self._match_entry_contents(blueprint_json_str, entry):
+                self.matched += 1
+                yield QueryMatch(path, entry.type, entry.label, entry.version)
+            if entry.contents:
+                stack.extend((path + (child.index,), child) for child in reversed(entry.contents))
+
+    def _match_entry_contents(self, blueprint_json_str: str, entry: book_index.BookEntry) -> bool:
+        if not self.contents_filters:
+            return True
+        if entry.type != blueprints.Type.BP:
+            return self._match_contents(_NO_CONTENTS)
+        self.decoded += 1
+        return self._match_contents(bom.bill_of_materials(book_index.load_entry(blueprint_json_str, entry)))
+
+    def match_object(self, blueprint_obj: dict, max_recursion_level: int = -1) -> Iterator[QueryMatch]:
+        """Same as match_json_string, on a blueprint object already decoded"""
+        for path, bp_type, label, obj in blueprints.walk_blueprint_object(blueprint_obj, max_recursion_level):
+            version = obj[bp_type.value].get('version') if bp_type else None
+            if self._match_header(bp_type, label, version) and (not self.contents_filters or self._match_contents(bom.bill_of_materials(obj) if bp_type == blueprints.Type.BP else _NO_CONTENTS)):
+                self.matched += 1
+                yield QueryMatch(path, bp_type, label, version)
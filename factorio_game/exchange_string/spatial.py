@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""
+Spatial index of the entities of a blueprint: range, nearest neighbour, overlap and power supply queries
+
+  The index is built once per blueprint, on the columns of a CompactBlueprint (see entity_table). The entities are
+  hashed on a grid of square cells by the position of their center, so that a query only visits the cells around
+  the queried area instead of all the entities. The overlaps are found with a second hash, of the tiles covered by
+  each entity: checking a blueprint against another one (e.g. before stamping it next to the other) takes a time
+  proportional to the area of the entities, whatever the size of the blueprints.
+
+  The footprint of an entity is read from the table ENTITY_SIZES (vanilla entities), rotated by its direction. The
+  size of an unknown entity is guessed from its position: the center of an entity of odd size is in the middle of a
+  tile (x.5), the one of an entity of even size on the corner of a tile. Rails and vehicles have no footprint: they
+  are indexed by their center, and never overlap other entities. The tiles (floor) of the blueprint are not indexed.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import heapq
+import math
+from array import array
+from collections.abc import Iterator
+from factorio_game.exchange_string import transforms
+from factorio_game.exchange_string.entity_table import CompactBlueprint, EntityTable
+
+
+DEFAULT_CELL_SIZE = 8
+
+# Name -> (width, height) facing north. The sizes of the other vanilla entities (1x1, 2x2) are guessed correctly.
+ENTITY_SIZES = {
+    'accumulator': (2, 2),
+    'arithmetic-combinator': (1, 2),
+    'artillery-turret': (3, 3),
+    'assembling-machine-1': (3, 3),
+    'assembling-machine-2': (3, 3),
+    'assembling-machine-3': (3, 3),
+    'beacon': (3, 3),
+    'big-electric-pole': (2, 2),
+    'boiler': (3, 2),
+    'burner-mining-drill': (2, 2),
+    'centrifuge': (3, 3),
+    'chemical-plant': (3, 3),
+    'decider-combinator': (1, 2),
+    'electric-furnace': (3, 3),
+    'electric-mining-drill': (3, 3),
+    'flamethrower-turret': (2, 3),
+    'gun-turret': (2, 2),
+    'heat-exchanger': (3, 2),
+    'lab': (3, 3),
+    'laser-turret': (2, 2),
+    'nuclear-reactor': (5, 5),
+    'offshore-pump': (1, 2),
+    'oil-refinery': (5, 5),
+    'power-switch': (2, 2),
+    'pump': (1, 2),
+    'pumpjack': (3, 3),
+    'radar': (3, 3),
+    'roboport': (4, 4),
+    'rocket-silo': (9, 9),
+    'selector-combinator': (1, 2),
+    'solar-panel': (3, 3),
+    'splitter': (2, 1),
+    'fast-splitter': (2, 1),
+    'express-splitter': (2, 1),
+    'turbo-splitter': (2, 1),
+    'steam-engine': (3, 5),
+    'steam-turbine': (3, 5),
+    'steel-furnace': (2, 2),
+    'stone-furnace': (2, 2),
+    'storage-tank': (3, 3),
+    'substation': (2, 2),
+    'train-stop': (2, 2),
+}
+
+# Entities without footprint (they are placed on rails, or over other entities)
+NON_COLLIDING_ENTITIES = frozenset([
+    'straight-rail', 'curved-rail', 'curved-rail-a', 'curved-rail-b', 'half-diagonal-rail', 'legacy-straight-rail',
+    'legacy-curved-rail', 'rail-ramp', 'rail-support', 'elevated-straight-rail', 'elevated-curved-rail-a',
+    'elevated-curved-rail-b', 'elevated-half-diagonal-rail',
+    'locomotive', 'cargo-wagon', 'fluid-wagon', 'artillery-wagon', 'car', 'tank', 'spidertron',
+])
+
+# Electric pole -> half side of the supply area (a square centered on the pole)
+SUPPLY_AREA_DISTANCES = {
+    'small-electric-pole': 2.5,
+    'medium-electric-pole': 3.5,
+    'big-electric-pole': 2,
+    'substation': 9,
+}
+
+# Tolerance on the coordinates: the boxes that only touch each other do not overlap
+_EPSILON = 1e-6
+
+
+def _guessed_size(coordinate: float) -> int:
+    return 1 if coordinate % 1 == 0.5 else 2
+
+
+class SpatialIndex:
+    """
+    Grid hash of the entities of a table (see entity_table.EntityTable). The queries return the indices of the
+    entities in the table: use table.entity(idx) or table.name(idx) to read them.
+    """
+    def __init__(self, table: EntityTable, direction_count: int = 8, cell_size: float = DEFAULT_CELL_SIZE):
+        assert cell_size > 0, 'The cell size must be positive'
+        self.table = table
+        self.cell_size = cell_size
+        self._build_boxes(direction_count)
+        self.cells = {}
+        for idx, (x, y) in enumerate(zip(table.x, table.y)):
+            key = (math.floor(x / cell_size), math.floor(y / cell_size))
+            cell = self.cells.get(key)
+            if cell is None:
+                self.cells[key] = [idx]
+            else:
+                cell.append(idx)
+        # Range of the occupied cells
+        self.cell_bounds = (min(cx for cx, _ in self.cells), min(cy for _, cy in self.cells),
+                            max(cx for cx, _ in self.cells), max(cy for _, cy in self.cells)) if self.cells else None
+        self._first_covering = None
+        self._stacked = None
+        self._collisions = None
+
+    def _build_boxes(self, direction_count: int) -> None:
+        """Half width and half height of the footprint of each entity (0 for the entities without footprint)"""
+        names = self.table.names.names
+        # Size facing north, by name id: None if the size is guessed from the position
+        sizes = [(0, 0) if name in NON_COLLIDING_ENTITIES else ENTITY_SIZES.get(name) for name in names]
+        quarter_turn = direction_count // 4
+        self.half_width = array('d')
+        self.half_height = array('d')
+        for name_id, x, y, direction in zip(self.table.name_id, self.table.x, self.table.y, self.table.direction):
+            size = sizes[name_id]
+            if size is None:
+                width, height = _guessed_size(x), _guessed_size(y)
+            elif direction % quarter_turn == 0 and (direction // quarter_turn) % 2 == 1:
+                # East or west
+                height, width = size
+            else:
+                width, height = size
+            self.half_width.append(width / 2)
+            self.half_height.append(height / 2)
+        self.max_half_width = max(self.half_width, default=0)
+        self.max_half_height = max(self.half_height, default=0)
+
+    @classmethod
+    def from_blueprint_object(cls, blueprint_obj: dict, cell_size: float = DEFAULT_CELL_SIZE) -> 'SpatialIndex':
+        """Index of the entities of a blueprint (not a book)"""
+        compact = CompactBlueprint(blueprint_obj)
+        return cls(compact.entities, transforms.direction_count(compact), cell_size)
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def box(self, idx: int) -> tuple[float, float, float, float]:
+        """(min_x, min_y, max_x, max_y) of the footprint of an entity"""
+        x, y = self.table.x[idx], self.table.y[idx]
+        half_width, half_height = self.half_width[idx], self.half_height[idx]
+        return x - half_width, y - half_height, x + half_width, y + half_height
+
+    def _candidates(self, min_x: float, min_y: float, max_x: float, max_y: float) -> Iterator[int]:
+        """The entities of which the center is in the cells of a rectangle"""
+        cell_size = self.cell_size
+        min_cx, max_cx = math.floor(min_x / cell_size), math.floor(max_x / cell_size)
+        min_cy, max_cy = math.floor(min_y / cell_size), math.floor(max_y / cell_size)
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self.cells):
+            # Large rectangle: visit the occupied cells only
+            for (cx, cy), cell in self.cells.items():
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                    yield from cell
+            return
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    yield from cell
+
+    def in_rect(self, min_x: float, min_y: float, max_x: float, max_y: float, contained: bool = False) -> list[int]:
+        """
+        The entities of which the footprint overlaps a rectangle, or is contained in it if contained is True. An
+        entity without footprint is selected if its center is in the rectangle. In the order of the table.
+        """
+        xs, ys, half_widths, half_heights = self.table.x, self.table.y, self.half_width, self.half_height
+        selected = []
+        for idx in self._candidates(min_x - self.max_half_width, min_y - self.max_half_height, max_x + self.max_half_width, max_y + self.max_half_height):
+            x, y, half_width, half_height = xs[idx], ys[idx], half_widths[idx], half_heights[idx]
+            if contained:
+                is_selected = min_x - _EPSILON <= x - half_width and x + half_width <= max_x + _EPSILON and min_y - _EPSILON <= y - half_height and y + half_height <= max_y + _EPSILON
+            elif half_width == 0 and half_height == 0:
+                is_selected = min_x <= x <= max_x and min_y <= y <= max_y
+            else:
+                is_selected = x - half_width < max_x - _EPSILON and x + half_width > min_x + _EPSILON and y - half_height < max_y - _EPSILON and y + half_height > min_y + _EPSILON
+            if is_selected:
+                selected.append(idx)
+        return sorted(selected)
+
+    def nearest(self, x: float, y: float, count: int = 1, name: str = None) -> list[int]:
+        """The count entities (of a given name, if any) of which the center is the closest to (x, y), closest first"""
+        assert count >= 1, 'The count must be at least 1'
+        name_id = self.table.names.ids.get(name) if name is not None else None
+        if name is not None and name_id is None:
+            return []
+        xs, ys, name_ids = self.table.x, self.table.y, self.table.name_id
+        cell_size = self.cell_size
+        center_cx, center_cy = math.floor(x / cell_size), math.floor(y / cell_size)
+        # Rings of cells around the cell of (x, y), until the count entities found are closer than the next ring
+        if self.cell_bounds is None:
+            return []
+        min_cx, min_cy, max_cx, max_cy = self.cell_bounds
+        max_ring = max(center_cx - min_cx, max_cx - center_cx, center_cy - min_cy, max_cy - center_cy)
+        found = []
+        for ring in range(max_ring + 1):
+            for cx in range(center_cx - ring, center_cx + ring + 1):
+                step = 1 if abs(cx - center_cx) == ring else 2 * ring
+                for cy in range(center_cy - ring, center_cy + ring + 1, max(step, 1)):
+                    for idx in self.cells.get((cx, cy), ()):
+                        if name_id is None or name_ids[idx] == name_id:
+                            found.append((math.hypot(xs[idx] - x, ys[idx] - y), idx))
+            if len(found) >= count:
+                # Any entity out of the rings scanned so far is at least at this distance
+                distance_scanned = min(x - (center_cx - ring) * cell_size, (center_cx + ring + 1) * cell_size - x,
+                                       y - (center_cy - ring) * cell_size, (center_cy + ring + 1) * cell_size - y)
+                if heapq.nsmallest(count, found)[-1][0] <= distance_scanned:
+                    break
+        return [idx for _, idx in heapq.nsmallest(count, found)]
+
+    def _tile_ranges(self, dx: float = 0, dy: float = 0) -> Iterator[tuple[int, range, range]]:
+        """(idx, range of x, range of y) of the tiles covered by the footprint of each entity, moved by (dx, dy)"""
+        floor, ceil = math.floor, math.ceil
+        for idx, (x, y, half_width, half_height) in enumerate(zip(self.table.x, self.table.y, self.half_width, self.half_height)):
+            if half_width == 0 and half_height == 0:
+                continue
+            x += dx
+            y += dy
+            yield idx, range(floor(x - half_width + _EPSILON), ceil(x + half_width - _EPSILON)), range(floor(y - half_height + _EPSILON), ceil(y + half_height - _EPSILON))
+
+    def _build_occupancy(self) -> None:
+        # Tile -> the first entity that covers it and, for the tiles covered by several entities, tile -> all of them
+        first_covering = {}
+        stacked = {}
+        collisions = set()
+        for idx, x_range, y_range in self._tile_ranges():
+            for tile_x in x_range:
+                for tile_y in y_range:
+                    tile = (tile_x, tile_y)
+                    other_idx = first_covering.setdefault(tile, idx)
+                    if other_idx != idx:
+                        covering = stacked.setdefault(tile, [other_idx])
+                        collisions.update((covering_idx, idx) for covering_idx in covering)
+                        covering.append(idx)
+        self._first_covering = first_covering
+        self._stacked = stacked
+        self._collisions = sorted(collisions)
+
+    def _covering(self, tile: tuple) -> list[int]:
+        """The entities that cover a tile, in the order of the table"""
+        idx = self._first_covering.get(tile)
+        if idx is None:
+            return []
+        return self._stacked.get(tile) or [idx]
+
+    def occupancy(self) -> dict:
+        """Tile (x, y) -> the list of the entities that cover it, in the order of the table"""
+        if self._collisions is None:
+            self._build_occupancy()
+        return { tile: self._covering(tile) for tile in self._first_covering }
+
+    def self_overlaps(self) -> list[tuple[int, int]]:
+        """The pairs of entities of the table that overlap each other"""
+        if self._collisions is None:
+            self._build_occupancy()
+        return self._collisions
+
+    def overlaps(self, other: 'SpatialIndex', dx: float = 0, dy: float = 0) -> list[tuple[int, int]]:
+        """
+        The pairs (entity of this index, entity of the other index) that would overlap if the entities of the other
+        index were moved by (dx, dy), e.g. if the other blueprint was stamped at (dx, dy) in this one.
+        """
+        if self._collisions is None:
+            self._build_occupancy()
+        first_covering, stacked = self._first_covering, self._stacked
+        pairs = set()
+        for other_idx, x_range, y_range in other._tile_ranges(dx, dy):
+            for tile_x in x_range:
+                for tile_y in y_range:
+                    idx = first_covering.get((tile_x, tile_y))
+                    if idx is None:
+                        continue
+                    covering = stacked.get((tile_x, tile_y)) if stacked else None
+                    if covering is None:
+                        pairs.add((idx, other_idx))
+                    else:
+                        pairs.update((covering_idx, other_idx) for covering_idx in covering)
+        return sorted(pairs)
+
+    def supplying_poles(self, idx: int) -> list[int]:
+        """The electric poles of which the supply area overlaps the footprint of an entity"""
+        min_x, min_y, max_x, max_y = self.box(idx)
+        max_distance = max(SUPPLY_AREA_DISTANCES.values())
+        names, name_ids, xs, ys = self.table.names.names, self.table.name_id, self.table.x, self.table.y
+        poles = []
+        for pole_idx in self.in_rect(min_x - max_distance, min_y - max_distance, max_x + max_distance, max_y + max_distance):
+            distance = SUPPLY_AREA_DISTANCES.get(names[name_ids[pole_idx]])
+            if distance is None:
+                continue
+            x, y = xs[pole_idx], ys[pole_idx]
+            if x - distance < max_x and x + distance > min_x and y - distance < max_y and y + distance > min_y:
+                poles.append(pole_idx)
+        return poles
+
+    def supplied_entities(self, pole_idx: int) -> list[int]:
+        """The entities of which the footprint overlaps the supply area of an electric pole (empty if not a pole)"""
+        distance = SUPPLY_AREA_DISTANCES.get(self.table.name(pole_idx))
+        if distance is None:
+            return []
+        x, y = self.table.x[pole_idx], self.table.y[pole_idx]
+        return [idx for idx in self.in_rect(x - distance, y - distance, x + distance, y + distance) if idx != pole_idx]
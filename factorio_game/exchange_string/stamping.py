@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Stamping of a blueprint on a grid, to generate large arrays of a module
+
+  The copies of the source blueprint are never built as JSON objects. Each entity (and tile) of the source blueprint
+  is serialized once into a template of its canonical JSON, with placeholders for its position and for the entity
+  numbers it refers to. The JSON text of the copies is then generated from the templates and streamed into the
+  compressor of the exchange string (see blueprints.ExchangeStringWriter).
+
+  The tiles are on the grid, so a blueprint with tiles is only stamped with an integer spacing (ValueError otherwise).
+
+  The entity numbers of the copy k are shifted by k times the largest entity number of the source blueprint. The
+  references to entity numbers are remapped: circuit and copper wires (connections and neighbours before 2.0, wires
+  since), train schedules (locomotives) and rolling stock connections.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import io
+import json
+import re
+from factorio_game.exchange_string import blueprints
+
+
+_PLACEHOLDER_PREFIX = '\x00'
+# Placeholders, once encoded in JSON: "\u0000R<entity number>" and "\u0000P<index of the position>"
+_PLACEHOLDER_REGEX = re.compile(r'"\\u0000([RP])(\d+)"')
+
+# Keys of which the value is an entity number (or a list of entity numbers), in each section of a blueprint
+_ENTITY_REFERENCE_KEYS = {
+    'entities': (frozenset(['entity_number', 'entity_id']), frozenset(['neighbours'])),
+    'schedules': (frozenset(), frozenset(['locomotives'])),
+    'stock_connections': (frozenset(['stock', 'front', 'back']), frozenset()),
+}
+
+
+class _Template:
+    """Canonical JSON of an object, split at the placeholders"""
+    def __init__(self, obj, reference_keys: frozenset, reference_list_keys: frozenset, with_position: bool):
+        self.positions = []
+        substituted = self._substitute(obj, reference_keys, reference_list_keys, with_position)
+        json_str = blueprints.canonical_json_string(substituted)
+        pieces = _PLACEHOLDER_REGEX.split(json_str)
+        # pieces: text, kind, value, text, kind, value, ..., text
+        self.texts = pieces[0::3]
+        self.placeholders = [(kind, int(value)) for kind, value in zip(pieces[1::3], pieces[2::3])]
+
+    def _substitute(self, obj, reference_keys: frozenset, reference_list_keys: frozenset, with_position: bool):
+        if isinstance(obj, list):
+            return [self._substitute(elt, reference_keys, reference_list_keys, False) for elt in obj]
+        if not isinstance(obj, dict):
+            return obj
+        substituted = {}
+        for key, value in obj.items():
+            if key in reference_keys and type(value) is int:
+                substituted[key] = f'{_PLACEHOLDER_PREFIX}R{value}'
+            elif key in reference_list_keys and isinstance(value, list):
+                substituted[key] = [f'{_PLACEHOLDER_PREFIX}R{elt}' if type(elt) is int else elt for elt in value]
+            elif key == 'position' and with_position:
+                substituted[key] = f'{_PLACEHOLDER_PREFIX}P{len(self.positions)}'
+                self.positions.append((value['x'], value['y']))
+            else:
+                substituted[key] = self._substitute(value, reference_keys, reference_list_keys, False)
+        return substituted
+
+    def render(self, dx, dy, entity_number_offset: int) -> str:
+        pieces = [self.texts[0]]
+        for (kind, value), text in zip(self.placeholders, self.texts[1:]):
+            if kind == 'R':
+                pieces.append(str(value + entity_number_offset))
+            else:
+                x, y = self.positions[value]
+                # repr() of int and float values is their JSON representation
+                pieces.append('{"x":' + repr(x + dx) + ',"y":' + repr(y + dy) + '}')
+            pieces.append(text)
+        return ''.join(pieces)
+
+
+def _max_entity_number(blueprint_subobj: dict) -> int:
+    return max((entity.get('entity_number', 0) for entity in blueprint_subobj.get('entities', [])), default=0)
+
+
+def _grid_offsets(columns: int, rows: int, spacing_x, spacing_y):
+    for row in range(rows):
+        for column in range(columns):
+            yield column * spacing_x, row * spacing_y
+
+
+def write_stamped_blueprint(blueprint_obj: dict, columns: int, rows: int, spacing_x, spacing_y, fp,
+                            exchange_str_version = blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION, compression: blueprints.CompressionProfile = None) -> None:
+    """
+    Write to a text file the exchange string of a blueprint repeated on a grid of columns x rows
+
+    Raise ValueError for a non-integer spacing if the blueprint has tiles. Nothing is written in that case.
+    """
+    assert blueprints.read_blueprint_type(blueprint_obj) == blueprints.Type.BP, 'Only accept a blueprint as input'
+    assert columns >= 1 and rows >= 1, 'The grid must have at least one column and one row'
+    blueprint_subobj = blueprint_obj['blueprint']
+    spacing_x, spacing_y = (int(spacing) if float(spacing).is_integer() else spacing for spacing in (spacing_x, spacing_y))
+    if blueprint_subobj.get('tiles') and not (type(spacing_x) is int and type(spacing_y) is int):
+        raise ValueError(f'The blueprint has tiles, so it can only be stamped with an integer spacing: ({spacing_x}, {spacing_y})')
+    entity_number_step = _max_entity_number(blueprint_subobj)
+    offsets = list(_grid_offsets(columns, rows, spacing_x, spacing_y))
+    writer = blueprints.ExchangeStringWriter(fp, exchange_str_version, compression)
+
+    def write_list(templates: list) -> None:
+        writer.write('[')
+        first = True
+        for copy_idx, (dx, dy) in enumerate(offsets):
+            for template in templates:
+                if not first:
+                    writer.write(',')
+                writer.write(template.render(dx, dy, copy_idx * entity_number_step))
+                first = False
+        writer.write(']')
+
+    def write_wires(wires: list) -> None:
+        # Factorio 2.0: [entity_number_1, connector_id_1, entity_number_2, connector_id_2]
+        writer.write('[')
+        first = True
+        for copy_idx in range(len(offsets)):
+            offset = copy_idx * entity_number_step
+            for entity_number_1, connector_id_1, entity_number_2, connector_id_2 in wires:
+                writer.write(f'{"" if first else ","}[{entity_number_1 + offset},{connector_id_1},{entity_number_2 + offset},{connector_id_2}]')
+                first = False
+        writer.write(']')
+
+    writer.write('{')
+    for key in sorted(blueprint_obj):
+        if key < 'blueprint':
+            writer.write(f'{json.dumps(key)}:{blueprints.canonical_json_string(blueprint_obj[key])},')
+    writer.write('"blueprint":{')
+    for member_idx, key in enumerate(sorted(blueprint_subobj)):
+        if member_idx > 0:
+            writer.write(',')
+        writer.write(json.dumps(key) + ':')
+        value = blueprint_subobj[key]
+        if key in ('entities', 'tiles'):
+            reference_keys, reference_list_keys = _ENTITY_REFERENCE_KEYS.get(key, (frozenset(), frozenset()))
+            write_list([_Template(elt, reference_keys, reference_list_keys, True) for elt in value])
+        elif key in ('schedules', 'stock_connections'):
+            reference_keys, reference_list_keys = _ENTITY_REFERENCE_KEYS[key]
+            write_list([_Template(elt, reference_keys, reference_list_keys, False) for elt in value])
+        elif key == 'wires':
+            write_wires(value)
+        else:
+            writer.write(blueprints.canonical_json_string(value))
+    writer.write('}')
+    # Keys after 'blueprint', in the canonical order
+    writer.write(''.join(f',{json.dumps(key)}:{blueprints.canonical_json_string(blueprint_obj[key])}' for key in sorted(blueprint_obj) if key > 'blueprint'))
+    writer.write('}')
+    writer.close()
+
+
+def stamp_blueprint(blueprint_obj: dict, columns: int, rows: int, spacing_x, spacing_y,
+                    exchange_str_version = blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION, compression: blueprints.CompressionProfile = None) -> str:
+    """Exchange string of a blueprint repeated on a grid of columns x rows"""
+    fp = io.StringIO()
+    write_stamped_blueprint(blueprint_obj, columns, rows, spacing_x, spacing_y, fp, exchange_str_version, compression)
+    return fp.getvalue()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Geometric transformations of blueprints: translation, rotation by quarter turns, and mirroring
+
+  The transformations work on the columns of a CompactBlueprint (see entity_table), over all the entities and tiles
+  at once. The positions of the entities are their centers, while the positions of the tiles are their top-left
+  corners. The directions of the entities are updated (8 directions before Factorio 2.0, 16 directions since), as
+  well as the orientation of vehicles and the left/right priorities of splitters when mirroring. A direction is only
+  added to an entity without one if the entity is known to be directional (DIRECTIONAL_ENTITIES).
+
+  The curved rails of Factorio 1.1 are mirrored with their own table of directions. The mirroring of the curved and
+  half-diagonal rails of Factorio 2.0 is not supported (ValueError). Note that the mirrored rail signals and train
+  stops end up on the other side of their track.
+
+  The tiles are on the grid, so a blueprint with tiles is only translated by integer offsets (ValueError otherwise).
+
+  The footprint of the entities is not known, so the bounding box is the one of the entity centers and tiles.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+from array import array
+from collections.abc import Callable
+from factorio_game.exchange_string import blueprints
+from factorio_game.exchange_string.entity_table import CompactBlueprint, EntityTable, HAS_DIRECTION, X_IS_INT, Y_IS_INT
+
+
+_FIRST_VERSION_WITH_16_DIRECTIONS = 2 << 48
+_SWAP_INT_FLAGS = bytes((flags & ~(X_IS_INT | Y_IS_INT)) | (X_IS_INT if flags & Y_IS_INT else 0) | (Y_IS_INT if flags & X_IS_INT else 0) for flags in range(256))
+_SWAPPED_PRIORITIES = { 'left': 'right', 'right': 'left' }
+
+# Vanilla entities that have a direction, to add to the entities without one once rotated or mirrored
+DIRECTIONAL_ENTITIES = frozenset([
+    'transport-belt', 'fast-transport-belt', 'express-transport-belt', 'turbo-transport-belt',
+    'underground-belt', 'fast-underground-belt', 'express-underground-belt', 'turbo-underground-belt',
+    'splitter', 'fast-splitter', 'express-splitter', 'turbo-splitter', 'loader', 'fast-loader', 'express-loader', 'turbo-loader',
+    'burner-inserter', 'inserter', 'long-handed-inserter', 'fast-inserter', 'filter-inserter', 'stack-inserter',
+    'stack-filter-inserter', 'bulk-inserter',
+    'pipe-to-ground', 'pump', 'offshore-pump', 'storage-tank',
+    'boiler', 'steam-engine', 'steam-turbine', 'heat-exchanger',
+    'assembling-machine-1', 'assembling-machine-2', 'assembling-machine-3', 'chemical-plant', 'oil-refinery',
+    'burner-mining-drill', 'electric-mining-drill', 'big-mining-drill', 'pumpjack',
+    'arithmetic-combinator', 'decider-combinator', 'selector-combinator', 'constant-combinator',
+    'gun-turret', 'laser-turret', 'flamethrower-turret', 'artillery-turret', 'gate',
+    'straight-rail', 'curved-rail', 'curved-rail-a', 'curved-rail-b', 'half-diagonal-rail', 'legacy-straight-rail',
+    'legacy-curved-rail', 'rail-ramp', 'elevated-straight-rail', 'elevated-curved-rail-a', 'elevated-curved-rail-b',
+    'elevated-half-diagonal-rail', 'rail-signal', 'rail-chain-signal', 'train-stop',
+])
+
+# Factorio 1.1: the curved rails come in pairs mirrored along their straight end (directions 0 and 1, 2 and 3, ...)
+_CURVED_RAIL = 'curved-rail'
+# Factorio 2.0: rails of which the mirroring is not supported
+_UNMIRRORABLE_RAILS = frozenset([
+    'curved-rail-a', 'curved-rail-b', 'half-diagonal-rail', 'legacy-curved-rail',
+    'elevated-curved-rail-a', 'elevated-curved-rail-b', 'elevated-half-diagonal-rail',
+])
+
+
+def direction_count(compact: CompactBlueprint) -> int:
+    version = compact.blueprint.get('version')
+    return 16 if version is not None and version >= _FIRST_VERSION_WITH_16_DIRECTIONS else 8
+
+
+def _translation(count: int, map_direction: Callable[[int], int]) -> bytes:
+    return bytes(map_direction(direction) % count if direction < count else direction for direction in range(256))
+
+
+def _map_directions(table: EntityTable, count: int, map_direction: Callable[[int], int], special_directions: dict = None) -> None:
+    """
+    Apply a mapping of the directions with a translation table, and mark the non-default directions of the directional
+    entities as present. special_directions: entity name -> mapping of the directions of the entities of that name.
+    """
+    translation = _translation(count, map_direction)
+    special_translations = { table.names.ids[name]: _translation(count, map_special) for name, map_special in (special_directions or {}).items() if name in table.names.ids }
+    if special_translations:
+        table.direction = array('B', [special_translations.get(name_id, translation)[direction] for name_id, direction in zip(table.name_id, table.direction)])
+    else:
+        table.direction = array('B', table.direction.tobytes().translate(translation))
+    directional_ids = { name_id for name, name_id in table.names.ids.items() if name in DIRECTIONAL_ENTITIES }
+    table.flags = array('B', [flags | HAS_DIRECTION if direction and (flags & HAS_DIRECTION or name_id in directional_ids) else flags
+                              for flags, direction, name_id in zip(table.flags, table.direction, table.name_id)])
+
+
+def _check_mirrorable(compact: CompactBlueprint, count: int) -> None:
+    if count == 16:
+        name_ids = { compact.names.ids[name] for name in _UNMIRRORABLE_RAILS if name in compact.names.ids }
+        if name_ids and not name_ids.isdisjoint(compact.entities.name_id):
+            raise ValueError('The mirroring of the curved and half-diagonal rails of Factorio 2.0 is not supported')
+
+
+def _map_extras(table: EntityTable, key: str, map_value: Callable) -> None:
+    for extras in table.extras:
+        if extras and key in extras:
+            extras[key] = map_value(extras[key])
+
+
+def _is_int(value) -> bool:
+    return type(value) is int
+
+
+def translate(compact: CompactBlueprint, dx, dy) -> None:
+    """Move by (dx, dy) tiles. Raise ValueError for a non-integer offset if the blueprint has tiles."""
+    dx, dy = (int(d) if float(d).is_integer() else d for d in (dx, dy))
+    if len(compact.tiles) and not (_is_int(dx) and _is_int(dy)):
+        raise ValueError(f'The blueprint has tiles, so it can only be moved by an integer number of tiles: ({dx}, {dy})')
+    for table in (compact.entities, compact.tiles):
+        table.x = array('d', [x + dx for x in table.x])
+        table.y = array('d', [y + dy for y in table.y])
+        clear_flags = (0 if _is_int(dx) else X_IS_INT) | (0 if _is_int(dy) else Y_IS_INT)
+        if clear_flags:
+            table.flags = array('B', [flags & ~clear_flags for flags in table.flags])
+
+
+def rotate(compact: CompactBlueprint, quarter_turns: int = 1) -> None:
+    """Rotate clockwise around the origin, by a number of quarter turns"""
+    count = direction_count(compact)
+    for _ in range(quarter_turns % 4):
+        # (x, y) -> (-y, x) for the centers of the entities, (-y - 1, x) for the corners of the tiles
+        # (the negations are written -offset - y so that 0.0 is mapped to 0.0, and not to -0.0)
+        for table, offset in ((compact.entities, 0), (compact.tiles, 1)):
+            table.x, table.y = array('d', [-offset - y for y in table.y]), table.x
+            table.flags = array('B', table.flags.tobytes().translate(_SWAP_INT_FLAGS))
+        _map_directions(compact.entities, count, lambda direction: direction + count // 4)
+        _map_extras(compact.entities, 'orientation', lambda orientation: (orientation + 0.25) % 1)
+
+
+def flip_horizontal(compact: CompactBlueprint) -> None:
+    """Mirror along the vertical axis (x -> -x). Raise ValueError if the blueprint cannot be mirrored (see above)."""
+    count = direction_count(compact)
+    _check_mirrorable(compact, count)
+    for table, offset in ((compact.entities, 0), (compact.tiles, 1)):
+        table.x = array('d', [-offset - x for x in table.x])
+    _map_directions(compact.entities, count, lambda direction: count - direction, { _CURVED_RAIL: lambda direction: 1 - direction })
+    _map_extras(compact.entities, 'orientation', lambda orientation: (1 - orientation) % 1)
+    _map_extras(compact.entities, 'input_priority', lambda priority: _SWAPPED_PRIORITIES.get(priority, priority))
+    _map_extras(compact.entities, 'output_priority', lambda priority: _SWAPPED_PRIORITIES.get(priority, priority))
+
+
+def flip_vertical(compact: CompactBlueprint) -> None:
+    """Mirror along the horizontal axis (y -> -y). Raise ValueError if the blueprint cannot be mirrored (see above)."""
+    count = direction_count(compact)
+    _check_mirrorable(compact, count)
+    for table, offset in ((compact.entities, 0), (compact.tiles, 1)):
+        table.y = array('d', [-offset - y for y in table.y])
+    _map_directions(compact.entities, count, lambda direction: count // 2 - direction, { _CURVED_RAIL: lambda direction: 5 - direction })
+    _map_extras(compact.entities, 'orientation', lambda orientation: (0.5 - orientation) % 1)
+    _map_extras(compact.entities, 'input_priority', lambda priority: _SWAPPED_PRIORITIES.get(priority, priority))
+    _map_extras(compact.entities, 'output_priority', lambda priority: _SWAPPED_PRIORITIES.get(priority, priority))
+
+
+def bounding_box(compact: CompactBlueprint) -> tuple[float, float, float, float]:
+    """(min_x, min_y, max_x, max_y) of the entity centers and of the tiles, None if the blueprint is empty"""
+    boxes = []
+    if len(compact.entities):
+        boxes.append(compact.entities.bounding_box())
+    if len(compact.tiles):
+        min_x, min_y, max_x, max_y = compact.tiles.bounding_box()
+        boxes.append((min_x, min_y, max_x + 1, max_y + 1))
+    if not boxes:
+        return None
+    return min(box[0] for box in boxes), min(box[1] for box in boxes), max(box[2] for box in boxes), max(box[3] for box in boxes)
+
+
+def transform_blueprint_object(blueprint_obj: dict, transform: Callable, *args) -> dict:
+    """Apply a transformation to a blueprint, or to all the blueprints of a book (recursively). Return a new object."""
+    bp_type = blueprints.read_blueprint_type(blueprint_obj)
+    if bp_type == blueprints.Type.BP:
+        compact = CompactBlueprint(blueprint_obj)
+        transform(compact, *args)
+        return compact.to_blueprint_object()
+    if bp_type == blueprints.Type.BOOK:
+        book_subobj = blueprint_obj['blueprint_book']
+        book_contents = [transform_blueprint_object(page_obj, transform, *args) for page_obj in book_subobj.get('blueprints', [])]
+        return { **blueprint_obj, 'blueprint_book': { **book_subobj, 'blueprints': book_contents } }
+    # Planners have no geometry
+    return blueprint_obj
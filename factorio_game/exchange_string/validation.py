@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+"""
+Structural validation of blueprints, blueprint books, deconstruction planners and upgrade planners
+
+  The game rejects (or silently mangles) the exchange strings of hand-edited or generated blueprints that are
+  malformed, while the encoder accepts any JSON object. The validator checks, before encoding or importing:
+
+    - the type of the object (one of blueprints.Type) and the required keys of each type, with the type of their values
+    - the required keys of the entities (entity_number, name, position) and of the tiles (name, position)
+    - the uniqueness of the entity numbers of a blueprint
+    - the references to entity numbers: copper wires (neighbours), circuit and copper connections, wires (game
+      version 2.0) and the locomotives of train schedules
+    - the uniqueness of the indices of the pages of a blueprint book
+
+  The schemas (key -> type of the value, required) are compiled once, at import, into predicates, and the blueprint
+  object is checked in a single pass, without recursion: every entity of a blueprint is visited once, and the
+  references to entity numbers are resolved with a hash set. The detailed issues are only worked out for the elements
+  that fail their predicate. This is cheap enough to be done by default before encoding or importing a blueprint.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import itertools
+import json
+from collections.abc import Iterator
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+class Issue(NamedTuple):
+    path: tuple                 # Indices of the page in the nested books (empty for the top level object, -1 for a page without index)
+    kind: str                   # 'type', 'key', 'entity', 'tile', 'wire' or 'index'
+    message: str
+
+
+# Schema: key -> (type, tuple of types, or nested schema of a dict; required). The types are exact, as the ones of
+# decoded JSON (a bool is not a valid int).
+_NUMBER = (int, float)
+_POSITION_SCHEMA = {
+    'x': (_NUMBER, True),
+    'y': (_NUMBER, True),
+}
+_COMMON_SCHEMA = {
+    'item': (str, True),
+    'label': (str, False),
+    'description': (str, False),
+    'version': (int, False),
+    'icons': (list, False),
+}
+_SCHEMAS = {
+    blueprints.Type.BP: {
+        **_COMMON_SCHEMA,
+        'entities': (list, False),
+        'tiles': (list, False),
+        'wires': (list, False),
+        'schedules': (list, False),
+    },
+    blueprints.Type.BOOK: {
+        **_COMMON_SCHEMA,
+        'active_index': (int, False),
+        'blueprints': (list, False),
+    },
+    blueprints.Type.DECON: {
+        **_COMMON_SCHEMA,
+        'settings': (dict, False),
+    },
+    blueprints.Type.UPGRADE: {
+        **_COMMON_SCHEMA,
+        'settings': (dict, False),
+    },
+}
+_ENTITY_SCHEMA = {
+    'entity_number': (int, True),
+    'name': (str, True),
+    'position': (_POSITION_SCHEMA, True),
+    'direction': (int, False),
+    'neighbours': (list, False),
+    'connections': (dict, False),
+}
+_TILE_SCHEMA = {
+    'name': (str, True),
+    'position': (_POSITION_SCHEMA, True),
+}
+
+
+def _predicate_source(schema: dict, var: str, names: Iterator[str]) -> str:
+    terms = []
+    for key, (types, required) in schema.items():
+        if isinstance(types, dict):
+            name = next(names)
+            term = f'type({name} := {var}.get({key!r})) is dict and {_predicate_source(types, name, names)}'
+        else:
+            type_names = ', '.join(value_type.__name__ for value_type in (types if isinstance(types, tuple) else (types,)))
+            term = f'type({var}.get({key!r})) in ({type_names},)'
+        terms.append(f'({term})' if required else f'({key!r} not in {var} or {term})')
+    return ' and '.join(terms)
+
+
+def _compile(schema: dict):
+    """
+    Predicate obj -> True if the dict obj matches a schema. The schema is compiled into a single boolean expression,
+    which is several times faster than interpreting the schema for each entity of a large blueprint.
+    """
+    names = (f'value{idx}' for idx in itertools.count())
+    namespace = {}
+    exec(f'def predicate(obj):\n    return {_predicate_source(schema, "obj", names)}\n', namespace)
+    return namespace['predicate']
+
+
+def _schema_issues(obj: dict, schema: dict, prefix: str = '') -> Iterator[str]:
+    """The keys of a dict that do not match a schema (the slow path, for the objects rejected by their predicate)"""
+    for key, (types, required) in schema.items():
+        if key not in obj:
+            if required:
+                yield f'missing key {prefix}{key}'
+            continue
+        value = obj[key]
+        if isinstance(types, dict):
+            if type(value) is dict:
+                yield from _schema_issues(value, types, f'{prefix}{key}.')
+                continue
+            types = dict
+        value_types = types if isinstance(types, tuple) else (types,)
+        if type(value) not in value_types:
+            expected = ' or '.join(value_type.__name__ for value_type in value_types)
+            yield f'{prefix}{key}: expected {expected}, got {"null" if value is None else type(value).__name__}'
+
+
+_SCHEMA_PREDICATES = { bp_type: _compile(schema) for bp_type, schema in _SCHEMAS.items() }
+_is_valid_entity = _compile(_ENTITY_SCHEMA)
+_is_valid_tile = _compile(_TILE_SCHEMA)
+_TYPE_KEYS = tuple(bp_type.value for bp_type in _SCHEMAS)
+
+
+def _connection_references(connections: dict) -> Iterator[tuple]:
+    """
+    (referenced entity number or None if missing, key) of the connections of an entity (game version 1.x):
+    {'1': {'red': [{'entity_id': n, 'circuit_id': c}], 'green': [...]}, '2': {...}, 'Cu0': [{'entity_id': n, 'wire_id': w}]}
+    """
+    for connector, connector_value in connections.items():
+        if type(connector_value) is dict:
+            wire_lists = [(f'connections.{connector}.{color}', wire_list) for color, wire_list in connector_value.items()]
+        else:
+            wire_lists = [(f'connections.{connector}', connector_value)]
+        for where, wire_list in wire_lists:
+            if type(wire_list) is not list:
+                yield None, where
+                continue
+            for wire in wire_list:
+                yield (wire.get('entity_id') if type(wire) is dict else None), where
+
+
+def _reference_issue(referenced_number, entity_numbers: set, what: str) -> str:
+    """The issue with a reference to an entity, None if the entity exists"""
+    if type(referenced_number) is not int:
+        return f'invalid reference {json.dumps(referenced_number, default=repr)}, expected an entity number'
+    if referenced_number not in entity_numbers:
+        return f'reference to the missing {what} {referenced_number}'
+    return None
+
+
+class _Validator:
+    def __init__(self):
+        self.issues = []
+
+    def add(self, path: tuple, kind: str, message: str) -> None:
+        self.issues.append(Issue(path, kind, message))
+
+    def add_schema_issues(self, obj: dict, schema: dict, path: tuple, kind: str, what: str) -> None:
+        for message in _schema_issues(obj, schema):
+            self.add(path, kind, f'{what}: {message}')
+
+    def check_blueprint(self, blueprint_subobj: dict, path: tuple) -> None:
+        entity_numbers = set()
+        # Entity numbers referenced by the wires: they are resolved once all the entities are known
+        referenced = []
+        entities = blueprint_subobj.get('entities', [])
+        for position, entity in enumerate(entities if type(entities) is list else []):
+            if type(entity) is not dict:
+                self.add(path, 'entity', f'Entity #{position}: not an object')
+                continue
+            if not _is_valid_entity(entity):
+                self.add_schema_issues(entity, _ENTITY_SCHEMA, path, 'entity', _entity_description(entity, position))
+                if type(entity.get('entity_number')) is not int:
+                    continue
+            entity_number = entity['entity_number']
+            if entity_number in entity_numbers:
+                self.add(path, 'entity', f'{_entity_description(entity, position)}: duplicate entity_number')
+            entity_numbers.add(entity_number)
+            if 'neighbours' in entity and type(entity['neighbours']) is list:
+                referenced.extend(entity['neighbours'])
+            if 'connections' in entity and type(entity['connections']) is dict:
+                for referenced_number, where in _connection_references(entity['connections']):
+                    if referenced_number is None:
+                        self.add(path, 'wire', f'{_entity_description(entity, position)}: {where}: missing entity_id')
+                    else:
+                        referenced.append(referenced_number)
+        tiles = blueprint_subobj.get('tiles', [])
+        for position, tile in enumerate(tiles if type(tiles) is list else []):
+            if type(tile) is not dict:
+                self.add(path, 'tile', f'Tile #{position}: not an object')
+            elif not _is_valid_tile(tile):
+                self.add_schema_issues(tile, _TILE_SCHEMA, path, 'tile', f'Tile #{position} ({tile.get("name")})')
+        for position, wire in enumerate(_list_value(blueprint_subobj, 'wires')):
+            # Game version 2.0: [entity number, connector id, entity number, connector id]
+            if type(wire) is list and len(wire) == 4:
+                referenced.append(wire[0])
+                referenced.append(wire[2])
+            else:
+                self.add(path, 'wire', f'Wire #{position}: expected [entity_number, connector, entity_number, connector]')
+        for schedule in _list_value(blueprint_subobj, 'schedules'):
+            if type(schedule) is dict and type(schedule.get('locomotives')) is list:
+                referenced.extend(schedule['locomotives'])
+        if not all(type(referenced_number) is int for referenced_number in referenced) or not entity_numbers.issuperset(referenced):
+            self.add_dangling_references(blueprint_subobj, entity_numbers, path)
+
+    def add_dangling_references(self, blueprint_subobj: dict, entity_numbers: set, path: tuple) -> None:
+        """Second pass, only if some references are dangling or are not entity numbers, to describe them"""
+        entities = _list_value(blueprint_subobj, 'entities')
+        for position, entity in enumerate(entities):
+            if type(entity) is not dict:
+                continue
+            references = []
+            if type(entity.get('neighbours')) is list:
+                references.extend((neighbour, 'neighbours') for neighbour in entity['neighbours'])
+            if type(entity.get('connections')) is dict:
+                references.extend(_connection_references(entity['connections']))
+            for referenced_number, where in references:
+                message = _reference_issue(referenced_number, entity_numbers, 'entity') if referenced_number is not None else None
+                if message:
+                    self.add(path, 'wire', f'{_entity_description(entity, position)}: {where}: {message}')
+        for position, wire in enumerate(_list_value(blueprint_subobj, 'wires')):
+            if type(wire) is list and len(wire) == 4:
+                for referenced_number in (wire[0], wire[2]):
+                    message = _reference_issue(referenced_number, entity_numbers, 'entity')
+                    if message:
+                        self.add(path, 'wire', f'Wire #{position}: {message}')
+        for position, schedule in enumerate(_list_value(blueprint_subobj, 'schedules')):
+            if type(schedule) is dict and type(schedule.get('locomotives')) is list:
+                for referenced_number in schedule['locomotives']:
+                    message = _reference_issue(referenced_number, entity_numbers, 'locomotive')
+                    if message:
+                        self.add(path, 'wire', f'Schedule #{position}: {message}')
+
+    def check_book(self, book_subobj: dict, path: tuple) -> list:
+        """The (path, page) of the pages of a book"""
+        indices = set()
+        pages = []
+        for position, page in enumerate(_list_value(book_subobj, 'blueprints')):
+            index = page.get('index', -1) if type(page) is dict else -1
+            if index != -1 and (type(index) is not int or index < 0):
+                self.add(path, 'index', f'Page #{position}: invalid index {index}')
+                index = -1
+            elif index in indices:
+                self.add(path, 'index', f'Page #{position}: duplicate index {index}')
+            elif index != -1:
+                indices.add(index)
+            pages.append((path + (index,), page))
+        return pages
+
+    def check(self, blueprint_obj: dict) -> None:
+        # Iterative, as blueprints.walk_blueprint_object, but the malformed pages are reported instead of raising
+        stack = [((), blueprint_obj)]
+        while stack:
+            path, obj = stack.pop()
+            if type(obj) is not dict:
+                self.add(path, 'type', 'Not an object')
+                continue
+            type_keys = [key for key in _TYPE_KEYS if key in obj]
+            if len(type_keys) != 1:
+                message = f'Several types: {", ".join(type_keys)}' if type_keys else f'Unknown type, expected one of the keys {", ".join(_TYPE_KEYS)}'
+                self.add(path, 'type', message)
+                continue
+            bp_type = blueprints.Type(type_keys[0])
+            subobj = obj[bp_type.value]
+            if type(subobj) is not dict:
+                self.add(path, 'type', f'{bp_type.value}: expected dict, got {type(subobj).__name__}')
+                continue
+            if not _SCHEMA_PREDICATES[bp_type](subobj):
+                self.add_schema_issues(subobj, _SCHEMAS[bp_type], path, 'key', bp_type.value)
+            if bp_type == blueprints.Type.BP:
+                self.check_blueprint(subobj, path)
+            elif bp_type == blueprints.Type.BOOK:
+                # In reverse order, so that the pages are checked in order
+                stack.extend(reversed(self.check_book(subobj, path)))
+
+
+def _list_value(obj: dict, key: str) -> list:
+    value = obj.get(key)
+    return value if type(value) is list else []
+
+
+def _entity_description(entity: dict, position: int) -> str:
+    entity_number = entity.get('entity_number')
+    return f'Entity {entity_number if entity_number is not None else "#" + str(position)} ({entity.get("name")})'
+
+
+def validate(blueprint_obj: dict) -> list[Issue]:
+    """The structural issues of a blueprint object (of any type), in the order of the book. Empty if valid."""
+    validator = _Validator()
+    validator.check(blueprint_obj)
+    return validator.issues
+
+
+def format_issue(issue: Issue) -> str:
+    path_str = blueprints.format_index_path(issue.path)
+    return f'{path_str}: {issue.message}' if path_str else issue.message
+
+
+MAX_ISSUES_IN_ERROR = 5
+
+
+def check(blueprint_obj: dict) -> None:
+    """Raise ValueError, with the first issues, if the blueprint object is not valid (see validate)"""
+    issues = validate(blueprint_obj)
+    if not issues:
+        return
+    messages = [format_issue(issue) for issue in issues[:MAX_ISSUES_IN_ERROR]]
+    if len(issues) > MAX_ISSUES_IN_ERROR:
+        messages.append(f'and {len(issues) - MAX_ISSUES_IN_ERROR} more')
+    raise ValueError(f'Invalid blueprint ({len(issues)} issue{"s" if len(issues) > 1 else ""}): ' + '; '.join(messages))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Migration of blueprints between versions of the game Factorio (https://www.factorio.com/)
+
+  A migration renames prototypes (entities, items, recipes, signals...) in a blueprint object. The renaming tables
+  of successive versions are composed and compiled into a single migration, applied in a single iterative pass over
+  the parts of the blueprint object that hold prototype names: the traversal only descends into the values of the
+  container keys (entities, tiles, icons, filters, items, the settings of the planners...), and into the whole
+  control behavior and train schedules of the entities, of which the signals are nested in many ways. The positions,
+  wires, tags, etc. are not visited. Only the keys known to hold a prototype name are looked up in each JSON object.
+
+  Only the names are migrated. Other changes of the blueprint format (e.g. the encoding of directions and circuit
+  wires in 2.0) are left to the game, which reads blueprints from older versions.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+from factorio_game.exchange_string import blueprints
+
+
+ENTITY_RENAMING_0_16_TO_0_17 = {
+    'science-pack-1': 'automation-science-pack',
+    'science-pack-2': 'logistic-science-pack',
+    'science-pack-3': 'chemical-science-pack',
+    'high-tech-science-pack': 'utility-science-pack',
+    'raw-wood': 'wood',
+}
+
+ENTITY_RENAMING_1_1_TO_2_0 = {
+    'logistic-chest-active-provider': 'active-provider-chest',
+    'logistic-chest-passive-provider': 'passive-provider-chest',
+    'logistic-chest-storage': 'storage-chest',
+    'logistic-chest-buffer': 'buffer-chest',
+    'logistic-chest-requester': 'requester-chest',
+    'filter-inserter': 'fast-inserter',
+    'stack-inserter': 'bulk-inserter',
+    'stack-filter-inserter': 'bulk-inserter',
+    'straight-rail': 'legacy-straight-rail',
+    'curved-rail': 'legacy-curved-rail',
+}
+
+# Target version, and renaming table from the previous version
+MIGRATIONS = {
+    '0.17': ENTITY_RENAMING_0_16_TO_0_17,
+    '2.0': ENTITY_RENAMING_1_1_TO_2_0,
+}
+
+# Keys of which the value is a prototype name
+DEFAULT_NAME_KEYS = frozenset(['name', 'recipe', 'filter', 'item'])
+# Keys of which the value is an object keyed by prototype names (e.g. the modules of an entity: {"speed-module": 2})
+DEFAULT_MAPPING_KEYS = frozenset(['items'])
+# Keys of which the value (object or list) may contain prototype names
+DEFAULT_CONTAINER_KEYS = frozenset([
+    # Books and planners
+    'blueprint_book', 'blueprints', 'blueprint', 'upgrade_planner', 'deconstruction_planner', 'settings',
+    'mappers', 'from', 'to', 'entity_filters', 'tile_filters',
+    # Blueprints and entities
+    'entities', 'tiles', 'icons', 'signal', 'items', 'id', 'inventory', 'filters', 'request_filters', 'sections',
+    'priority_list', 'infinity_settings',
+])
+# Keys of which the value is visited as a whole
+DEFAULT_FULL_WALK_KEYS = frozenset(['control_behavior', 'schedules'])
+
+
+class Migration(NamedTuple):
+    renaming: dict
+    name_keys: frozenset
+    mapping_keys: frozenset
+    container_keys: frozenset
+    full_walk_keys: frozenset
+
+
+def encode_game_version(version_str: str) -> int:
+    """Inverse of blueprints.decode_game_version"""
+    numbers = [int(number) for number in version_str.split('.')]
+    assert 1 <= len(numbers) <= 4, 'Invalid version: ' + version_str
+    numbers += [0] * (4 - len(numbers))
+    return (numbers[0] << 48) | (numbers[1] << 32) | (numbers[2] << 16) | numbers[3]
+
+
+def compose_renamings(renamings: Iterable[dict]) -> dict:
+    """A single renaming table equivalent to applying the renaming tables one after the other"""
+    composed = {}
+    for renaming in renamings:
+        composed = { old_name: renaming.get(new_name, new_name) for old_name, new_name in composed.items() }
+        for old_name, new_name in renaming.items():
+            composed.setdefault(old_name, new_name)
+    return { old_name: new_name for old_name, new_name in composed.items() if old_name != new_name }
+
+
+def compile_migration(renaming: dict, name_keys: frozenset = DEFAULT_NAME_KEYS, mapping_keys: frozenset = DEFAULT_MAPPING_KEYS,
+                      container_keys: frozenset = DEFAULT_CONTAINER_KEYS, full_walk_keys: frozenset = DEFAULT_FULL_WALK_KEYS) -> Migration:
+    return Migration(dict(renaming), frozenset(name_keys), frozenset(mapping_keys), frozenset(container_keys), frozenset(full_walk_keys))
+
+
+def compile_migration_to(target_version: str, from_version: int = None) -> Migration:
+    """Migration to a target version (a key of MIGRATIONS), from an encoded game version (None: from any version)"""
+    assert target_version in MIGRATIONS, 'Unknown migration: ' + target_version + '. Available: ' + ', '.join(MIGRATIONS)
+    target_version_int = encode_game_version(target_version)
+    renamings = []
+    for version_str, renaming in sorted(MIGRATIONS.items(), key=lambda item: encode_game_version(item[0])):
+        version_int = encode_game_version(version_str)
+        if version_int > target_version_int:
+            break
+        if from_version is None or from_version < version_int:
+            renamings.append(renaming)
+    return compile_migration(compose_renamings(renamings))
+
+
+def apply_migration(migration: Migration, blueprint_obj) -> int:
+    """Rename in place the prototypes of a blueprint object. Return the number of replacements."""
+    renaming = migration.renaming
+    name_keys = migration.name_keys
+    mapping_keys = migration.mapping_keys
+    container_keys = migration.container_keys
+    full_walk_keys = migration.full_walk_keys
+    replacements = 0
+    # The nodes of which only the values of the container keys are visited, and the nodes of which all the values are
+    stack, full_walk_stack = [blueprint_obj], []
+    while stack or full_walk_stack:
+        full_walk = not stack
+        node = full_walk_stack.pop() if full_walk else stack.pop()
+        if type(node) is dict:
+            for key in name_keys.intersection(node):
+                new_name = renaming.get(node[key]) if type(node[key]) is str else None
+                if new_name is not None:
+                    node[key] = new_name
+                    replacements += 1
+            for key in mapping_keys.intersection(node):
+                mapping = node[key]
+                if type(mapping) is dict and not renaming.keys().isdisjoint(mapping):
+                    node[key] = { renaming.get(name, name): value for name, value in mapping.items() }
+                    replacements += sum(1 for name in mapping if name in renaming)
+            if full_walk:
+                values = node.values()
+            else:
+                values = [node[key] for key in container_keys.intersection(node)] if not container_keys.isdisjoint(node) else ()
+                if not full_walk_keys.isdisjoint(node):
+                    full_walk_stack.extend(node[key] for key in full_walk_keys.intersection(node))
+        else:
+            values = node if type(node) is list else ()
+        pending = full_walk_stack if full_walk else stack
+        for value in values:
+            if type(value) is dict or type(value) is list:
+                pending.append(value)
+    return replacements
+
+
+def _source_version(blueprint_obj: dict) -> int:
+    bp_type = blueprints.read_blueprint_type(blueprint_obj)
+    return blueprint_obj[bp_type.value].get('version') if bp_type else None
+
+
+def migrate_blueprint(blueprint_obj: dict, target_version: str) -> int:
+    """Apply the migrations from the version of the blueprint to the target version. Return the number of replacements."""
+    return apply_migration(compile_migration_to(target_version, _source_version(blueprint_obj)), blueprint_obj)
+
+
+def migrate_blueprints(blueprint_objs: Iterable[dict], target_version: str) -> Iterator[int]:
+    """
+    Same as migrate_blueprint on each blueprint object of a batch. The migration from each version of the blueprints
+    is compiled once for the whole batch.
+    """
+    compiled_migrations = {}
+    for blueprint_obj in blueprint_objs:
+        from_version = _source_version(blueprint_obj)
+        compiled_migration = compiled_migrations.get(from_version)
+        if compiled_migration is None:
+            compiled_migration = compiled_migrations[from_version] = compile_migration_to(target_version, from_version)
+        yield apply_migration(compiled_migration, blueprint_obj)
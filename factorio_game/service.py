@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+Resident service to decode and encode blueprint exchange strings, for the programs that would otherwise start a new
+process of blueprints.py for each exchange string
+
+  An asyncio server listens on a local unix socket or a TCP port. The requests (see module service_client) are
+  gathered in batches, up to batch_size requests or batch_delay seconds, and each batch is processed in a pool of
+  worker processes. The workers share the persistent cache of decoded exchange strings (module blueprints_cache): each
+  access to the cache is committed right away, so that the workers do not hold the lock of the database, and the
+  exchange strings are decoded without the cache if the database is not available (e.g. still locked after its
+  timeout).
+
+  Operations:
+
+    decode      {'exchange_string': str} -> the blueprint object
+    encode      {'blueprint': dict, 'compression': str or None, 'version': int, 'validate': bool} -> the exchange string. The
+                blueprint is validated first (see module validation), unless validate is false
+    info        {'exchange_string': str, 'max_recursion_level': int} -> the list of the {'path', 'type', 'label',
+                'version'} of the blueprint and of the contents of a book
+    cli         {'argv': list, 'cwd': str, 'prog': str} -> {'stdout': str, 'stderr': str, 'status': int}, the output of the
+                command line of blueprints.py (if the server was started with the CLI module)
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import asyncio
+import contextlib
+import importlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor
+from factorio_game import blueprints_cache, service_client
+from factorio_game.exchange_string import blueprints, json_backend, profiling, validation
+
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_BATCH_DELAY = 0.002     # Seconds
+
+
+# State of a worker process (see init_worker)
+_cache = None
+_cli_main = None
+
+
+def init_worker(cache_directory: str = None, cli_module: str = None) -> None:
+    """Open the cache of decoded exchange strings, and import the main function of the CLI (e.g. module blueprints)"""
+    global _cache, _cli_main
+    if cache_directory is not None:
+        try:
+            _cache = blueprints_cache.BlueprintsCache(cache_directory)
+        except sqlite3.Error as err:
+            print(f'Cache not available: {err}', file=sys.stderr)
+    if cli_module is not None:
+        _cli_main = importlib.import_module(cli_module).main
+
+
+def _cache_call(method: str, *args):
+    """Call a method of the cache and commit. None if there is no cache, or if the database is not available."""
+    if _cache is None:
+        return None
+    try:
+        result = getattr(_cache, method)(*args)
+        _cache.commit()
+        return result
+    except sqlite3.Error:
+        with contextlib.suppress(sqlite3.Error):
+            _cache.connection.rollback()
+        return None
+
+
+def _decode(exchange_str: str) -> dict:
+    blueprint_obj = _cache_call('get', exchange_str)
+    if blueprint_obj is None:
+        blueprint_obj = blueprints.parse_exchange_string_as_json_object(exchange_str.strip())
+        _cache_call('put', exchange_str, blueprint_obj)
+    return blueprint_obj
+
+
+def _op_decode(request: dict):
+    return _decode(request['exchange_string'])
+
+
+def _op_encode(request: dict):
+    compression_str = request.get('compression')
+    compression = blueprints.parse_compression_profile(compression_str) if compression_str else None
+    version = request.get('version', blueprints.DEFAULT_EXCHANGE_STRINGS_VERSION)
+    if request.get('validate', True):
+        validation.check(request['blueprint'])
+    return blueprints.generate_exchange_string_from_json_object(request['blueprint'], version, compression)
+
+
+def _op_info(request: dict):
+    blueprint_obj = _decode(request['exchange_string'])
+    nodes = []
+    for path, bp_type, label, obj in blueprints.walk_blueprint_object(blueprint_obj, request.get('max_recursion_level', -1)):
+        version = obj[bp_type.value].get('version') if bp_type else None
+        nodes.append({ 'path': path, 'type': bp_type.value if bp_type else None, 'label': label, 'version': version })
+    return nodes
+
+
+def _op_cli(request: dict):
+    assert _cli_main is not None, 'The command line is not available on this server'
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    previous_cwd, previous_prog = os.getcwd(), sys.argv[0]
+    try:
+        os.chdir(request.get('cwd', previous_cwd))
+        # Name of the program in the messages of argparse
+        sys.argv[0] = request.get('prog', previous_prog)
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                _cli_main(request['argv'])
+            except SystemExit as err:
+                # argparse errors, --help...
+                status = err.code if isinstance(err.code, int) else int(err.code is not None)
+            except Exception:
+                traceback.print_exc()
+                status = 1
+    finally:
+        os.chdir(previous_cwd)
+        sys.argv[0] = previous_prog
+        # Same state as a new process for the next command
+        profiling.disable()
+        profiling.reset()
+    return { 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status }
+
+
+_OPERATIONS = {
+    'decode': _op_decode,
+    'encode': _op_encode,
+    'info': _op_info,
+    'cli': _op_cli,
+}
+
+
+def _process_request(request: dict) -> bytes:
+    response = { 'id': request.get('id') }
+    try:
+        op = request.get('op')
+        assert op in _OPERATIONS, 'Unknown operation ' + str(op) + '. Expected one of ' + ', '.join(_OPERATIONS)
+        response['result'] = _OPERATIONS[op](request)
+    except Exception as err:
+        # Any error is reported to its request only: the other requests of the batch are processed
+        response['error'] = f'{type(err).__name__}: {err}'
+    return json_backend.canonical_dumps(response).encode() + b'\n'
+
+
+def process_requests(requests: list[dict]) -> list[bytes]:
+    """The responses to a batch of requests, as lines of JSON text. Run in a worker process."""
+    return [_process_request(request) for request in requests]
+
+
+class Server:
+    """
+    The asyncio server. The requests of all the connections are gathered in batches, which are processed by the
+    executor (a pool of worker processes initialized with init_worker).
+    """
+    def __init__(self, executor: Executor, batch_size: int = DEFAULT_BATCH_SIZE, batch_delay: float = DEFAULT_BATCH_DELAY):
+        assert batch_size >= 1, 'The batch size must be at least 1'
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue = asyncio.Queue()
+        self.server = None
+        self.batcher = None
+        self.batches = set()
+        self.connections = set()
+        self.request_count = 0
+        self.batch_count = 0
+
+    async def start(self, address: str) -> None:
+        family, sock_address = service_client.parse_address(address)
+        if family == 'tcp':
+            self.server = await asyncio.start_server(self.handle_connection, *sock_address, limit=1 << 30)
+        else:
+            _remove_stale_socket(sock_address)
+            self.server = await asyncio.start_unix_server(self.handle_connection, sock_address, limit=1 << 30)
+        self.batcher = asyncio.create_task(self.gather_batches())
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        for connection in self.connections:
+            connection.cancel()
+        await asyncio.gather(self.batcher, *self.batches, *self.connections, return_exceptions=True)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        responses = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                future = loop.create_future()
+                response = asyncio.create_task(self.write_response(future, writer))
+                responses.add(response)
+                response.add_done_callback(responses.discard)
+                try:
+                    request = json.loads(line)
+                    assert isinstance(request, dict), 'A request is a JSON object'
+                except (AssertionError, ValueError) as err:
+                    future.set_result(json.dumps({ 'id': None, 'error': f'Invalid request: {err}' }).encode() + b'\n')
+                    continue
+                self.request_count += 1
+                await self.queue.put((request, future))
+            await asyncio.gather(*responses)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    @staticmethod
+    async def write_response(future: asyncio.Future, writer: asyncio.StreamWriter) -> None:
+        writer.write(await future)
+        await writer.drain()
+
+    async def gather_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            # The next batch is gathered while this one is processed
+            task = asyncio.create_task(self.process_batch(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def process_batch(self, batch: list) -> None:
+        self.batch_count += 1
+        requests = [request for request, _ in batch]
+        try:
+            responses = await asyncio.get_running_loop().run_in_executor(self.executor, process_requests, requests)
+        except Exception as err:
+            # e.g. a worker process was terminated abruptly
+            responses = [json.dumps({ 'id': request.get('id'), 'error': f'{type(err).__name__}: {err}' }).encode() + b'\n' for request in requests]
+        for (_, future), response in zip(batch, responses):
+            if not future.done():
+                future.set_result(response)
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove the socket file left by a server that is not running anymore. Raise OSError if a server is running."""
+    if not os.path.exists(path):
+        return
+    try:
+        service_client.connect(path, timeout=1).close()
+    except OSError:
+        os.remove(path)
+        return
+    raise OSError('A server is already listening on ' + path)
+
+
+def create_executor(jobs: int, cache_directory: str = None, cli_module: str = None) -> ProcessPoolExecutor:
+    assert jobs >= 1, 'The number of jobs must be at least 1'
+    return ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(cache_directory, cli_module))
+
+
+async def serve(address: str, jobs: int, cache_directory: str = None, cli_module: str = None, batch_size: int = DEFAULT_BATCH_SIZE, batch_delay: float = DEFAULT_BATCH_DELAY) -> None:
+    """Run the service until cancelled"""
+    with create_executor(jobs, cache_directory, cli_module) as executor:
+        server = Server(executor, batch_size, batch_delay)
+        await server.start(address)
+        print('Listening on ' + address)
+        try:
+            await server.server.serve_forever()
+        finally:
+            await server.close()
+            family, sock_address = service_client.parse_address(address)
+            if family == 'unix' and os.path.exists(sock_address):
+                os.remove(sock_address)
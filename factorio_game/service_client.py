@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Client of the blueprints service (see module service)
+
+  The requests and responses are JSON objects, one per line, on a local unix socket or a TCP connection. Several
+  requests can be sent before reading the responses, which are matched to the requests by their id. This module only
+  depends on the standard library modules json and socket, so that a client starts up quickly.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import json
+import os
+import socket
+from typing import Any
+
+
+ADDRESS_ENV_VAR = 'FACTORIO_BLUEPRINTS_SERVICE'
+SOCKET_FILENAME = 'blueprints-service.sock'
+DEFAULT_TCP_ADDRESS = '127.0.0.1:27100'
+
+
+def default_address(directory: str) -> str:
+    """The address of the environment variable FACTORIO_BLUEPRINTS_SERVICE, or else a unix socket in a directory (TCP on Windows)"""
+    address = os.environ.get(ADDRESS_ENV_VAR)
+    if address:
+        return address
+    return os.path.join(directory, SOCKET_FILENAME) if hasattr(socket, 'AF_UNIX') else DEFAULT_TCP_ADDRESS
+
+
+def parse_address(address: str) -> tuple:
+    """('tcp', (host, port)) for an address HOST:PORT, ('unix', path) otherwise"""
+    host, separator, port_str = address.rpartition(':')
+    if separator and port_str.isdigit() and os.sep not in address:
+        return 'tcp', (host or '127.0.0.1', int(port_str))
+    return 'unix', address
+
+
+def connect(address: str, timeout: float = None) -> socket.socket:
+    """Raise OSError if no server is listening on the address"""
+    family, sock_address = parse_address(address)
+    if family == 'tcp':
+        return socket.create_connection(sock_address, timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(sock_address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class Client:
+    """
+    Connection to the blueprints service. The errors of the requests are raised as ValueError. Use as a context manager:
+
+        with Client(address) as client:
+            blueprint_obj = client.decode(exchange_str)
+    """
+    def __init__(self, address: str, timeout: float = None):
+        self.socket = connect(address, timeout)
+        self.file = self.socket.makefile('rwb')
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        self.file.close()
+        self.socket.close()
+
+    def requests(self, requests: list[dict]) -> list[dict]:
+        """Send all the requests {'op': ..., ...}, then return their responses {'result': ...} or {'error': ...} in the same order"""
+        ids = []
+        for request in requests:
+            ids.append(self.next_id)
+            self.file.write(json.dumps({ **request, 'id': self.next_id }).encode() + b'\n')
+            self.next_id += 1
+        self.file.flush()
+        # The responses come in the order in which the batches of the server complete
+        responses = {}
+        while len(responses) < len(ids):
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError('Connection closed by the blueprints service')
+            response = json.loads(line)
+            responses[response['id']] = response
+        return [responses[request_id] for request_id in ids]
+
+    def request(self, op: str, **params) -> Any:
+        response = self.requests([{ 'op': op, **params }])[0]
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    def decode(self, exchange_str: str) -> dict:
+        return self.request('decode', exchange_string=exchange_str)
+
+    def decode_many(self, exchange_strs: list[str]) -> list[dict]:
+        """The responses of several decode requests, sent at once so that the server batches them"""
+        return self.requests([{ 'op': 'decode', 'exchange_string': exchange_str } for exchange_str in exchange_strs])
+
+    def encode(self, blueprint_obj: dict, compression: str = None, validate: bool = True) -> str:
+        """compression: a compression profile, as option --compression of blueprints.py. Invalid blueprints raise ValueError."""
+        return self.request('encode', blueprint=blueprint_obj, compression=compression, validate=validate)
+
+    def info(self, exchange_str: str, max_recursion_level: int = -1) -> list[dict]:
+        """Path, type, label and version of the blueprint and of the contents of a book"""
+        return self.request('info', exchange_string=exchange_str, max_recursion_level=max_recursion_level)
+
+    def run_cli(self, argv: list[str], cwd: str, prog: str = 'blueprints.py') -> dict:
+        """Run the command line of blueprints.py on the server: {'stdout': str, 'stderr': str, 'status': int}"""
+        return self.request('cli', argv=argv, cwd=cwd, prog=prog)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Synthetic blueprints and blueprint books from the game Factorio (https://www.factorio.com/), for benchmarks
+
+  The blueprints are generated from a seed, so that the same arguments always give the same blueprint. The entities
+  are a mix of assembling machines, inserters, belts and electric poles (wired with copper and circuit wires, in the
+  format of the version 1.1 of the game), laid out on a square grid.
+"""
+__author__ = "Pierre DEJOUE"
+__copyright__ = "Copyright (c) 2019 Pierre DEJOUE"
+__license__ = "MIT License"
+__version__ = "0.1"
+
+
+import math
+import random
+
+
+# Version 1.1.110
+SYNTHETIC_GAME_VERSION = (1 << 48) | (1 << 32) | (110 << 16)
+
+_RECIPES = ['electronic-circuit', 'iron-gear-wheel', 'copper-cable', 'automation-science-pack', 'logistic-science-pack']
+_BELTS = ['transport-belt', 'fast-transport-belt', 'express-transport-belt']
+
+
+def _synthetic_entity(entity_number: int, x: int, y: int, rng: random.Random) -> dict:
+    entity = { 'entity_number': entity_number, 'position': { 'x': x + 0.5, 'y': y + 0.5 } }
+    kind = rng.randrange(4)
+    if kind == 0:
+        entity['name'] = 'assembling-machine-2'
+        entity['recipe'] = rng.choice(_RECIPES)
+        if rng.random() < 0.3:
+            entity['items'] = { 'speed-module': rng.randint(1, 2) }
+    elif kind == 1:
+        entity['name'] = 'fast-inserter'
+        entity['direction'] = rng.choice([2, 4, 6])
+    elif kind == 2:
+        entity['name'] = rng.choice(_BELTS)
+        entity['direction'] = rng.choice([2, 4, 6])
+    else:
+        entity['name'] = 'medium-electric-pole'
+    return entity
+
+
+def synthetic_entities(entity_count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    width = max(1, math.isqrt(entity_count))
+    entities = [_synthetic_entity(idx + 1, idx % width, idx // width, rng) for idx in range(entity_count)]
+    # Chain the electric poles with copper wires, and every other one with a red circuit wire
+    poles = [entity for entity in entities if entity['name'] == 'medium-electric-pole']
+    for previous_pole, pole in zip(poles, poles[1:]):
+        pole['neighbours'] = [previous_pole['entity_number']]
+        if pole['entity_number'] % 2:
+            pole['connections'] = { '1': { 'red': [{ 'entity_id': previous_pole['entity_number'] }] } }
+    return entities
+
+
+def synthetic_blueprint(entity_count: int, seed: int = 0, label: str = None) -> dict:
+    blueprint_subobj = {
+        'item': 'blueprint',
+        'label': label if label is not None else f'Synthetic {entity_count}',
+        'icons': [{ 'index': 1, 'signal': { 'type': 'item', 'name': 'assembling-machine-2' } }],
+        'entities': synthetic_entities(entity_count, seed),
+        'version': SYNTHETIC_GAME_VERSION,
+    }
+    return { 'blueprint': blueprint_subobj }
+
+
+def synthetic_book(depth: int, pages_per_book: int, entities_per_page: int, seed: int = 0, label: str = None) -> dict:
+    """A book of pages_per_book pages, which are books themselves down to the given depth (depth 1: a book of blueprints)"""
+    assert depth >= 1, 'The depth of a book is at least 1'
+    label = label if label is not None else f'Synthetic book {depth}'
+    pages = []
+    for index in range(pages_per_book):
+        page_seed = seed * pages_per_book + index + 1
+        page_label = f'{label} / {index}'
+        if depth == 1:
+            page = synthetic_blueprint(entities_per_page, page_seed, page_label)
+        else:
+            page = synthetic_book(depth - 1, pages_per_book, entities_per_page, page_seed, page_label)
+        page['index'] = index
+        pages.append(page)
+    book_subobj = { 'item': 'blueprint-book', 'label': label, 'active_index': 0, 'blueprints': pages, 'version': SYNTHETIC_GAME_VERSION }
+    return { 'blueprint_book': book_subobj }
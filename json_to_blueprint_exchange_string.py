@@ -13,7 +13,7 @@ import configparser
 import json
 import os
 import sys
-from factorio_game.exchange_string import blueprints
+from factorio_game.exchange_string import blueprints, validation
 
 
 CONFIG_FILE = 'config.ini'
@@ -33,11 +33,17 @@ except configparser.Error as err:
 def main():
     parser = argparse.ArgumentParser(description='Generate a blueprint exchange string for the game Factorio from a JSON file')
     parser.add_argument('filename', metavar='FILE', help='Blueprint file in the JSON format')
+    parser.add_argument('--no-validate', dest='skip_validation', action='store_true', help='Do not check the structure of the blueprint before encoding it')
     args = parser.parse_args()
 
     with open(args.filename, 'rt', encoding='ascii') as f:
         blueprint_json_str = f.read()
         blueprint_obj = json.loads(blueprint_json_str)
+        issues = [] if args.skip_validation else validation.validate(blueprint_obj)
+        if issues:
+            for issue in issues:
+                print(validation.format_issue(issue), file=sys.stderr)
+            sys.exit(1)
         print(blueprints.generate_exchange_string_from_json_object(blueprint_obj, EXCHANGE_STRINGS_VERSION))
 
 
@@ -9,13 +9,49 @@ __version__ = "0.1"
 
 
 import argparse
-from factorio_game.exchange_string import maps
+import csv
+import json
+import os
+import struct
+import sys
+from factorio_game.exchange_string import maps, profiling
 
 
-DEFAULT_OUTPUT_MAP_DATA_FILE = 'out.dat'
+@profiling.profiled('walk')
+def print_map_exchange_data(map_data: maps.MapExchangeData) -> None:
+    settings = map_data.map_gen_settings
+    print(f'Seed: {settings.seed}')
+    print(f'Size: {settings.width} x {settings.height}')
+    if settings.terrain_segmentation is not None:
+        print(f'Terrain segmentation: {settings.terrain_segmentation}, Water: {settings.water}')
+    print(f'Starting area: {settings.starting_area}')
+    print(f'Peaceful mode: {settings.peaceful_mode}')
+    if settings.no_enemies_mode is not None:
+        print(f'No enemies mode: {settings.no_enemies_mode}')
+    print('Autoplace controls (frequency, size, richness):')
+    for name, control in settings.autoplace_controls.items():
+        print(f'    {name}: {control.frequency}, {control.size}, {control.richness}')
+    if settings.cliff_settings:
+        cliffs = settings.cliff_settings
+        print(f'Cliffs: elevation {cliffs.cliff_elevation_0}, interval {cliffs.cliff_elevation_interval}, richness {cliffs.richness}')
+    if map_data.enemy_evolution:
+        evolution = map_data.enemy_evolution
+        print(f'Enemy evolution: {evolution.enabled}, time factor {evolution.time_factor}, destroy factor {evolution.destroy_factor}, pollution factor {evolution.pollution_factor}')
+    if map_data.enemy_expansion:
+        expansion = map_data.enemy_expansion
+        print(f'Enemy expansion: {expansion.enabled}, cooldown {expansion.min_expansion_cooldown} to {expansion.max_expansion_cooldown} ticks')
 
 
-def process_map_exchange_string(map_ex_str: str, args: argparse.Namespace):
+def raw_output_path(out_file: str, map_file: str = None, line_number: int = None) -> str:
+    """One raw output file per map: the name of the source file and the line number are appended to the base name"""
+    if map_file is None:
+        return out_file
+    root, ext = os.path.splitext(out_file)
+    map_file_stem = os.path.splitext(os.path.basename(map_file))[0]
+    return f'{root}.{map_file_stem}.{line_number}{ext}'
+
+
+def process_map_exchange_string(map_ex_str: str, args: argparse.Namespace, out_file: str = None):
     map_bytes, compressed = maps.parse_exchange_string(map_ex_str)
     version_str = maps.parse_game_version(map_bytes)
     if args.map_version:
@@ -23,30 +59,94 @@ def process_map_exchange_string(map_ex_str: str, args: argparse.Namespace):
     else:
         print('Version: ' + version_str)
         print('Compressed: ' + str(compressed))
-        out_file = args.out_bin_file
-        with open(out_file, 'wb') as f:
-            f.write(map_bytes)
-            print('Raw data written to file: ' + out_file)
+        try:
+            print_map_exchange_data(maps.decode_map_data(map_bytes, compressed))
+        except (AssertionError, struct.error) as err:
+            print('Map settings not decoded: ' + str(err))
+        if out_file:
+            with open(out_file, 'wb') as f:
+                f.write(map_bytes)
+                print('Raw data written to file: ' + out_file)
+
+
+class TableWriter:
+    """One row per map, with the file and line number of the map exchange string"""
+    FIELDS = ['file', 'line'] + maps.MAP_SUMMARY_FIELDS
+
+    def __init__(self, table_format: str, fp = sys.stdout):
+        self.fp = fp
+        self.csv_writer = None
+        if table_format == 'csv':
+            self.csv_writer = csv.DictWriter(fp, fieldnames=self.FIELDS, lineterminator='\n')
+            self.csv_writer.writeheader()
+
+    @profiling.profiled('walk')
+    def write(self, map_file: str, line_number: int, summary: dict) -> None:
+        row = { 'file': map_file, 'line': line_number, **summary }
+        if self.csv_writer:
+            self.csv_writer.writerow(row)
+        else:
+            self.fp.write(json.dumps(row) + '\n')
+
+
+def process_map_files_as_table(map_files: list[str], args: argparse.Namespace) -> None:
+    table_writer = TableWriter(args.table_format)
+    for map_file in map_files:
+        with open(map_file, 'rt', encoding='ascii') as f:
+            for result in maps.parse_map_exchange_strings(f, jobs=args.jobs, summary=True):
+                if result.error:
+                    print(f'{map_file}:{result.line_number}: {result.error}', file=sys.stderr)
+                else:
+                    table_writer.write(map_file, result.line_number, result.map_data)
+
+
+def print_profiling_stats() -> None:
+    # On the standard error, so that the standard output is unchanged
+    for line in profiling.format_stats(profiling.stats()):
+        print(line, file=sys.stderr)
 
 
-def main():
+def main(argv: list[str] = None) -> None:
     parser = argparse.ArgumentParser(description='Parse map exchange strings from the game Factorio (https://www.factorio.com/)')
     parser.add_argument('-s', '--from-string', metavar='EXCHANGE_STRING', dest='map_exchange_string', nargs=1, help='From a map exchange string')
-    parser.add_argument('-f', '--from-file', metavar='FILE', dest='map_file', nargs=1, help='From a file with one map exchange string per line')
-    parser.add_argument('-o', '--output', metavar='FILE', dest='out_bin_file', nargs=1, default = DEFAULT_OUTPUT_MAP_DATA_FILE, help='Output map exchange data in binary format')
+    parser.add_argument('-f', '--from-file', metavar='FILE', dest='map_files', nargs='+', help='From a file (or files) with one map exchange string per line')
+    parser.add_argument('-o', '--output', metavar='FILE', dest='out_bin_file', help='Output map exchange data in binary format (with -f, one file per map, named after FILE, the source file and the line number)')
     parser.add_argument('--version', dest='map_version', action='store_true', help='Print out the version of the game that generated the map')
-    args = parser.parse_args()
+    parser.add_argument('--table', metavar='FORMAT', dest='table_format', choices=['csv', 'jsonl'], help='Print out one row per map, with the version, the seed and the key settings. Formats: csv, jsonl')
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs', default=1, help='Number of worker processes used to decode the map exchange strings read from files (with --table). Default: 1')
+    parser.add_argument('--profile', '--stats', dest='profile', action='store_true', help='Print out the time spent and the bytes processed in each stage (decode, inflate, parse, walk) on the standard error, in total over all the map exchange strings. With -j N, the decoding done in the worker processes is not counted')
+    args = parser.parse_args(argv)
 
+    if args.profile:
+        profiling.enable()
+    try:
+        process_sources(args)
+    finally:
+        if args.profile:
+            print_profiling_stats()
+
+
+def process_sources(args: argparse.Namespace) -> None:
     # Parse maps and map books
     if args.map_exchange_string:
-        assert not args.map_file, 'Incompatible options -s and -f'
-        process_map_exchange_string(args.map_exchange_string[0], args)
-    elif args.map_file:
+        assert not args.map_files, 'Incompatible options -s and -f'
+        if args.table_format:
+            map_data = maps.parse_map_exchange_string(args.map_exchange_string[0])
+            TableWriter(args.table_format).write(None, 1, maps.map_summary(map_data))
+        else:
+            process_map_exchange_string(args.map_exchange_string[0], args, args.out_bin_file)
+    elif args.map_files:
         assert not args.map_exchange_string, 'Incompatible options -f and -s'
-        map_file = args.map_file[0]
-        with open(map_file, 'rt', encoding='ascii') as f:
-            for map_exchange_string in f:
-                process_map_exchange_string(map_exchange_string.strip(), args)
+        if args.table_format:
+            process_map_files_as_table(args.map_files, args)
+            return
+        for map_file in args.map_files:
+            with open(map_file, 'rt', encoding='ascii') as f:
+                for line_number, map_exchange_string in enumerate(f, start=1):
+                    if not map_exchange_string.strip():
+                        continue
+                    out_file = raw_output_path(args.out_bin_file, map_file, line_number) if args.out_bin_file else None
+                    process_map_exchange_string(map_exchange_string.strip(), args, out_file)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 """
 Unit tests of module factorio_game.exchange_string.blueprints
 """
+import base64
+import io
 import os
 import unittest
 from factorio_game.exchange_string import blueprints
@@ -88,6 +90,88 @@ class TestBlueprints(unittest.TestCase):
                     json_obj = blueprints.parse_exchange_string_as_json_object(stripped)
                     self.assertEqual(blueprints.read_blueprint_type_str(json_obj), self.expected_type_str[idx])
 
+    # blueprints.parse_exchange_strings
+    def test_batch_decoding(self):
+        lines = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                lines.extend(fp.readlines())
+        lines.insert(2, 'not-an-exchange-string')
+        expected_names = self.expected_name[:2] + [None] + self.expected_name[2:]
+        for jobs in [1, 2]:
+            results = list(blueprints.parse_exchange_strings(lines, jobs=jobs, chunk_size=1))
+            self.assertEqual([result.line_number for result in results], list(range(1, len(lines) + 1)))
+            self.assertEqual([result.error is not None for result in results], [name is None for name in expected_names])
+            for result, expected_name in zip(results, expected_names):
+                if expected_name is not None:
+                    self.assertEqual(blueprints.read_blueprint_name(result.blueprint), expected_name)
+
+    def test_streaming_decoding(self):
+        lines = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                lines.extend(fp.readlines())
+        lines.insert(2, 'not-an-exchange-string\n')
+        batch_results = list(blueprints.parse_exchange_strings(lines))
+        for chunk_size in [1, 7, 4096]:
+            results = list(blueprints.read_exchange_strings(io.StringIO(''.join(line.strip() + '\n' for line in lines)), chunk_size=chunk_size))
+            self.assertEqual([result.line_number for result in results], [result.line_number for result in batch_results])
+            self.assertEqual([result.blueprint for result in results], [result.blueprint for result in batch_results])
+            self.assertEqual([result.error is None for result in results], [result.error is None for result in batch_results])
+        for line in lines:
+            if line.startswith('0'):
+                self.assertEqual(blueprints.parse_exchange_string_from_file(io.StringIO(line), chunk_size=5), blueprints.parse_exchange_string(line.strip()))
+
+    def test_streaming_encoding(self):
+        blueprint_json_str = '{"blueprint":{"item":"blueprint","label":"' + 'x' * 200000 + '"}}'
+        fp = io.StringIO()
+        blueprints.write_exchange_string(blueprint_json_str, fp)
+        self.assertEqual(fp.getvalue(), blueprints.generate_exchange_string(blueprint_json_str))
+
+    def test_compression_profiles(self):
+        test_filepath = os.path.join(self.test_folder, 'nilaus_book_starter_base_v0.16.51.txt')
+        with open(test_filepath, 'r', encoding='ascii') as fp:
+            blueprint_json_str = blueprints.parse_exchange_string(fp.readline().strip())
+        sizes = {}
+        for profile_str in ['fast', 'default', 'max', 'smallest', '9:10:1']:
+            exchange_str = blueprints.generate_exchange_string(blueprint_json_str, compression=blueprints.parse_compression_profile(profile_str))
+            self.assertEqual(blueprints.parse_exchange_string(exchange_str), blueprint_json_str)
+            stats = blueprints.encoding_stats(blueprint_json_str, exchange_str)
+            self.assertEqual(stats.exchange_string_size, len(exchange_str))
+            self.assertEqual(stats.compressed_size, len(base64.b64decode(exchange_str[1:])))
+            sizes[profile_str] = stats.exchange_string_size
+        self.assertEqual(blueprints.generate_exchange_string(blueprint_json_str, compression=blueprints.COMPRESSION_PROFILES['default']), blueprints.generate_exchange_string(blueprint_json_str))
+        self.assertLess(sizes['max'], sizes['fast'])
+        self.assertEqual(sizes['smallest'], min(sizes.values()))
+        for invalid_profile_str in ['10', '9:16', '9:15:9:0', 'fastest']:
+            self.assertRaises(ValueError, blueprints.parse_compression_profile, invalid_profile_str)
+
+    # blueprints.walk_blueprint_object
+    # blueprints.find_path
+    def test_book_walk(self):
+        page = { 'blueprint': { 'label': 'Page', 'entities': [] }, 'index': 5 }
+        inner_book = { 'blueprint_book': { 'blueprints': [{ 'index': 0, 'upgrade_planner': {} }, page], 'label': 'Inner' }, 'index': 0 }
+        outer_book = { 'blueprint_book': { 'blueprints': [{ 'index': 1, 'blueprint': {} }, { 'index': 2, 'blueprint_book': { 'blueprints': [inner_book] } }] } }
+        nodes = list(blueprints.walk_blueprint_object(outer_book))
+        self.assertEqual([(node.path, node.type, node.label) for node in nodes], [
+            ((), blueprints.Type.BOOK, None),
+            ((1,), blueprints.Type.BP, None),
+            ((2,), blueprints.Type.BOOK, None),
+            ((2, 0), blueprints.Type.BOOK, 'Inner'),
+            ((2, 0, 0), blueprints.Type.UPGRADE, None),
+            ((2, 0, 5), blueprints.Type.BP, 'Page')])
+        self.assertIs(nodes[-1].node, page)
+        self.assertEqual([node.path for node in blueprints.walk_blueprint_object(outer_book, max_recursion_level=0)], [(), (1,), (2,)])
+        self.assertEqual(len(list(blueprints.walk_blueprint_object(outer_book, max_recursion_level=1))), 4)
+        self.assertEqual(len(list(blueprints.walk_blueprint_object(page))), 1)
+        self.assertIs(blueprints.find_path(outer_book, blueprints.parse_index_path('2/0/5')), page)
+        self.assertIs(blueprints.find_path(outer_book, ()), outer_book)
+        self.assertIsNone(blueprints.find_path(outer_book, (2, 1)))
+        self.assertIsNone(blueprints.find_path(outer_book, (2, 0, 5, 0)))
+        for invalid_path_str in ['', '2/', '2/-1', 'a/b']:
+            self.assertRaises(ValueError, blueprints.parse_index_path, invalid_path_str)
 
     def tearDown(self):
         pass
@@ -0,0 +1,66 @@
+"""
+Unit tests of module factorio_game.blueprints_cache
+"""
+import os
+import tempfile
+import unittest
+from factorio_game import blueprints_cache
+from factorio_game.exchange_string import blueprints
+
+
+class TestBlueprintsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'decon_planner.txt', 'red_circuits_block.txt',
+                                'upgrade_planner.txt', 'nilaus_book_starter_base_v0.16.51.txt' ]
+        self.db_directory = tempfile.TemporaryDirectory()
+
+    def read_exchange_strings(self):
+        exchange_strings = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                exchange_strings.extend(line.strip() for line in fp if line.strip())
+        return exchange_strings
+
+    # BlueprintsCache.parse_exchange_string_as_json_object
+    def test_hits_and_misses(self):
+        exchange_strings = self.read_exchange_strings()
+        with blueprints_cache.BlueprintsCache(self.db_directory.name) as cache:
+            for exchange_str in exchange_strings:
+                self.assertEqual(cache.parse_exchange_string_as_json_object(exchange_str), blueprints.parse_exchange_string_as_json_object(exchange_str))
+            self.assertEqual((cache.hits, cache.misses), (0, len(exchange_strings)))
+        # Persistent
+        with blueprints_cache.BlueprintsCache(self.db_directory.name) as cache:
+            for exchange_str in exchange_strings:
+                self.assertEqual(cache.parse_exchange_string_as_json_object(exchange_str + '\n'), blueprints.parse_exchange_string_as_json_object(exchange_str))
+            self.assertEqual((cache.hits, cache.misses), (len(exchange_strings), 0))
+            stats = cache.stats()
+            self.assertEqual(stats.hits, len(exchange_strings))
+            self.assertEqual(stats.misses, len(exchange_strings))
+            self.assertEqual(stats.entries, len(exchange_strings))
+
+    # BlueprintsCache.evict
+    def test_lru_eviction(self):
+        exchange_strings = self.read_exchange_strings()
+        with blueprints_cache.BlueprintsCache(self.db_directory.name, max_size=25000) as cache:
+            for exchange_str in exchange_strings:
+                cache.parse_exchange_string_as_json_object(exchange_str)
+            self.assertLessEqual(cache.size(), 25000)
+            # The two least recently used entries were evicted to make room for red_circuits_block
+            self.assertEqual([cache.get(exchange_str) is not None for exchange_str in exchange_strings[:5]], [False, False, True, True, True])
+            # The book of the last test file does not fit: it is not cached
+            self.assertIsNone(cache.get(exchange_strings[-1]))
+            # The running total of the sizes
+            cache.put(exchange_strings[2], cache.get(exchange_strings[2]))
+            self.assertEqual(cache.size(), cache.connection.execute('SELECT sum(size) FROM decoded').fetchone()[0])
+            cache.clear()
+            self.assertEqual(cache.size(), 0)
+
+    def tearDown(self):
+        self.db_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
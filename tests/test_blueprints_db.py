@@ -0,0 +1,107 @@
+"""
+Unit tests of module factorio_game.blueprints_db
+"""
+import os
+import tempfile
+import unittest
+from factorio_game import blueprints_db
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, bom
+
+
+class TestBlueprintsDB(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'decon_planner.txt', 'red_circuits_block.txt',
+                                'upgrade_planner.txt', 'nilaus_book_starter_base_v0.16.51.txt' ]
+        self.db_directory = tempfile.TemporaryDirectory()
+
+    def read_json_objects(self):
+        json_objects = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                json_objects.extend(blueprints.parse_exchange_string_as_json_object(blueprint_string.strip()) for blueprint_string in fp)
+        return json_objects
+
+    # BlueprintsDB.import_blueprint
+    # BlueprintsDB.get
+    def test_import_and_get(self):
+        json_objects = self.read_json_objects()
+        with blueprints_db.BlueprintsDB(self.db_directory.name) as db:
+            hashes = []
+            for json_obj in json_objects:
+                bp_hash, is_new = db.import_blueprint(json_obj)
+                self.assertTrue(is_new)
+                self.assertEqual(bp_hash, blueprints.content_hash(json_obj))
+                hashes.append(bp_hash)
+        # Reopen the DB
+        with blueprints_db.BlueprintsDB(self.db_directory.name) as db:
+            for json_obj, bp_hash in zip(json_objects, hashes):
+                self.assertEqual(db.get(bp_hash), json_obj)
+                self.assertEqual(db.import_blueprint(json_obj), (bp_hash, False))
+            self.assertEqual(sorted(record.hash for record in db.list_top_level()), sorted(hashes))
+            self.assertIsNone(db.get('0' * 64))
+
+    # BlueprintsDB.import_blueprint (validation)
+    def test_import_invalid(self):
+        book_obj = synthetic.synthetic_book(2, 2, 10)
+        book_obj['blueprint_book']['blueprints'][1]['index'] = 0
+        with blueprints_db.BlueprintsDB(self.db_directory.name) as db:
+            with self.assertRaisesRegex(ValueError, 'duplicate index 0'):
+                db.import_blueprint(book_obj)
+            self.assertEqual(db.list_top_level(), [])
+            bp_hash, is_new = db.import_blueprint(book_obj, validate=False)
+            self.assertTrue(is_new)
+            self.assertFalse(db.is_validated(bp_hash))
+            page_hashes = [page.child_hash for page in db.book_pages(bp_hash)]
+            self.assertFalse(any(db.is_validated(page_hash) for page_hash in page_hashes))
+            # The pages validated on their own are flagged
+            page_obj = db.get(page_hashes[0])
+            self.assertEqual(db.import_blueprint(page_obj), (page_hashes[0], False))
+            self.assertEqual([db.is_validated(page_hash) for page_hash in page_hashes], [True, False])
+
+    # BlueprintsDB.lookup
+    # BlueprintsDB.find_by_label
+    # BlueprintsDB.resolve
+    # BlueprintsDB.book_pages
+    # BlueprintsDB.parent_books
+    def test_index(self):
+        with blueprints_db.BlueprintsDB(self.db_directory.name) as db:
+            for json_obj in self.read_json_objects():
+                db.import_blueprint(json_obj)
+            [oil_processing] = db.find_by_label('Crude Oil Processing - step 1')
+            self.assertEqual(oil_processing.type, blueprints.Type.BP.value)
+            self.assertEqual(blueprints.decode_game_version(oil_processing.version), '1.1.8')
+            self.assertEqual(oil_processing.entity_count, 242)
+            self.assertEqual(db.resolve(oil_processing.hash[:8]), oil_processing.hash)
+            self.assertEqual(db.lookup(oil_processing.hash), oil_processing)
+            [book] = db.find_by_label('My Book')
+            [page] = db.book_pages(book.hash)
+            self.assertEqual((page.position, page.book_index), (0, 0))
+            self.assertEqual(db.lookup(page.child_hash).label, 'Science. It works, Bitches')
+            self.assertEqual(db.parent_books(page.child_hash), [page])
+            self.assertEqual(book.entity_count, 1)
+
+    # BlueprintsDB.bill_of_materials
+    def test_bill_of_materials(self):
+        book_obj = synthetic.synthetic_book(2, 2, 30)
+        with blueprints_db.BlueprintsDB(self.db_directory.name) as db:
+            book_hash, _ = db.import_blueprint(book_obj)
+            self.assertEqual(db.bill_of_materials(book_hash), bom.bill_of_materials(book_obj))
+            self.assertEqual(db.lookup(book_hash).entity_count, 120)
+            # Computed from the blueprint if not stored
+            db.connection.execute('DELETE FROM bill_of_materials')
+            self.assertEqual(db.bill_of_materials(book_hash), bom.bill_of_materials(book_obj))
+            self.assertIsNone(db.bill_of_materials('0' * 64))
+            for json_obj in self.read_json_objects():
+                bp_hash, _ = db.import_blueprint(json_obj)
+                self.assertEqual(db.bill_of_materials(bp_hash), bom.bill_of_materials(json_obj))
+
+    def tearDown(self):
+        self.db_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
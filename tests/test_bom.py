@@ -0,0 +1,75 @@
+"""
+Unit tests of module factorio_game.exchange_string.bom
+"""
+import json
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, bom
+
+
+class TestBillOfMaterials(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+
+    def read_json_object(self, test_file: str) -> dict:
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return blueprints.parse_exchange_string_as_json_object(fp.read().strip())
+
+    # bom.bill_of_materials
+    def test_blueprint(self):
+        bill = bom.bill_of_materials(self.read_json_object('oil_processing_1_v1.1.8.txt'))
+        self.assertEqual(bill.blueprint_count, 1)
+        self.assertEqual(bill.entity_count, 242)
+        self.assertEqual(sum(bill.entities.values()), 242)
+        self.assertEqual(list(bill.entities.values()), sorted(bill.entities.values(), reverse=True))
+        blueprint_obj = synthetic.synthetic_blueprint(400, seed=2)
+        bill = bom.bill_of_materials(blueprint_obj)
+        speed_modules = sum(entity.get('items', {}).get('speed-module', 0) for entity in blueprint_obj['blueprint']['entities'])
+        self.assertEqual(bill.items, { 'speed-module': speed_modules })
+        self.assertEqual(bill.modules, bill.items)
+        self.assertEqual((bill.width, bill.height), (19, 19))
+        # Since 2.0, the items are listed with their positions in the inventories. Tiles have a size of 1.
+        entity = { 'name': 'beacon', 'position': { 'x': 1.5, 'y': 1.5 }, 'items': [
+            { 'id': { 'name': 'speed-module-3' }, 'items': { 'in_inventory': [{ 'inventory': 1, 'stack': 0 }, { 'inventory': 1, 'stack': 1 }] } },
+            { 'id': { 'name': 'coal' }, 'items': { 'in_inventory': [{ 'inventory': 1, 'stack': 0, 'count': 50 }] } }] }
+        tiles = [{ 'name': 'concrete', 'position': { 'x': x, 'y': 0 } } for x in range(5)]
+        bill = bom.bill_of_materials({ 'blueprint': { 'entities': [entity], 'tiles': tiles } })
+        self.assertEqual(bill.items, { 'coal': 50, 'speed-module-3': 2 })
+        self.assertEqual(bill.modules, { 'speed-module-3': 2 })
+        self.assertEqual(bill.tiles, { 'concrete': 5 })
+        self.assertEqual((bill.width, bill.height), (5, 1.5))
+
+    def test_book(self):
+        book_obj = synthetic.synthetic_book(3, 2, 25)
+        bill = bom.bill_of_materials(book_obj)
+        self.assertEqual(bill.blueprint_count, 8)
+        self.assertEqual(bill.entity_count, 200)
+        pages = book_obj['blueprint_book']['blueprints']
+        self.assertEqual(bom.merge(bom.bill_of_materials(page) for page in pages), bill)
+        self.assertEqual(bom.bill_of_materials(self.read_json_object('decon_planner.txt')), bom.merge([]))
+
+    def test_elements_without_name(self):
+        blueprint_obj = { 'blueprint': {
+            'entities': [ { 'entity_number': 1, 'name': 'inserter', 'position': { 'x': 0.5, 'y': 0.5 } },
+                          { 'entity_number': 2, 'position': { 'x': 1.5, 'y': 0.5 } } ],
+            'tiles': [ { 'position': { 'x': 0, 'y': 0 } }, { 'name': 'concrete', 'position': { 'x': 1, 'y': 0 } } ] } }
+        bill = bom.bill_of_materials(blueprint_obj)
+        self.assertEqual((bill.entity_count, bill.tile_count), (2, 2))
+        self.assertEqual(bill.entities, { 'inserter': 1 })
+        self.assertEqual(bill.tiles, { 'concrete': 1 })
+
+    # bom.to_json_object
+    # bom.from_json_object
+    def test_json_conversion(self):
+        bill = bom.bill_of_materials(self.read_json_object('red_circuits_block.txt'))
+        bom_obj = json.loads(json.dumps(bom.to_json_object(bill)))
+        self.assertEqual(bom.from_json_object(bom_obj), bill)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Unit tests of module factorio_game.exchange_string.book_builder
+"""
+import functools
+import os
+import zlib
+import unittest
+from factorio_game.exchange_string import blueprints, book_builder
+
+
+class TestBookBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'decon_planner.txt', 'red_circuits_block.txt', 'upgrade_planner.txt' ]
+        self.book_header = { 'blueprint_book': { 'active_index': 0, 'blueprints': [], 'item': 'blueprint-book', 'label': 'Test Book', 'version': 281479278886912 } }
+
+    def read_pages(self):
+        pages = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                for blueprint_string in fp:
+                    json_obj = blueprints.parse_exchange_string_as_json_object(blueprint_string.strip())
+                    pages.append({ key: value for key, value in json_obj.items() if key != 'index' })
+        return pages
+
+    def expected_json(self, page_objects):
+        book_contents = [{ **page_obj, 'index': index } for index, page_obj in enumerate(page_objects)]
+        return blueprints.canonical_json_string({ 'blueprint_book': { **self.book_header['blueprint_book'], 'blueprints': book_contents } })
+
+    # book_builder.adler32_combine
+    def test_adler32_combine(self):
+        text1, text2 = b'{"blueprint_book":{"blueprints":[', b'{"blueprint":{"label":"x"}}' * 1000
+        combined = book_builder.adler32_combine(zlib.adler32(text1), zlib.adler32(text2), len(text2))
+        self.assertEqual(combined, zlib.adler32(text1 + text2))
+
+    # book_builder.generate_book_exchange_string
+    def test_book_generation(self):
+        page_objects = self.read_pages()
+        pages = [book_builder.Page(f'page{position}', index, functools.partial(blueprints.canonical_json_string, page_obj))
+                 for position, (index, page_obj) in enumerate(enumerate(page_objects))]
+        exchange_string = book_builder.generate_book_exchange_string(self.book_header, pages)
+        self.assertEqual(blueprints.parse_exchange_string(exchange_string), self.expected_json(page_objects))
+
+    # book_builder.generate_book_exchange_string
+    def test_incremental_book_generation(self):
+        page_objects = self.read_pages()
+        cache = {}
+        pages = [book_builder.Page(str(index), index, functools.partial(blueprints.canonical_json_string, page_obj)) for index, page_obj in enumerate(page_objects)]
+        exchange_string = book_builder.generate_book_exchange_string(self.book_header, pages, cache)
+        self.assertEqual(len(cache), len(pages))
+        # Cache hits only
+        def not_called():
+            raise AssertionError('The page should not be serialized again')
+        cached_pages = [page._replace(get_json=not_called) for page in pages]
+        self.assertEqual(book_builder.generate_book_exchange_string(self.book_header, cached_pages, cache), exchange_string)
+        # Edit one page
+        page_objects[1] = { 'blueprint': { **page_objects[1]['blueprint'], 'label': 'Edited' } }
+        cached_pages[1] = book_builder.Page('edited', 1, functools.partial(blueprints.canonical_json_string, page_objects[1]))
+        exchange_string = book_builder.generate_book_exchange_string(self.book_header, cached_pages, cache)
+        self.assertEqual(blueprints.parse_exchange_string(exchange_string), self.expected_json(page_objects))
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Unit tests of module factorio_game.exchange_string.book_index
+"""
+import json
+import os
+import unittest
+from factorio_game.exchange_string import blueprints, book_index
+
+
+class TestBookIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'decon_planner.txt', 'red_circuits_block.txt',
+                                'upgrade_planner.txt', 'nilaus_book_starter_base_v0.16.51.txt' ]
+
+    def read_json_strings(self, test_file):
+        test_filepath = os.path.join(self.test_folder, test_file)
+        with open(test_filepath, 'r', encoding='ascii') as fp:
+            return [blueprints.parse_exchange_string(blueprint_string.strip()) for blueprint_string in fp]
+
+    # book_index.read_header
+    def test_header_parsing(self):
+        for test_file in self.all_test_files:
+            for json_string in self.read_json_strings(test_file):
+                json_obj = json.loads(json_string)
+                entry = book_index.read_header(json_string)
+                self.assertEqual(entry.type, blueprints.read_blueprint_type(json_obj))
+                self.assertEqual(book_index.read_entry_name(entry), blueprints.read_blueprint_name(json_obj))
+                self.assertEqual(book_index.read_entry_game_version(entry), blueprints.parse_game_version(json_obj))
+                self.assertEqual((entry.start, entry.end), (0, len(json_string)))
+
+    # book_index.read_table_of_contents
+    # book_index.find_index
+    # book_index.load_entry
+    def test_table_of_contents(self):
+        for test_file in self.all_test_files:
+            for json_string in self.read_json_strings(test_file):
+                json_obj = json.loads(json_string)
+                entry = book_index.read_header(json_string)
+                if entry.type != blueprints.Type.BOOK:
+                    continue
+                book_contents = json_obj['blueprint_book']['blueprints']
+                table_of_contents = book_index.read_table_of_contents(json_string, entry)
+                self.assertEqual(len(table_of_contents), len(book_contents))
+                for child_entry, child_obj in zip(table_of_contents, book_contents):
+                    self.assertEqual(child_entry.index, child_obj['index'])
+                    self.assertEqual(book_index.read_entry_name(child_entry), blueprints.read_blueprint_name(child_obj))
+                    self.assertEqual(book_index.load_entry(json_string, child_entry), child_obj)
+                    self.assertEqual(book_index.find_index(json_string, entry, child_obj['index']), child_entry)
+                self.assertEqual(book_index.read_header(json_string, contents_depth=0).contents, table_of_contents)
+
+    def test_nested_books_and_special_characters(self):
+        page = { 'blueprint': { 'label': '[item=iron-plate] {"Pickup"}', 'entities': [{ 'name': 'x]}', 'position': { 'x': 0, 'y': 0 } }], 'version': 1 }, 'index': 3 }
+        inner_book = { 'blueprint_book': { 'blueprints': [page], 'label': 'Inner' }, 'index': 1 }
+        outer_book = { 'blueprint_book': { 'blueprints': [inner_book, {'index': 2, 'upgrade_planner': {}}], 'label': 'Outer', 'version': 2 } }
+        json_string = json.dumps(outer_book, indent=2)
+        entry = book_index.read_header(json_string, contents_depth=1)
+        self.assertEqual(entry.label, 'Outer')
+        self.assertEqual([(child.index, child.type) for child in entry.contents], [(1, blueprints.Type.BOOK), (2, blueprints.Type.UPGRADE)])
+        inner_entry = entry.contents[0]
+        self.assertEqual(inner_entry.contents[0].label, '[item=iron-plate] {"Pickup"}')
+        self.assertIsNone(inner_entry.contents[0].contents)
+        self.assertEqual(book_index.load_entry(json_string, book_index.find_index(json_string, inner_entry, 3)), page)
+        self.assertIsNone(book_index.find_index(json_string, entry, 3))
+        self.assertEqual(book_index.find_path(json_string, entry, (1, 3)), book_index.find_index(json_string, inner_entry, 3))
+        self.assertIsNone(book_index.find_path(json_string, entry, (1, 3, 0)))
+
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
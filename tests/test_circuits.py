@@ -0,0 +1,108 @@
+"""
+Unit tests of module factorio_game.exchange_string.circuits
+"""
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, circuits
+
+
+class TestCircuits(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        # A constant combinator wired to the input of a decider combinator, of which the output lights a lamp
+        entities = [
+            { 'entity_number': 1, 'name': 'constant-combinator', 'position': { 'x': 0.5, 'y': 0.5 }, 'connections': { '1': { 'red': [{ 'entity_id': 2 }] } } },
+            { 'entity_number': 2, 'name': 'decider-combinator', 'position': { 'x': 1.5, 'y': 1 },
+              'connections': { '1': { 'red': [{ 'entity_id': 1 }] }, '2': { 'green': [{ 'entity_id': 3 }] } } },
+            { 'entity_number': 3, 'name': 'small-lamp', 'position': { 'x': 3.5, 'y': 0.5 }, 'connections': { '1': { 'green': [{ 'entity_id': 2, 'circuit_id': 2 }] } } },
+            { 'entity_number': 4, 'name': 'small-electric-pole', 'position': { 'x': 0.5, 'y': 3.5 }, 'neighbours': [5] },
+            { 'entity_number': 5, 'name': 'small-electric-pole', 'position': { 'x': 5.5, 'y': 3.5 }, 'neighbours': [4] },
+        ]
+        self.blueprint_obj = { 'blueprint': { 'item': 'blueprint', 'label': 'Lamp', 'entities': entities, 'version': 281479278886912 } }
+
+    def read_json_object(self, test_file: str) -> dict:
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return blueprints.parse_exchange_string_as_json_object(fp.read().strip())
+
+    # CircuitGraph.network_of
+    # CircuitGraph.members
+    def test_networks(self):
+        graph = circuits.CircuitGraph(self.blueprint_obj)
+        self.assertEqual([graph.graphs[color].network_count for color in circuits.WIRE_COLORS], [1, 1, 1])
+        # The wires listed at both ends are counted once
+        self.assertEqual(len(graph.graphs['red'].edges), 1)
+        self.assertEqual(graph.network_of('red', 1), 0)
+        self.assertEqual(graph.members('red', 0), [(1, 1), (2, 1)])
+        self.assertEqual(graph.members('green', 0), [(2, 2), (3, 1)])
+        self.assertIsNone(graph.network_of('green', 2, connector=1))
+        self.assertIsNone(graph.network_of('red', 4))
+        self.assertIsNone(graph.network_of('red', 1000))
+        self.assertEqual(graph.format_node(graph.graphs['green'].members(0)[0]), 'decider-combinator #2:2')
+        self.assertEqual(list(graph.graphs['copper'].neighbours(circuits.node_of(3, 1))), [circuits.node_of(4, 1)])
+
+    # CircuitGraph
+    def test_wires(self):
+        # Game version 2.0
+        blueprint_obj = self.read_json_object('red_circuits_block.txt')
+        graph = circuits.CircuitGraph(blueprint_obj)
+        copper = graph.graphs['copper']
+        self.assertEqual(len(copper.edges), len(blueprint_obj['blueprint']['wires']))
+        self.assertEqual(copper.network_count, 1)
+        self.assertEqual(graph.graphs['red'].network_count, 0)
+        # Synthetic blueprint: all the poles on a copper wire, every other pair of poles on a red wire
+        blueprint_obj = synthetic.synthetic_blueprint(1000)
+        poles = [entity for entity in blueprint_obj['blueprint']['entities'] if entity['name'] == 'medium-electric-pole']
+        graph = circuits.CircuitGraph(blueprint_obj)
+        self.assertEqual(graph.graphs['copper'].network_count, 1)
+        self.assertEqual(len(graph.members('copper', 0)), len(poles))
+        red_wires = sum(1 for pole in poles if 'connections' in pole)
+        self.assertEqual(len(graph.graphs['red'].edges), red_wires)
+        self.assertEqual(sum(len(graph.members('red', network)) for network in range(graph.graphs['red'].network_count)), len(graph.graphs['red'].member_nodes))
+
+    # CircuitGraph
+    def test_power_switch(self):
+        # Game version 2.0: a pole on each side of a power switch
+        entities = [
+            { 'entity_number': 1, 'name': 'small-electric-pole', 'position': { 'x': 0.5, 'y': 0.5 } },
+            { 'entity_number': 2, 'name': 'power-switch', 'position': { 'x': 3, 'y': 1 } },
+            { 'entity_number': 3, 'name': 'small-electric-pole', 'position': { 'x': 5.5, 'y': 0.5 } },
+        ]
+        wires = [[1, 5, 2, 5], [2, 6, 3, 5]]
+        graph = circuits.CircuitGraph({ 'blueprint': { 'item': 'blueprint', 'entities': entities, 'wires': wires } })
+        copper = graph.graphs['copper']
+        self.assertEqual(copper.network_count, 2)
+        self.assertEqual(graph.members('copper', 0), [(1, 1), (2, 1)])
+        self.assertEqual(graph.members('copper', 1), [(2, 2), (3, 1)])
+
+    # CircuitGraph
+    def test_malformed_wires(self):
+        entities = self.blueprint_obj['blueprint']['entities']
+        entities[3]['neighbours'] = [[5], 5]
+        entities[0]['connections']['1']['red'].append({ 'entity_id': {} })
+        entities[1]['connections']['2']['green'].append({ 'entity_id': 1, 'circuit_id': 3 })
+        self.blueprint_obj['blueprint']['wires'] = [[{}, 1, 1, 1], [1, 2], [1, 1, 2, 5]]
+        graph = circuits.CircuitGraph(self.blueprint_obj)
+        self.assertEqual([len(graph.graphs[color].edges) for color in circuits.WIRE_COLORS], [1, 1, 1])
+
+    # circuits.to_json_object
+    # circuits.to_dot
+    def test_export(self):
+        graph = circuits.CircuitGraph(self.blueprint_obj)
+        self.assertEqual(circuits.to_json_object(graph), {
+            'red': [{ 'members': [[1, 1], [2, 1]], 'wires': [[1, 1, 2, 1]] }],
+            'green': [{ 'members': [[2, 2], [3, 1]], 'wires': [[2, 2, 3, 1]] }],
+            'copper': [{ 'members': [[4, 1], [5, 1]], 'wires': [[4, 1, 5, 1]] }]})
+        dot_lines = circuits.to_dot(graph).splitlines()
+        self.assertEqual(dot_lines[0], 'graph "Lamp" {')
+        self.assertIn('  e2 [label="decider-combinator #2"];', dot_lines)
+        self.assertIn('  e2 -- e3 [color=green, taillabel="2"];', dot_lines)
+        self.assertEqual(dot_lines[-1], '}')
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
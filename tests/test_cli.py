@@ -0,0 +1,91 @@
+"""
+Unit tests of module factorio_game.cli, and of the start-up of the command line tools
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from factorio_game import cli
+from factorio_game.exchange_string import blueprints
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        # Modules that are slow to import, and which the trivial queries must not import
+        self.slow_modules = ['sqlite3', 'multiprocessing', 'concurrent.futures', 'orjson', 'configparser']
+
+    def imported_modules(self, args: list[str]) -> list[str]:
+        """The modules imported by a new process of blueprints.py, as listed by python -X importtime"""
+        process = subprocess.run([sys.executable, '-X', 'importtime', 'blueprints.py', *args], capture_output=True, text=True, check=True)
+        lines = [line for line in process.stderr.splitlines() if line.startswith('import time:') and '|' in line]
+        return [line.rsplit('|', 1)[1].strip() for line in lines[1:]]
+
+    # Start-up time of blueprints.py
+    def test_lazy_imports(self):
+        for option in ['--name', '--version', '--info']:
+            modules = self.imported_modules(['-f', os.path.join(self.test_folder, 'blueprint_book.txt'), option])
+            self.assertIn('factorio_game.exchange_string.book_index', modules)
+            for slow_module in self.slow_modules:
+                self.assertNotIn(slow_module, modules)
+        # The options that use the DB or the cache load sqlite3 on demand
+        self.assertIn('sqlite3', self.imported_modules(['--cache-stats']))
+        # The modules of the other options are not loaded by the parser of the arguments either
+        script = ('import sys; from factorio_game import cli; '
+                  f'cli.main(["blueprints", "-f", {os.path.join(self.test_folder, "blueprint_book.txt")!r}, "--name"]); '
+                  'migration = sys.modules["factorio_game.migration"]; print(type(migration).__name__); '
+                  'print(sys.modules["blueprints"].MIGRATION_VERSIONS == tuple(migration.MIGRATIONS))')
+        process = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        self.assertEqual(process.stdout.splitlines()[-2:], [importlib.util._LazyModule.__name__, 'True'])
+
+    # cli.main
+    def test_commands(self):
+        previous_prog = sys.argv[0]
+        try:
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                cli.main(['blueprints', '-f', os.path.join(self.test_folder, 'oil_processing_1_v1.1.8.txt'), '--name'])
+            self.assertEqual(stdout.getvalue(), 'Crude Oil Processing - step 1\n')
+            # A negative recursion level prints out the first level of a book
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                cli.main(['blueprints', '-f', os.path.join(self.test_folder, 'blueprint_book.txt'), '-l', '-1'])
+            self.assertEqual(stdout.getvalue().splitlines()[-1], '  #000 Blueprint: Science. It works, Bitches')
+            # The blueprints of a file are migrated in a batch
+            entity = { 'entity_number': 1, 'name': 'filter-inserter', 'position': { 'x': 0.5, 'y': 0.5 } }
+            blueprint_obj = { 'blueprint': { 'item': 'blueprint', 'entities': [entity], 'version': 281479278886912 } }
+            with tempfile.TemporaryDirectory() as directory:
+                blueprint_file = os.path.join(directory, 'blueprints.txt')
+                with open(blueprint_file, 'w', encoding='ascii') as fp:
+                    fp.write('\n'.join([blueprints.generate_exchange_string_from_json_object(blueprint_obj), '0invalid', '']))
+                stdout, stderr = io.StringIO(), io.StringIO()
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                    cli.main(['blueprints', '-f', blueprint_file, blueprint_file, '--migrate', '2.0', '--json'])
+            self.assertEqual(stdout.getvalue().count('Updated Blueprint:'), 2)
+            self.assertIn('fast-inserter', stdout.getvalue())
+            self.assertEqual(stderr.getvalue().count(f'{blueprint_file}:2: '), 2)
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr), self.assertRaises(SystemExit) as context:
+                cli.main(['unknown-command'])
+            self.assertEqual(context.exception.code, 2)
+            self.assertIn('unknown command', stderr.getvalue())
+        finally:
+            sys.argv[0] = previous_prog
+
+    # cli.lazy_import
+    def test_lazy_import(self):
+        module = cli.lazy_import('factorio_game.synthetic')
+        self.assertEqual(len(module.synthetic_entities(3)), 3)
+        self.assertIs(cli.lazy_import('factorio_game.synthetic'), module)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Unit tests of module factorio_game.exchange_string.diff
+"""
+import copy
+import json
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, diff
+
+
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+
+    def read_json_object(self, test_file: str) -> dict:
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return blueprints.parse_exchange_string_as_json_object(fp.read().strip())
+
+    # diff.diff
+    def test_diff_blueprint(self):
+        old_obj = self.read_json_object('oil_processing_1_v1.1.8.txt')
+        self.assertEqual(diff.diff(old_obj, copy.deepcopy(old_obj)), [])
+        new_obj = copy.deepcopy(old_obj)
+        entities = new_obj['blueprint']['entities']
+        entities.reverse()
+        refinery = next(entity for entity in entities if entity['name'] == 'oil-refinery')
+        refinery['recipe'] = 'advanced-oil-processing'
+        lamp = next(entity for entity in entities if entity['name'] == 'small-lamp')
+        entities.remove(lamp)
+        entities.append({ 'entity_number': 243, 'name': 'beacon', 'position': { 'x': 0.5, 'y': 0.5 } })
+        new_obj['blueprint']['label'] = 'Crude Oil Processing - step 2'
+        changes = diff.diff(old_obj, new_obj)
+        self.assertCountEqual(changes, [
+            diff.Change('~', (), 'entity', 'oil-refinery', ('recipe',)),
+            diff.Change('+', (), 'entity', 'beacon', (0.5, 0.5)),
+            diff.Change('-', (), 'entity', 'small-lamp', (lamp['position']['x'], lamp['position']['y'])),
+            diff.Change('~', (), 'key', 'blueprint.label', None)])
+        self.assertEqual(diff.format_change(changes[0]), '~ entity oil-refinery: recipe')
+        # Same entities in another order
+        entities = copy.deepcopy(old_obj['blueprint']['entities'])
+        entities.reverse()
+        changes = diff.diff(old_obj, { 'blueprint': { **old_obj['blueprint'], 'entities': entities } })
+        self.assertEqual(changes, [diff.Change('~', (), 'order', 'blueprint.entities', None)])
+
+    def test_diff_book(self):
+        old_obj = synthetic.synthetic_book(2, 3, 20)
+        new_obj = copy.deepcopy(old_obj)
+        pages = new_obj['blueprint_book']['blueprints']
+        del pages[0]
+        pages.reverse()
+        pages[0]['blueprint_book']['blueprints'][1]['blueprint']['entities'][4]['entity_number'] = 100
+        changes = diff.diff(old_obj, new_obj)
+        self.assertEqual([diff.format_change(change) for change in changes], [
+            '~ page #002: Synthetic book 2 / 2',
+            '~ #002 page #001: Synthetic book 2 / 2 / 1',
+            '~ #002/#001 entity ' + pages[0]['blueprint_book']['blueprints'][1]['blueprint']['entities'][4]['name'] + ': entity_number',
+            '- page #000: Synthetic book 2 / 0'])
+
+    # diff.make_patch
+    # diff.apply_patch
+    def test_patch(self):
+        old_obj = synthetic.synthetic_book(2, 3, 200)
+        new_obj = copy.deepcopy(old_obj)
+        pages = new_obj['blueprint_book']['blueprints']
+        blueprint_subobj = pages[1]['blueprint_book']['blueprints'][2]['blueprint']
+        del blueprint_subobj['entities'][10:20]
+        blueprint_subobj['entities'][30]['direction'] = 6
+        del blueprint_subobj['entities'][40]['entity_number']
+        blueprint_subobj['tiles'] = [{ 'name': 'concrete', 'position': { 'x': 0, 'y': 0 } }]
+        del blueprint_subobj['icons']
+        pages.append(synthetic.synthetic_blueprint(10, label='New page'))
+        patch = json.loads(json.dumps(diff.make_patch(old_obj, new_obj)))
+        self.assertLess(len(json.dumps(patch)), len(json.dumps(new_obj)) // 10)
+        patched_obj = diff.apply_patch(old_obj, patch)
+        self.assertEqual(patched_obj, new_obj)
+        self.assertEqual(blueprints.content_hash(patched_obj), patch['to'])
+        self.assertEqual(old_obj, synthetic.synthetic_book(2, 3, 200))
+        with self.assertRaises(ValueError):
+            diff.apply_patch(new_obj, patch)
+        # Empty patch
+        self.assertEqual(diff.apply_patch(old_obj, diff.make_patch(old_obj, old_obj)), old_obj)
+
+    # diff.apply_patch
+    def test_malformed_patch(self):
+        old_obj = synthetic.synthetic_blueprint(10)
+        new_obj = copy.deepcopy(old_obj)
+        new_obj['blueprint']['entities'][5]['direction'] = 3
+        patch = diff.make_patch(old_obj, new_obj)
+        entities_patch = patch['patch']['objects']['blueprint']['lists']['entities']
+        for malformed_patch in [
+                [],
+                { **patch, 'from': None },
+                { **patch, 'patch': { 'lists': [] } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'lists': { 'entities': [['?', 0]] } } } } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'lists': { 'entities': [['=', 0]] } } } } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'unset': 'label' } } } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'lists': { 'entities': [['=', 0, 100]] } } } } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'lists': { 'label': [] } } } } },
+                { **patch, 'patch': { 'objects': { 'blueprint': { 'lists': { 'entities': [*entities_patch, ['+', {}]] } } } } }]:
+            with self.assertRaises(ValueError):
+                diff.apply_patch(old_obj, malformed_patch)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Unit tests of module factorio_game.exchange_string.entity_table
+"""
+import collections
+import os
+import unittest
+from factorio_game.exchange_string import blueprints, entity_table
+
+
+class TestEntityTable(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'red_circuits_block.txt', 'nilaus_book_starter_base_v0.16.51.txt' ]
+
+    def read_blueprint_objects(self):
+        """All the blueprints of the test files, including the pages of the books"""
+        blueprint_objects = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                stack = [blueprints.parse_exchange_string_as_json_object(blueprint_string.strip()) for blueprint_string in fp]
+            while stack:
+                json_obj = stack.pop()
+                if blueprints.read_blueprint_type(json_obj) == blueprints.Type.BOOK:
+                    stack.extend(json_obj['blueprint_book']['blueprints'])
+                elif blueprints.read_blueprint_type(json_obj) == blueprints.Type.BP:
+                    blueprint_objects.append(json_obj)
+        return blueprint_objects
+
+    # entity_table.CompactBlueprint
+    def test_lossless_round_trip(self):
+        for json_obj in self.read_blueprint_objects():
+            compact = entity_table.CompactBlueprint(json_obj)
+            self.assertEqual(len(compact.entities), len(json_obj['blueprint'].get('entities', [])))
+            round_trip = compact.to_blueprint_object()
+            self.assertEqual(blueprints.canonical_json_string(round_trip), blueprints.canonical_json_string(json_obj))
+
+    # entity_table.EntityTable
+    def test_queries(self):
+        for json_obj in self.read_blueprint_objects():
+            entities = json_obj['blueprint'].get('entities', [])
+            table = entity_table.EntityTable.from_entities(entities)
+            self.assertEqual(table.count_by_name(), dict(collections.Counter(entity['name'] for entity in entities)))
+            for name in table.names.names:
+                self.assertEqual(table.indices_of(name), [idx for idx, entity in enumerate(entities) if entity['name'] == name])
+            if entities:
+                xs = [entity['position']['x'] for entity in entities]
+                ys = [entity['position']['y'] for entity in entities]
+                self.assertEqual(table.bounding_box(), (min(xs), min(ys), max(xs), max(ys)))
+
+    def test_missing_keys(self):
+        entities = [{ 'name': 'wooden-chest' }, { 'entity_number': 2, 'name': 'pipe', 'position': { 'x': 1.0, 'y': 2 }, 'direction': 0 }, {}]
+        table = entity_table.EntityTable.from_entities(entities)
+        self.assertEqual(table.to_entities(), entities)
+        self.assertIsInstance(table.to_entities()[1]['position']['x'], float)
+        self.assertIsNone(entity_table.EntityTable().bounding_box())
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
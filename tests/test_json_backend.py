@@ -0,0 +1,89 @@
+"""
+Unit tests of module factorio_game.exchange_string.json_backend
+"""
+import importlib.util
+import json
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, json_backend
+
+
+class TestJsonBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.default_backend = json_backend.backend
+        self.test_folder = 'tests/examples/blueprints'
+        self.json_strings = []
+        for test_file in sorted(os.listdir(self.test_folder)):
+            with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+                self.json_strings.extend(blueprints.parse_exchange_string(line.strip()) for line in fp if line.strip())
+        self.edge_cases = [
+            { 'label': 'Café   \x7f \x00 éè', 'description': 'null' },
+            { 'floats': [0.1, -0.0, 1e16, 1.5e16, 1e-05, 0.0001, 0.00012, 1e+22, 5e-324, 1.7976931348623157e+308, 12.375] },
+            { 'floats': [float('nan'), float('inf'), -float('inf')] },
+            { 'integers': [0, -1, 2**53 + 1, 2**63 - 1, -2**63, 2**64 - 1, 2**64, -2**63 - 1, 10**30] },
+            { 'keys': { 'b': 1, 'a': { 'd': None, 'c': True, 'B': False } }, 'é': [] },
+            { 'text': 'speed-module-2 1e5 0.00001 x0e0' },
+        ]
+
+    def canonical_texts(self, obj) -> list[str]:
+        texts = []
+        for backend in json_backend.available_backends():
+            json_backend.set_backend(backend)
+            texts.append(blueprints.canonical_json_string(obj))
+        return texts
+
+    # json_backend.canonical_dumps
+    def test_canonical_output(self):
+        objects = [json.loads(json_str) for json_str in self.json_strings] + self.edge_cases
+        objects.append(synthetic.synthetic_book(2, 3, 50))
+        for obj in objects:
+            expected = json.dumps(obj, sort_keys=True, separators=(',', ':'))
+            self.assertEqual(self.canonical_texts(obj), [expected] * len(json_backend.available_backends()))
+
+    # json_backend.loads
+    def test_parsing(self):
+        json_strings = self.json_strings + [json.dumps(obj) for obj in self.edge_cases] + ['[NaN, Infinity, 123456789012345678901234567890]']
+        for json_str in json_strings:
+            expected = json.dumps(json.loads(json_str), sort_keys=True)
+            for backend in json_backend.available_backends():
+                json_backend.set_backend(backend)
+                self.assertEqual(json.dumps(blueprints.parse_json_string(json_str), sort_keys=True), expected)
+                self.assertEqual(json.dumps(blueprints.parse_json_string(json_str.encode()), sort_keys=True), expected)
+        for backend in json_backend.available_backends():
+            json_backend.set_backend(backend)
+            with self.assertRaises(ValueError):
+                blueprints.parse_json_string('{"label": ')
+
+    # blueprints.content_hash
+    # blueprints.generate_exchange_string_from_json_object
+    def test_stable_exchange_strings(self):
+        for json_str in self.json_strings:
+            results = set()
+            for backend in json_backend.available_backends():
+                json_backend.set_backend(backend)
+                blueprint_obj = blueprints.parse_json_string(json_str)
+                results.add((blueprints.content_hash(blueprint_obj), blueprints.generate_exchange_string_from_json_object(blueprint_obj)))
+            self.assertEqual(len(results), 1)
+
+    # json_backend.set_backend
+    def test_backend_selection(self):
+        self.assertIn(json_backend.STDLIB, json_backend.available_backends())
+        self.assertIn(self.default_backend, json_backend.available_backends())
+        with self.assertRaises(ValueError):
+            json_backend.set_backend('yaml')
+        json_backend.set_backend(json_backend.STDLIB)
+        self.assertEqual(json_backend.backend, json_backend.STDLIB)
+        self.assertIs(json_backend.loads, json.loads)
+
+    @unittest.skipUnless(importlib.util.find_spec('orjson'), 'orjson is not installed')
+    def test_orjson_is_the_default(self):
+        self.assertEqual(self.default_backend, json_backend.ORJSON)
+
+    def tearDown(self):
+        json_backend.set_backend(self.default_backend)
+
+
+if __name__ == '__main__':
+    unittest.main()
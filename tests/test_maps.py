@@ -24,6 +24,54 @@ class TestMaps(unittest.TestCase):
                     map_bytes, _ = maps.parse_exchange_string(stripped)
                     self.assertEqual(maps.parse_game_version(map_bytes), self.expected_version[idx])
 
+    def read_map_exchange_string(self, test_file):
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return fp.readline().strip()
+
+    # maps.decode_map_data
+    def test_map_data_decoding(self):
+        expected_seed = [ 1762966943, 1091050170, 454050675, 976308606, 2549708522 ]
+        expected_control_count = [ 6, 6, 8, 12, 12 ]
+        for idx, test_file in enumerate(self.all_test_files):
+            map_data = maps.parse_map_exchange_string(self.read_map_exchange_string(test_file))
+            major, minor, patch, dev = map_data.version
+            self.assertEqual(f'{major}.{minor}.{patch}' + (f'.{dev}' if dev else ''), self.expected_version[idx])
+            self.assertEqual(map_data.map_gen_settings.seed, expected_seed[idx])
+            self.assertEqual(len(map_data.map_gen_settings.autoplace_controls), expected_control_count[idx])
+            self.assertEqual(map_data.compressed, idx >= 2)
+            self.assertEqual(map_data.enemy_expansion is not None, idx >= 2)
+        # 1.1
+        map_data = maps.parse_map_exchange_string(self.read_map_exchange_string('forest.txt'))
+        settings = map_data.map_gen_settings
+        self.assertEqual(settings.autoplace_controls['trees'], maps.AutoplaceControl(0.5, 3.0, 1.0))
+        self.assertEqual((settings.width, settings.height), (2000000, 2000000))
+        self.assertEqual(settings.starting_points, [(0.0, 0.0)])
+        self.assertEqual(settings.cliff_settings.richness, 0.0)
+        self.assertEqual(map_data.enemy_evolution.time_factor, 2e-05)
+        self.assertEqual(map_data.enemy_expansion.max_expansion_cooldown, 432000)
+        # Before 0.16
+        settings = maps.parse_map_exchange_string(self.read_map_exchange_string('my_base.txt')).map_gen_settings
+        self.assertEqual(settings.autoplace_controls['crude-oil'], maps.AutoplaceControl('normal', 'high', 'high'))
+        self.assertEqual((settings.width, settings.height, settings.starting_area, settings.peaceful_mode), (2000000, 2000000, 'normal', False))
+        settings = maps.parse_map_exchange_string(self.read_map_exchange_string('old_one.txt')).map_gen_settings
+        self.assertEqual(settings.autoplace_controls['enemy-base'], maps.AutoplaceControl('normal', 'low', 'high'))
+        self.assertEqual((settings.width, settings.height, settings.starting_area, settings.peaceful_mode), (None, None, None, None))
+        # Corrupted data
+        map_bytes, compressed = maps.parse_exchange_string(self.read_map_exchange_string('island_2.0.txt'))
+        self.assertRaises(AssertionError, maps.decode_map_data, map_bytes[:20] + b'\xff' + map_bytes[21:], compressed)
+
+    # maps.parse_map_exchange_strings
+    def test_batch_decoding(self):
+        lines = [ self.read_map_exchange_string(test_file) for test_file in self.all_test_files ]
+        lines.insert(1, '>>>not-a-map<<<')
+        for jobs in [1, 2]:
+            results = list(maps.parse_map_exchange_strings(lines, jobs=jobs, summary=True, chunk_size=2))
+            self.assertEqual([result.line_number for result in results], list(range(1, len(lines) + 1)))
+            self.assertEqual([result.error is not None for result in results], [False, True, False, False, False, False])
+            summaries = [result.map_data for result in results if result.map_data]
+            self.assertEqual([summary['version'] for summary in summaries], self.expected_version)
+            self.assertTrue(all(list(summary) == maps.MAP_SUMMARY_FIELDS for summary in summaries))
+        self.assertEqual(summaries[2]['autoplace_controls'].split(';')[0], 'coal=2.0:2.0:6.0')
 
     def tearDown(self):
         pass
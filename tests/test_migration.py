@@ -0,0 +1,73 @@
+"""
+Unit tests of module factorio_game.migration
+"""
+import json
+import unittest
+from factorio_game import migration
+from factorio_game.exchange_string import blueprints
+
+
+class TestMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.test_filepath = 'tests/examples/blueprints/nilaus_book_starter_base_v0.16.51.txt'
+
+    # migration.encode_game_version
+    def test_game_version_encoding(self):
+        self.assertEqual(migration.encode_game_version('1.1.110'), 281479278886912)
+        self.assertEqual(blueprints.decode_game_version(migration.encode_game_version('2.0.11.3')), '2.0.11.3')
+
+    # migration.compose_renamings
+    def test_renaming_composition(self):
+        composed = migration.compose_renamings([{ 'a': 'b', 'x': 'y' }, { 'b': 'c', 'y': 'x', 'd': 'e' }])
+        self.assertEqual(composed, { 'a': 'c', 'b': 'c', 'y': 'x', 'd': 'e' })
+
+    # migration.migrate_blueprint
+    def test_migration_to_0_17(self):
+        with open(self.test_filepath, 'r', encoding='ascii') as fp:
+            json_obj = blueprints.parse_exchange_string_as_json_object(fp.readline().strip())
+        json_str = json.dumps(json_obj)
+        expected_replacements = sum(json_str.count(f'"{old_name}"') for old_name in migration.ENTITY_RENAMING_0_16_TO_0_17)
+        self.assertGreater(expected_replacements, 0)
+        self.assertEqual(migration.migrate_blueprint(json_obj, '0.17'), expected_replacements)
+        json_str = json.dumps(json_obj)
+        for old_name, new_name in migration.ENTITY_RENAMING_0_16_TO_0_17.items():
+            self.assertNotIn(f'"{old_name}"', json_str)
+        self.assertEqual(migration.migrate_blueprint(json_obj, '0.17'), 0)
+
+    # migration.compile_migration_to
+    # migration.apply_migration
+    def test_migration_of_known_keys(self):
+        entity = { 'name': 'stack-inserter', 'position': { 'x': 0, 'y': 0 }, 'label': 'science-pack-1', 'tags': { 'item': 'raw-wood' } }
+        assembler = { 'name': 'assembling-machine-2', 'recipe': 'science-pack-1', 'items': { 'science-pack-1': 2, 'coal': 1 } }
+        signal = { 'signal': { 'type': 'item', 'name': 'logistic-chest-storage' } }
+        migration_to_2_0 = migration.compile_migration_to('2.0')
+        self.assertEqual([migration.apply_migration(migration_to_2_0, obj) for obj in [entity, [assembler, signal]]], [1, 3])
+        self.assertEqual(entity['name'], 'bulk-inserter')
+        self.assertEqual(entity['label'], 'science-pack-1')
+        # The tags of the mods are not visited
+        self.assertEqual(entity['tags'], { 'item': 'raw-wood' })
+        self.assertEqual(assembler, { 'name': 'assembling-machine-2', 'recipe': 'automation-science-pack', 'items': { 'automation-science-pack': 2, 'coal': 1 } })
+        self.assertEqual(signal['signal']['name'], 'storage-chest')
+        # Only the migrations after the version of the blueprint
+        migration_from_1_1 = migration.compile_migration_to('2.0', migration.encode_game_version('1.1.110'))
+        self.assertNotIn('science-pack-1', migration_from_1_1.renaming)
+        self.assertIn('stack-inserter', migration_from_1_1.renaming)
+
+    # migration.migrate_blueprints
+    def test_batch_migration(self):
+        def combinator(version: int) -> dict:
+            control_behavior = { 'decider_conditions': { 'first_signal': { 'type': 'item', 'name': 'science-pack-1' }, 'comparator': '>' } }
+            entity = { 'entity_number': 1, 'name': 'decider-combinator', 'position': { 'x': 0, 'y': 0 }, 'control_behavior': control_behavior }
+            return { 'blueprint': { 'item': 'blueprint', 'entities': [entity], 'version': version } }
+        blueprint_objs = [combinator(migration.encode_game_version(version)) for version in ['0.16.51', '1.1.110', '0.16.51']]
+        self.assertEqual(list(migration.migrate_blueprints(blueprint_objs, '2.0')), [1, 0, 1])
+        signal_names = [blueprint_obj['blueprint']['entities'][0]['control_behavior']['decider_conditions']['first_signal']['name'] for blueprint_obj in blueprint_objs]
+        self.assertEqual(signal_names, ['automation-science-pack', 'science-pack-1', 'automation-science-pack'])
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Unit tests of module factorio_game.exchange_string.profiling
+"""
+import io
+import unittest
+from factorio_game.exchange_string import blueprints, maps, profiling
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        profiling.reset()
+        with open('tests/examples/blueprints/oil_processing_1_v1.1.8.txt', 'r') as f:
+            self.exchange_str = f.read().strip()
+        with open('tests/examples/maps/forest.txt', 'r') as f:
+            self.map_ex_str = f.read().strip()
+
+    # profiling.enabled
+    def test_disabled(self):
+        self.assertFalse(profiling.enabled)
+        blueprint_obj = blueprints.parse_exchange_string_as_json_object(self.exchange_str)
+        blueprints.generate_exchange_string_from_json_object(blueprint_obj)
+        maps.parse_map_exchange_string(self.map_ex_str)
+        self.assertEqual(profiling.stats(), {})
+
+    # profiling.stats
+    def test_blueprint_stages(self):
+        profiling.enable()
+        try:
+            blueprint_obj = blueprints.parse_exchange_string_as_json_object(self.exchange_str)
+            exchange_str = blueprints.generate_exchange_string_from_json_object(blueprint_obj)
+        finally:
+            profiling.disable()
+        stats = profiling.stats()
+        self.assertEqual(list(stats), ['decode', 'inflate', 'parse', 'serialize', 'deflate', 'encode'])
+        self.assertTrue(all(stage_stats.calls == 1 for stage_stats in stats.values()))
+        self.assertEqual(stats['decode'].bytes_in, len(self.exchange_str))
+        self.assertEqual(stats['decode'].bytes_out, stats['inflate'].bytes_in)
+        self.assertEqual(stats['inflate'].bytes_out, stats['deflate'].bytes_in)
+        self.assertEqual(stats['encode'].bytes_out + 1, len(exchange_str))
+
+    def test_streaming_stages(self):
+        profiling.enable()
+        try:
+            blueprint_json_str = blueprints.parse_exchange_string_from_file(io.StringIO(self.exchange_str), chunk_size=100)
+            out = io.StringIO()
+            blueprints.write_exchange_string(blueprint_json_str, out)
+        finally:
+            profiling.disable()
+        stats = profiling.stats()
+        self.assertEqual(stats['decode'].bytes_in, len(self.exchange_str) - 1)
+        self.assertGreater(stats['decode'].calls, 1)
+        self.assertEqual(stats['inflate'].bytes_out, len(blueprint_json_str.encode()))
+        self.assertEqual(stats['deflate'].bytes_in, len(blueprint_json_str.encode()))
+        self.assertEqual(stats['encode'].bytes_out, len(out.getvalue()) - 1)
+
+    def test_map_stages(self):
+        profiling.enable()
+        try:
+            maps.parse_map_exchange_string(self.map_ex_str)
+        finally:
+            profiling.disable()
+        self.assertEqual(list(profiling.stats()), ['decode', 'inflate', 'parse'])
+
+    # profiling.profiled
+    def test_profiled(self):
+        @profiling.profiled('walk')
+        def walk(value):
+            return value + 1
+        self.assertEqual(walk(1), 2)
+        self.assertEqual(profiling.stats(), {})
+        profiling.enable()
+        try:
+            self.assertEqual(walk(2), 3)
+            self.assertEqual(walk(3), 4)
+        finally:
+            profiling.disable()
+        self.assertEqual(profiling.stats()['walk'].calls, 2)
+        self.assertEqual(profiling.format_stats(profiling.stats())[1].split()[:2], ['walk', '2'])
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
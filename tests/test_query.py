@@ -0,0 +1,94 @@
+"""
+Unit tests of module factorio_game.exchange_string.query
+"""
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, bom, query
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.json_strings = []
+        for test_file in sorted(os.listdir(self.test_folder)):
+            with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+                self.json_strings.extend(blueprints.parse_exchange_string(line.strip()) for line in fp if line.strip())
+        # A book of two books of three blueprints
+        self.book_obj = synthetic.synthetic_book(2, 3, 40)
+        self.book_json_str = blueprints.canonical_json_string(self.book_obj)
+
+    def run_query(self, filter_strs: list[str], json_str: str = None) -> list[tuple]:
+        blueprint_query = query.Query.parse(filter_strs)
+        return [match.path for match in blueprint_query.match_json_string(json_str or self.book_json_str)]
+
+    # query.parse_filter
+    def test_filter_parsing(self):
+        self.assertEqual(query.parse_filter('type=book'), query.Filter('type', None, '=', blueprints.Type.BOOK))
+        self.assertEqual(query.parse_filter(' version >= 1.1 '), query.Filter('version', None, '>=', (1, 1)))
+        self.assertEqual(query.parse_filter('entity:beacon>=8'), query.Filter('entity', 'beacon', '>=', 8))
+        self.assertEqual(query.parse_filter('label~Mall'), query.Filter('label', None, '~', 'Mall'))
+        self.assertEqual(query.parse_filter('item!=speed-module*'), query.Filter('item', None, '!=', 'speed-module*'))
+        for filter_str in ['beacon', 'colour=red', 'type=tank', 'version~1.1', 'version>=1.x', 'entities>many', 'label:x>1', 'entity:beacon=']:
+            with self.assertRaises(ValueError):
+                query.parse_filter(filter_str)
+
+    # query.Query.match_json_string
+    def test_header_filters(self):
+        self.assertEqual(self.run_query(['type=book']), [(), (0,), (1,), (2,)])
+        self.assertEqual(self.run_query(['type=bp', 'label=Synthetic book 2 / 1 / *']), [(1, 0), (1, 1), (1, 2)])
+        self.assertEqual(self.run_query(['label~BOOK 2 / 2 / 0']), [(2, 0)])
+        self.assertEqual(self.run_query(['version=1.1']), self.run_query(['version>=1.1.110', 'version<1.2']))
+        self.assertEqual(self.run_query(['version<1.1']), [])
+        old_book = self.json_strings[0]
+        self.assertEqual(self.run_query(['version=0.17.9'], old_book), [(), (0,)])
+        self.assertEqual(self.run_query(['version!=0.17.9', 'type!=book'], old_book), [])
+
+    def test_contents_filters(self):
+        blueprint_obj = synthetic.synthetic_blueprint(40, seed=5)
+        contents = bom.bill_of_materials(blueprint_obj)
+        self.assertEqual(contents.entity_count, 40)
+        blueprint_json_str = blueprints.canonical_json_string(blueprint_obj)
+        poles = contents.entities['medium-electric-pole']
+        self.assertGreater(poles, 0)
+        self.assertEqual(self.run_query([f'entity:medium-electric-pole={poles}'], blueprint_json_str), [()])
+        self.assertEqual(self.run_query([f'entity:*pole>{poles}'], blueprint_json_str), [])
+        self.assertEqual(self.run_query(['entity=*-transport-belt', 'entity!=beacon', 'entities=40'], blueprint_json_str), [()])
+        self.assertEqual(self.run_query(['item=speed-module'], blueprint_json_str), [()] if contents.items else [])
+        self.assertEqual(self.run_query([f'item:speed-module*={contents.items["speed-module"]}'], blueprint_json_str), [()])
+        # Since 2.0, the items are listed with their positions in the inventories
+        entity = { 'name': 'beacon', 'items': [{ 'id': { 'name': 'speed-module-3' }, 'items': { 'in_inventory': [{ 'inventory': 1, 'stack': 0 }, { 'inventory': 1, 'stack': 1 }] } }] }
+        contents = bom.bill_of_materials({ 'blueprint': { 'entities': [entity] } })
+        self.assertEqual(contents.items['speed-module-3'], 2)
+
+    def test_predicate_pushdown(self):
+        blueprint_query = query.Query.parse(['label=Synthetic book 2 / 0 / *', 'entities>0'])
+        matches = list(blueprint_query.match_json_string(self.book_json_str))
+        self.assertEqual([match.path for match in matches], [(0, 0), (0, 1), (0, 2)])
+        self.assertEqual(blueprint_query.scanned, 13)
+        self.assertEqual(blueprint_query.decoded, 3)
+        self.assertEqual(blueprint_query.matched, 3)
+        # Without entity filters, no blueprint is decoded
+        blueprint_query = query.Query.parse(['type=bp'])
+        self.assertEqual(len(list(blueprint_query.match_json_string(self.book_json_str))), 9)
+        self.assertEqual(blueprint_query.decoded, 0)
+
+    # query.Query.match_object
+    def test_object_and_json_string(self):
+        filter_lists = [['type=bp'], ['entity=fast-inserter', 'label~/ 1'], ['entities<1'], ['version>=1.1', 'item:speed-module>=3']]
+        for json_str in self.json_strings + [self.book_json_str]:
+            blueprint_obj = blueprints.parse_json_string(json_str)
+            for filter_strs in filter_lists:
+                for max_recursion_level in [-1, 0, 1]:
+                    from_json = list(query.Query.parse(filter_strs).match_json_string(json_str, max_recursion_level))
+                    from_obj = list(query.Query.parse(filter_strs).match_object(blueprint_obj, max_recursion_level))
+                    self.assertEqual(from_json, from_obj)
+        self.assertEqual(query.format_path((2, 0, 15)), '#002/#000/#015')
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Unit tests of modules factorio_game.service and factorio_game.service_client
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from factorio_game import blueprints_cache, service, service_client
+from factorio_game.exchange_string import blueprints
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'decon_planner.txt', 'red_circuits_block.txt' ]
+        self.db_directory = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.db_directory.name, service_client.SOCKET_FILENAME)
+        # The server runs in the event loop of another thread
+        self.executor = service.create_executor(1, self.db_directory.name, 'blueprints')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.server = service.Server(self.executor, batch_size=8)
+        asyncio.run_coroutine_threadsafe(self.server.start(self.address), self.loop).result()
+
+    def read_exchange_strings(self):
+        exchange_strings = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                exchange_strings.extend(line.strip() for line in fp if line.strip())
+        return exchange_strings
+
+    # Client.decode
+    # Client.encode
+    # Client.info
+    def test_operations(self):
+        exchange_strings = self.read_exchange_strings()
+        with service_client.Client(self.address) as client:
+            for exchange_str in exchange_strings:
+                blueprint_obj = client.decode(exchange_str)
+                self.assertEqual(blueprint_obj, blueprints.parse_exchange_string_as_json_object(exchange_str))
+                self.assertEqual(client.encode(blueprint_obj), blueprints.generate_exchange_string_from_json_object(blueprint_obj))
+            nodes = client.info(exchange_strings[0])
+            self.assertEqual([(node['path'], node['type'], node['label']) for node in nodes], [
+                ([], 'blueprint_book', 'My Book'),
+                ([0], 'blueprint', 'Science. It works, Bitches')])
+            with self.assertRaises(ValueError):
+                client.decode('not-an-exchange-string')
+            with self.assertRaises(ValueError):
+                client.request('unknown')
+            with self.assertRaises(ValueError):
+                client.encode({ 'blueprint': { 'label': 'No item' } })
+            self.assertTrue(client.encode({ 'blueprint': { 'label': 'No item' } }, validate=False))
+        # The workers share the cache
+        with blueprints_cache.BlueprintsCache(self.db_directory.name) as cache:
+            self.assertEqual(cache.stats().entries, len(exchange_strings))
+
+    # Client.decode_many
+    def test_batches(self):
+        exchange_strings = self.read_exchange_strings() * 10
+        with service_client.Client(self.address) as client:
+            responses = client.decode_many(exchange_strings + ['not-an-exchange-string'])
+        self.assertEqual([response['result'] for response in responses[:-1]], [blueprints.parse_exchange_string_as_json_object(exchange_str) for exchange_str in exchange_strings])
+        self.assertIn('error', responses[-1])
+        self.assertEqual(self.server.request_count, len(exchange_strings) + 1)
+        self.assertLess(self.server.batch_count, self.server.request_count)
+
+    # process_requests
+    def test_bad_request_in_batch(self):
+        # A well-formed exchange string of a malformed book
+        bad_exchange_str = blueprints.generate_exchange_string_from_json_object({ 'blueprint_book': { 'blueprints': [1] } })
+        good_exchange_str = self.read_exchange_strings()[1]
+        responses = service.process_requests([
+            { 'id': 1, 'op': 'info', 'exchange_string': bad_exchange_str },
+            { 'id': 2, 'op': 'decode', 'exchange_string': good_exchange_str }])
+        responses = [json.loads(response) for response in responses]
+        self.assertIn('error', responses[0])
+        self.assertEqual(responses[1]['result'], blueprints.parse_exchange_string_as_json_object(good_exchange_str))
+
+    # process_requests
+    def test_locked_cache(self):
+        exchange_str = self.read_exchange_strings()[1]
+        expected = blueprints.parse_exchange_string_as_json_object(exchange_str)
+        service.init_worker(self.db_directory.name)
+        try:
+            service._cache.connection.execute('PRAGMA busy_timeout = 0')
+            # Another worker holds the lock of the database: decode without the cache
+            other = sqlite3.connect(os.path.join(self.db_directory.name, blueprints_cache.CACHE_FILENAME))
+            other.execute('BEGIN EXCLUSIVE')
+            response = service.process_requests([{ 'id': 1, 'op': 'decode', 'exchange_string': exchange_str }])[0]
+            self.assertEqual(json.loads(response)['result'], expected)
+            other.rollback()
+            other.close()
+            self.assertIsNone(service._cache.get(exchange_str))
+            service.process_requests([{ 'id': 2, 'op': 'decode', 'exchange_string': exchange_str }])
+            self.assertEqual(service._cache.get(exchange_str), expected)
+        finally:
+            service._cache.close()
+            service._cache = None
+
+    # Client.run_cli
+    def test_cli(self):
+        with service_client.Client(self.address) as client:
+            result = client.run_cli(['-f', os.path.join(self.test_folder, 'oil_processing_1_v1.1.8.txt'), '--name'], os.getcwd())
+            self.assertEqual(result, { 'stdout': 'Crude Oil Processing - step 1\n', 'stderr': '', 'status': 0 })
+            result = client.run_cli(['--unknown-option'], os.getcwd())
+            self.assertEqual(result['status'], 2)
+            self.assertIn('blueprints.py: error', result['stderr'])
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown()
+        self.db_directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Unit tests of module factorio_game.exchange_string.spatial
+"""
+import math
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, spatial
+
+
+class TestSpatial(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        entities = [
+            { 'entity_number': 1, 'name': 'assembling-machine-2', 'position': { 'x': 1.5, 'y': 1.5 } },
+            { 'entity_number': 2, 'name': 'inserter', 'position': { 'x': 3.5, 'y': 1.5 }, 'direction': 6 },
+            { 'entity_number': 3, 'name': 'transport-belt', 'position': { 'x': 4.5, 'y': 1.5 } },
+            { 'entity_number': 4, 'name': 'medium-electric-pole', 'position': { 'x': 3.5, 'y': 3.5 } },
+            { 'entity_number': 5, 'name': 'boiler', 'position': { 'x': 7, 'y': 1.5 }, 'direction': 2 },
+            { 'entity_number': 6, 'name': 'stone-furnace', 'position': { 'x': 10, 'y': 10 } },
+            { 'entity_number': 7, 'name': 'straight-rail', 'position': { 'x': 1, 'y': 1 } },
+        ]
+        self.blueprint_obj = { 'blueprint': { 'item': 'blueprint', 'entities': entities, 'version': 281479278886912 } }
+
+    def read_json_object(self, test_file: str) -> dict:
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return blueprints.parse_exchange_string_as_json_object(fp.read().strip())
+
+    # SpatialIndex.box
+    # SpatialIndex.in_rect
+    def test_in_rect(self):
+        index = spatial.SpatialIndex.from_blueprint_object(self.blueprint_obj, cell_size=2)
+        self.assertEqual(index.box(0), (0.0, 0.0, 3.0, 3.0))
+        # Boiler facing east: 2 x 3
+        self.assertEqual(index.box(4), (6.0, 0.0, 8.0, 3.0))
+        # Guessed sizes
+        self.assertEqual(index.box(2), (4.0, 1.0, 5.0, 2.0))
+        self.assertEqual(index.box(5), (9.0, 9.0, 11.0, 11.0))
+        self.assertEqual(index.in_rect(2.5, 0, 4.5, 2), [0, 1, 2])
+        self.assertEqual(index.in_rect(0, 0, 5, 4, contained=True), [0, 1, 2, 3, 6])
+        self.assertEqual(index.in_rect(11, 11, 20, 20), [])
+        self.assertEqual(index.in_rect(-100, -100, 100, 100), list(range(7)))
+
+    # SpatialIndex.nearest
+    def test_nearest(self):
+        blueprint_obj = synthetic.synthetic_blueprint(2000)
+        entities = blueprint_obj['blueprint']['entities']
+        index = spatial.SpatialIndex.from_blueprint_object(blueprint_obj, cell_size=4)
+        for x, y in ((10.2, 20.7), (-30, 5), (100, 100)):
+            distances = sorted(math.hypot(entity['position']['x'] - x, entity['position']['y'] - y) for entity in entities)
+            nearest = index.nearest(x, y, 5)
+            self.assertEqual([math.hypot(index.table.x[idx] - x, index.table.y[idx] - y) for idx in nearest], distances[:5])
+            [pole] = index.nearest(x, y, name='medium-electric-pole')
+            self.assertEqual(index.table.name(pole), 'medium-electric-pole')
+        self.assertEqual(index.nearest(0, 0, name='beacon'), [])
+
+    # SpatialIndex.self_overlaps
+    # SpatialIndex.overlaps
+    def test_overlaps(self):
+        index = spatial.SpatialIndex.from_blueprint_object(self.blueprint_obj)
+        self.assertEqual(index.self_overlaps(), [])
+        # Moved by one tile to the right: the assembler covers the inserter, etc.
+        self.assertEqual(index.overlaps(index, 1, 0), [(0, 0), (1, 0), (2, 1), (4, 4), (5, 5)])
+        self.assertEqual(index.overlaps(index, 12, 12), [])
+        blueprint_obj = self.read_json_object('oil_processing_1_v1.1.8.txt')
+        index = spatial.SpatialIndex.from_blueprint_object(blueprint_obj)
+        self.assertEqual(index.self_overlaps(), [])
+        self.assertEqual(len(index.overlaps(index)), len(index))
+        # Stacked entities: all the pairs are reported
+        furnaces = [{ 'entity_number': number, 'name': 'stone-furnace', 'position': { 'x': 1, 'y': 1 } } for number in (1, 2, 3)]
+        index = spatial.SpatialIndex.from_blueprint_object({ 'blueprint': { 'item': 'blueprint', 'entities': furnaces } })
+        self.assertEqual(index.self_overlaps(), [(0, 1), (0, 2), (1, 2)])
+        self.assertEqual(index.overlaps(index, 1, 0), [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)])
+
+    # SpatialIndex.supplying_poles
+    # SpatialIndex.supplied_entities
+    def test_power_supply(self):
+        index = spatial.SpatialIndex.from_blueprint_object(self.blueprint_obj)
+        # The supply area of the medium pole: (0, 0) - (7, 7)
+        self.assertEqual(index.supplied_entities(3), [0, 1, 2, 4, 6])
+        self.assertEqual(index.supplying_poles(0), [3])
+        self.assertEqual(index.supplying_poles(5), [])
+        self.assertEqual(index.supplied_entities(0), [])
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests of module factorio_game.exchange_string.stamping
+"""
+import io
+import os
+import unittest
+from factorio_game.exchange_string import blueprints, stamping
+
+
+class TestStamping(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+
+    def read_json_object(self, test_file):
+        with open(os.path.join(self.test_folder, test_file), 'r', encoding='ascii') as fp:
+            return blueprints.parse_exchange_string_as_json_object(fp.readline().strip())
+
+    def test_exchange_string_writer(self):
+        json_str = blueprints.canonical_json_string(self.read_json_object('red_circuits_block.txt'))
+        fp = io.StringIO()
+        writer = blueprints.ExchangeStringWriter(fp)
+        for start in range(0, len(json_str), 1000):
+            writer.write(json_str[start:start + 1000])
+        writer.close()
+        self.assertEqual(fp.getvalue(), blueprints.generate_exchange_string(json_str))
+
+    def test_single_copy(self):
+        for test_file in [ 'oil_processing_1_v1.1.8.txt', 'red_circuits_block.txt' ]:
+            json_obj = self.read_json_object(test_file)
+            self.assertEqual(stamping.stamp_blueprint(json_obj, 1, 1, 0, 0), blueprints.generate_exchange_string_from_json_object(json_obj))
+
+    def test_wires_1_1(self):
+        json_obj = self.read_json_object('oil_processing_1_v1.1.8.txt')
+        entities = json_obj['blueprint']['entities']
+        step = max(entity['entity_number'] for entity in entities)
+        stamped = blueprints.parse_exchange_string_as_json_object(stamping.stamp_blueprint(json_obj, 3, 2, 20, 10.5))
+        stamped_entities = stamped['blueprint']['entities']
+        self.assertEqual(len(stamped_entities), 6 * len(entities))
+        self.assertEqual(len(set(entity['entity_number'] for entity in stamped_entities)), len(stamped_entities))
+        # Copy on the second row, third column
+        copy_idx = 5
+        for entity, stamped_entity in zip(entities, stamped_entities[copy_idx * len(entities):]):
+            self.assertEqual(stamped_entity['entity_number'], entity['entity_number'] + copy_idx * step)
+            self.assertEqual(stamped_entity['position'], { 'x': entity['position']['x'] + 40, 'y': entity['position']['y'] + 10.5 })
+            self.assertEqual(stamped_entity.get('neighbours'), [neighbour + copy_idx * step for neighbour in entity['neighbours']] if 'neighbours' in entity else None)
+            for connection_point, stamped_connection_point in zip(entity.get('connections', {}).values(), stamped_entity.get('connections', {}).values()):
+                for wires, stamped_wires in zip(connection_point.values(), stamped_connection_point.values()):
+                    self.assertEqual([wire['entity_id'] + copy_idx * step for wire in wires], [wire['entity_id'] for wire in stamped_wires])
+
+    def test_wires_2_0(self):
+        json_obj = self.read_json_object('red_circuits_block.txt')
+        step = max(entity['entity_number'] for entity in json_obj['blueprint']['entities'])
+        wires = json_obj['blueprint']['wires']
+        stamped = blueprints.parse_exchange_string_as_json_object(stamping.stamp_blueprint(json_obj, 2, 2, 30, 30))
+        stamped_wires = stamped['blueprint']['wires']
+        self.assertEqual(len(stamped_wires), 4 * len(wires))
+        self.assertEqual(stamped_wires[3 * len(wires)], [wires[0][0] + 3 * step, wires[0][1], wires[0][2] + 3 * step, wires[0][3]])
+        self.assertEqual({ key: value for key, value in stamped['blueprint'].items() if key not in ('entities', 'wires') },
+                         { key: value for key, value in json_obj['blueprint'].items() if key not in ('entities', 'wires') })
+
+    def test_tiles(self):
+        json_obj = { 'blueprint': {
+            'entities': [ { 'entity_number': 1, 'name': 'inserter', 'position': { 'x': 0.5, 'y': 0.5 } } ],
+            'tiles': [ { 'name': 'concrete', 'position': { 'x': 0, 'y': 0 } } ], 'item': 'blueprint', 'version': 562949954076673 } }
+        stamped = blueprints.parse_exchange_string_as_json_object(stamping.stamp_blueprint(json_obj, 2, 1, 3.0, 0))
+        self.assertEqual([tile['position'] for tile in stamped['blueprint']['tiles']], [{ 'x': 0, 'y': 0 }, { 'x': 3, 'y': 0 }])
+        fp = io.StringIO()
+        with self.assertRaises(ValueError):
+            stamping.write_stamped_blueprint(json_obj, 2, 1, 2.5, 0, fp)
+        self.assertEqual(fp.getvalue(), '')
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
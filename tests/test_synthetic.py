@@ -0,0 +1,41 @@
+"""
+Unit tests of module factorio_game.synthetic
+"""
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        pass
+
+    def test_synthetic_blueprint(self):
+        json_obj = synthetic.synthetic_blueprint(1000, seed=3)
+        entities = json_obj['blueprint']['entities']
+        self.assertEqual(len(entities), 1000)
+        self.assertEqual([entity['entity_number'] for entity in entities], list(range(1, 1001)))
+        self.assertEqual(json_obj, synthetic.synthetic_blueprint(1000, seed=3))
+        self.assertNotEqual(json_obj, synthetic.synthetic_blueprint(1000, seed=4))
+        entity_numbers = set(entity['entity_number'] for entity in entities)
+        for entity in entities:
+            self.assertTrue(entity_numbers.issuperset(entity.get('neighbours', [])))
+        exchange_str = blueprints.generate_exchange_string_from_json_object(json_obj)
+        self.assertEqual(blueprints.parse_exchange_string_as_json_object(exchange_str), json_obj)
+
+    def test_synthetic_book(self):
+        json_obj = synthetic.synthetic_book(3, 2, 10)
+        self.assertEqual(blueprints.read_blueprint_type(json_obj), blueprints.Type.BOOK)
+        level_1 = json_obj['blueprint_book']['blueprints']
+        self.assertEqual([page['index'] for page in level_1], [0, 1])
+        level_3 = level_1[1]['blueprint_book']['blueprints'][0]['blueprint_book']['blueprints']
+        self.assertEqual([blueprints.read_blueprint_type(page) for page in level_3], [blueprints.Type.BP, blueprints.Type.BP])
+        self.assertEqual(len(level_3[0]['blueprint']['entities']), 10)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Unit tests of module factorio_game.exchange_string.transforms
+"""
+import os
+import unittest
+from factorio_game.exchange_string import blueprints, transforms
+
+
+class TestTransforms(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ 'blueprint_book.txt', 'oil_processing_1_v1.1.8.txt', 'red_circuits_block.txt', 'nilaus_book_starter_base_v0.16.51.txt' ]
+
+    def read_json_objects(self):
+        json_objects = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                json_objects.extend(blueprints.parse_exchange_string_as_json_object(blueprint_string.strip()) for blueprint_string in fp)
+        return json_objects
+
+    def assertSameBlueprint(self, json_obj1, json_obj2):
+        self.assertEqual(blueprints.canonical_json_string(json_obj1), blueprints.canonical_json_string(json_obj2))
+
+    def test_identities(self):
+        for json_obj in self.read_json_objects():
+            self.assertSameBlueprint(transforms.transform_blueprint_object(json_obj, transforms.rotate, 4), json_obj)
+            flipped = transforms.transform_blueprint_object(json_obj, transforms.flip_horizontal)
+            self.assertSameBlueprint(transforms.transform_blueprint_object(flipped, transforms.flip_horizontal), json_obj)
+            flipped = transforms.transform_blueprint_object(flipped, transforms.flip_vertical)
+            self.assertSameBlueprint(flipped, transforms.transform_blueprint_object(json_obj, transforms.rotate, 2))
+            translated = transforms.transform_blueprint_object(json_obj, transforms.translate, 10, -4)
+            self.assertSameBlueprint(transforms.transform_blueprint_object(translated, transforms.translate, -10, 4), json_obj)
+
+    def test_translation(self):
+        json_obj = { 'blueprint': { 'entities': [
+            { 'entity_number': 1, 'name': 'inserter', 'position': { 'x': 1.5, 'y': -3.5 } } ],
+            'tiles': [{ 'name': 'concrete', 'position': { 'x': 2, 'y': 5 } }], 'item': 'blueprint', 'version': 281479278886912 } }
+        translated = transforms.transform_blueprint_object(json_obj, transforms.translate, 2.0, -1)['blueprint']
+        self.assertEqual(translated['entities'][0]['position'], { 'x': 3.5, 'y': -4.5 })
+        self.assertEqual(translated['tiles'][0]['position'], { 'x': 4, 'y': 4 })
+        with self.assertRaises(ValueError):
+            transforms.transform_blueprint_object(json_obj, transforms.translate, 0.5, 0)
+        del json_obj['blueprint']['tiles']
+        translated = transforms.transform_blueprint_object(json_obj, transforms.translate, 0.5, 0)['blueprint']
+        self.assertEqual(translated['entities'][0]['position'], { 'x': 2, 'y': -3.5 })
+
+    def test_rotation(self):
+        # 1.1 blueprint (8 directions)
+        json_obj = { 'blueprint': { 'entities': [
+            { 'entity_number': 1, 'name': 'inserter', 'position': { 'x': 1.5, 'y': -3.5 } },
+            { 'entity_number': 2, 'name': 'car', 'position': { 'x': 0, 'y': 0 }, 'orientation': 0.875 },
+            { 'entity_number': 3, 'name': 'splitter', 'position': { 'x': 2, 'y': 0.5 }, 'direction': 4, 'output_priority': 'left' } ],
+            'tiles': [{ 'name': 'concrete', 'position': { 'x': 2, 'y': 5 } }], 'item': 'blueprint', 'version': 281479278886912 } }
+        compact = transforms.CompactBlueprint(json_obj)
+        transforms.rotate(compact)
+        self.assertEqual(transforms.bounding_box(compact), (-6, 0, 3.5, 3))
+        rotated = compact.to_blueprint_object()['blueprint']
+        self.assertEqual(rotated['entities'][0], { 'entity_number': 1, 'name': 'inserter', 'position': { 'x': 3.5, 'y': 1.5 }, 'direction': 2 })
+        self.assertEqual(rotated['entities'][1]['orientation'], 0.125)
+        self.assertEqual(rotated['entities'][2]['direction'], 6)
+        self.assertEqual(rotated['tiles'][0]['position'], { 'x': -6, 'y': 2 })
+        # Mirror of a 2.0 blueprint (16 directions)
+        json_obj['blueprint']['version'] = 562949954142211
+        flipped = transforms.transform_blueprint_object(json_obj, transforms.flip_horizontal)['blueprint']
+        self.assertEqual(flipped['entities'][0]['position'], { 'x': -1.5, 'y': -3.5 })
+        self.assertNotIn('direction', flipped['entities'][0])
+        self.assertEqual(flipped['entities'][2]['direction'], 12)
+        self.assertEqual(flipped['entities'][2]['output_priority'], 'right')
+        self.assertEqual(flipped['tiles'][0]['position'], { 'x': -3, 'y': 5 })
+
+    def test_directions(self):
+        # 1.1 blueprint (8 directions)
+        json_obj = { 'blueprint': { 'entities': [
+            { 'entity_number': 1, 'name': 'wooden-chest', 'position': { 'x': 0.5, 'y': 0.5 } },
+            { 'entity_number': 2, 'name': 'modded-machine', 'position': { 'x': 2.5, 'y': 0.5 } },
+            { 'entity_number': 3, 'name': 'curved-rail', 'position': { 'x': 8, 'y': 8 }, 'direction': 2 },
+            { 'entity_number': 4, 'name': 'straight-rail', 'position': { 'x': 1, 'y': 11 }, 'direction': 3 } ],
+            'item': 'blueprint', 'version': 281479278886912 } }
+        # No direction is added to the entities that are not known to be directional
+        rotated = transforms.transform_blueprint_object(json_obj, transforms.rotate, 1)['blueprint']
+        self.assertNotIn('direction', rotated['entities'][0])
+        self.assertNotIn('direction', rotated['entities'][1])
+        self.assertEqual([entity['direction'] for entity in rotated['entities'][2:]], [4, 5])
+        # The curved rails are mirrored in pairs
+        flipped = transforms.transform_blueprint_object(json_obj, transforms.flip_horizontal)['blueprint']
+        self.assertEqual([entity['direction'] for entity in flipped['entities'][2:]], [7, 5])
+        flipped = transforms.transform_blueprint_object(json_obj, transforms.flip_vertical)['blueprint']
+        self.assertEqual([entity['direction'] for entity in flipped['entities'][2:]], [3, 1])
+        # 2.0 blueprint (16 directions): the curved rails cannot be mirrored
+        json_obj['blueprint']['version'] = 562949954142211
+        json_obj['blueprint']['entities'][2]['name'] = 'curved-rail-a'
+        self.assertRaises(ValueError, transforms.transform_blueprint_object, json_obj, transforms.flip_horizontal)
+        self.assertEqual(transforms.transform_blueprint_object(json_obj, transforms.rotate, 1)['blueprint']['entities'][2]['direction'], 6)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Unit tests of module factorio_game.exchange_string.validation
+"""
+import copy
+import os
+import unittest
+from factorio_game import synthetic
+from factorio_game.exchange_string import blueprints, validation
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.test_folder = 'tests/examples/blueprints'
+        self.all_test_files = [ filename for filename in os.listdir(self.test_folder) if os.path.isfile(os.path.join(self.test_folder, filename)) ]
+
+    def read_json_objects(self):
+        json_objects = []
+        for test_file in self.all_test_files:
+            test_filepath = os.path.join(self.test_folder, test_file)
+            with open(test_filepath, 'r', encoding='ascii') as fp:
+                json_objects.extend(blueprints.parse_exchange_string_as_json_object(blueprint_string.strip()) for blueprint_string in fp)
+        return json_objects
+
+    # validation.validate
+    def test_valid(self):
+        for json_obj in self.read_json_objects():
+            self.assertEqual(validation.validate(json_obj), [])
+        self.assertEqual(validation.validate(synthetic.synthetic_book(2, 3, 50)), [])
+        # Game version 2.0
+        wires = { 'blueprint': { 'item': 'blueprint', 'wires': [[1, 1, 2, 1]], 'entities': [
+            { 'entity_number': 1, 'name': 'small-electric-pole', 'position': { 'x': 0.5, 'y': 0.5 } },
+            { 'entity_number': 2, 'name': 'small-electric-pole', 'position': { 'x': 4.5, 'y': 0.5 } }] } }
+        self.assertEqual(validation.validate(wires), [])
+
+    # validation.validate
+    # validation.format_issue
+    def test_blueprint_issues(self):
+        blueprint_obj = synthetic.synthetic_blueprint(100)
+        entities = blueprint_obj['blueprint']['entities']
+        poles = [entity for entity in entities if 'neighbours' in entity]
+        # The poles are only connected to poles
+        others = [entity for entity in entities if entity['name'] != 'medium-electric-pole']
+        others[1]['entity_number'] = others[0]['entity_number']
+        others[2].pop('name')
+        others[3]['position'] = { 'x': 'left', 'y': 0.5 }
+        poles[0]['neighbours'] = [1000]
+        poles[1]['connections'] = { '1': { 'green': [{ 'entity_id': 1001 }, { 'circuit_id': 1 }] } }
+        blueprint_obj['blueprint']['wires'] = [[1, 1, 1002, 1], [1, 2]]
+        del blueprint_obj['blueprint']['item']
+        issues = validation.validate(blueprint_obj)
+        self.assertCountEqual([(issue.kind, issue.message) for issue in issues], [
+            ('key', 'blueprint: missing key item'),
+            ('entity', f'Entity {others[0]["entity_number"]} ({others[1]["name"]}): duplicate entity_number'),
+            ('entity', f'Entity {others[2]["entity_number"]} (None): missing key name'),
+            ('entity', f'Entity {others[3]["entity_number"]} ({others[3]["name"]}): position.x: expected int or float, got str'),
+            ('wire', f'Entity {poles[1]["entity_number"]} (medium-electric-pole): connections.1.green: missing entity_id'),
+            ('wire', 'Wire #1: expected [entity_number, connector, entity_number, connector]'),
+            ('wire', f'Entity {poles[0]["entity_number"]} (medium-electric-pole): neighbours: reference to the missing entity 1000'),
+            ('wire', f'Entity {poles[1]["entity_number"]} (medium-electric-pole): connections.1.green: reference to the missing entity 1001'),
+            ('wire', 'Wire #0: reference to the missing entity 1002')])
+        self.assertEqual(validation.validate({ 'blueprint': [] })[0].message, 'blueprint: expected dict, got list')
+        self.assertEqual(validation.validate({ 'label': 'Unknown' })[0].kind, 'type')
+
+    # validation.validate
+    def test_invalid_references(self):
+        blueprint_obj = synthetic.synthetic_blueprint(100)
+        entities = blueprint_obj['blueprint']['entities']
+        poles = [entity for entity in entities if 'neighbours' in entity]
+        poles[0]['neighbours'] = [[2]]
+        poles[1]['connections'] = { '1': { 'red': [{ 'entity_id': {} }] } }
+        blueprint_obj['blueprint']['wires'] = [[{}, 1, 1, 1]]
+        blueprint_obj['blueprint']['schedules'] = [{ 'locomotives': ['1'] }]
+        issues = validation.validate(blueprint_obj)
+        self.assertCountEqual([(issue.kind, issue.message) for issue in issues], [
+            ('wire', f'Entity {poles[0]["entity_number"]} (medium-electric-pole): neighbours: invalid reference [2], expected an entity number'),
+            ('wire', f'Entity {poles[1]["entity_number"]} (medium-electric-pole): connections.1.red: invalid reference {{}}, expected an entity number'),
+            ('wire', 'Wire #0: invalid reference {}, expected an entity number'),
+            ('wire', 'Schedule #0: invalid reference "1", expected an entity number')])
+
+    # validation.validate
+    # validation.check
+    def test_book_issues(self):
+        book_obj = synthetic.synthetic_book(3, 3, 10)
+        self.assertIsNone(validation.check(book_obj))
+        pages = book_obj['blueprint_book']['blueprints']
+        pages[1]['index'] = 0
+        nested_pages = pages[2]['blueprint_book']['blueprints']
+        nested_pages[0] = { 'index': 0, 'blueprint': { 'item': 'blueprint', 'label': 3 } }
+        nested_pages[1]['index'] = -2
+        issues = validation.validate(book_obj)
+        self.assertEqual([validation.format_issue(issue) for issue in issues], [
+            'Page #1: duplicate index 0',
+            '2: Page #1: invalid index -2',
+            '2/0: blueprint: label: expected str, got int'])
+        with self.assertRaisesRegex(ValueError, r'Invalid blueprint \(3 issues\)'):
+            validation.check(book_obj)
+        # The pages are not modified
+        self.assertEqual(validation.validate(copy.deepcopy(book_obj)), issues)
+
+    def tearDown(self):
+        pass
+
+
+if __name__ == '__main__':
+    unittest.main()